@@ -0,0 +1,81 @@
+"""Measure the full check on generated macro files of growing size.
+
+Every generated procedure defines labels, jumps over a conditional and
+calls two other procedures, so the files have tens of thousands of labels
+and calls. The parsing, the label check and the control flow analysis are
+timed separately, the time per instruction should stay flat.
+
+Usage: python benchmarks/bench_check.py [--instructions N ...] [--runs N]
+"""
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from mausmakro.parsing import Parser
+
+# Instructions of one generated procedure
+PROC_SIZE = 12
+
+
+def generate_macro(instructions: int) -> str:
+    procs = max(instructions // PROC_SIZE, 2)
+    chunks = ["MACRO main {\n    CALL proc_0\n}\n"]
+    for i in range(procs):
+        callees = [j for j in (2 * i + 1, 2 * i + 2) if j < procs]
+        calls = ''.join(f"        CALL proc_{j}\n" for j in callees) \
+            or "        WAIT 1s\n"
+        chunks.append(
+            f"PROC proc_{i} {{\n"
+            f"    LABEL top_{i}\n"
+            f"    JUMP TO start_{i}\n"
+            f"    LABEL start_{i}\n"
+            f"    IF FIND image.png WITHIN 1s {{\n{calls}"
+            f"    }} ELSE {{\n"
+            f"        CLICK {i},1\n"
+            f"    }}\n"
+            f"}}\n"
+        )
+
+    return ''.join(chunks)
+
+
+def timed(func):
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instructions', type=int, nargs='+',
+                        default=[10000, 100000])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.instructions:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp).joinpath('bench.txt')
+            path.write_text(generate_macro(size))
+
+            parse_time, macro = timed(lambda: Parser(str(path)))
+            parse_time += timed(macro.parse)[0]
+
+            labels, analysis = [], []
+            for _ in range(args.runs):
+                labels.append(timed(macro.check_labels)[0])
+                elapsed, diagnostics = timed(macro.analyze)
+                analysis.append(elapsed)
+
+        count = len(macro.instructions)
+        print(f"{count:>8} instructions {len(macro.label_table):>7} labels "
+              f"parse {parse_time:7.2f} s, "
+              f"labels {median(labels) * 1000:7.1f} ms, "
+              f"analysis {median(analysis) * 1000:7.1f} ms "
+              f"({median(analysis) / count * 1e6:.2f} us/instruction), "
+              f"{len(diagnostics)} diagnostics")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Measure `mausmakro check DIR` on a generated repository of macro files.
+
+Every generated macro file imports shared libraries and uses shared images.
+The check is run cold (empty caches), warm (nothing changed) and after one
+library and one macro file changed, each as a fresh process like in a
+pre-commit hook.
+
+Usage: python benchmarks/bench_check_dir.py [--files N] [--libs N]
+                                            [--jobs N] [--runs N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def generate_repo(path: Path, files: int, libs: int):
+    path.joinpath('lib').mkdir()
+    path.joinpath('images').mkdir()
+    for i in range(10):
+        path.joinpath(f'images/button_{i}.png').write_bytes(os.urandom(4096))
+
+    for i in range(libs):
+        body = ''.join(f"    CLICK ON button_{(i + n) % 10}.png WITHIN 5s\n"
+                       for n in range(20))
+        path.joinpath(f'lib/lib_{i}.mkr').write_text(
+            f"PROC proc_{i} {{\n{body}}}\n"
+        )
+
+    for i in range(files):
+        imports = [f'lib/lib_{(i + n) % libs}.mkr' for n in range(3)]
+        calls = ''.join(f"    CALL proc_{(i + n) % libs}\n" for n in range(3))
+        body = ''.join(f"    IF FIND button_{n}.png WITHIN 1s {{\n"
+                       f"        CLICK {n},{i}\n"
+                       f"    }}\n" for n in range(10))
+        path.joinpath(f'macro_{i}.mkr').write_text(
+            ''.join(f'%IMPORT {name}\n' for name in imports)
+            + f"MACRO macro_{i} {{\n{calls}{body}}}\n"
+        )
+
+
+def run(path: Path, env, jobs: int):
+    start = perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-m', 'mausmakro', 'check', str(path), '--full',
+         '--format', 'json', '--jobs', str(jobs)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"Check failed:\n{result.stdout}{result.stderr}")
+
+    return json.loads(result.stdout), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=300)
+    parser.add_argument('--libs', type=int, default=30)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp).joinpath('repo')
+        repo.mkdir()
+        generate_repo(repo, args.files, args.libs)
+        env = {**os.environ, 'XDG_CACHE_HOME': str(Path(tmp, 'cache'))}
+
+        def report(name, report, wall):
+            print(f"{name:<22} {report['checked']:>5} files "
+                  f"{report['cached']:>5} cached  "
+                  f"{wall * 1000:8.1f} ms process, "
+                  f"{report['elapsed_ms']:8.1f} ms checking")
+
+        report('cold', *run(repo, env, args.jobs))
+
+        walls = []
+        for _ in range(args.runs):
+            result, wall = run(repo, env, args.jobs)
+            walls.append(wall)
+        report('warm', result, median(walls))
+
+        with open(repo.joinpath('lib/lib_0.mkr'), 'a') as f:
+            f.write("# changed\n")
+        with open(repo.joinpath('macro_1.mkr'), 'a') as f:
+            f.write("# changed\n")
+        report('one library changed', *run(repo, env, args.jobs))
+
+
+if __name__ == '__main__':
+    main()
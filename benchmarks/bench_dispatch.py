@@ -0,0 +1,99 @@
+"""Measure the instruction dispatch overhead of the interpreter.
+
+A generated macro full of labels, jumps, calls and conditionals, but no
+clicks or image searches, is interpreted as parsed and as optimized.
+No display is needed.
+
+Usage: python benchmarks/bench_dispatch.py [--blocks N] [--runs N]
+"""
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from mausmakro.interpreter import Interpreter
+from mausmakro.optimizer import Optimizer
+from mausmakro.parsing import Parser
+
+OPTS = {
+    'color_match': False,
+    'enable_retry': False,
+    'match_step': 2,
+    'pause_on_fail': False,
+    'retry_times': 1,
+}
+
+
+class CountingInterpreter(Interpreter):
+    executed = 0
+
+    def _dispatch_table(self):
+        table = super(CountingInterpreter, self)._dispatch_table()
+        return [self._counting(handler) for handler in table]
+
+    def _counting(self, handler):
+        def count(instruction):
+            self.executed += 1
+            return handler(instruction)
+
+        return count
+
+
+def generate_macro(blocks: int) -> str:
+    body = []
+    for i in range(blocks):
+        body.append(f"""
+    CALL proc
+    JUMP TO skip_{i}
+    LABEL skip_{i}
+    IF NOT FOUND image.png {{
+        JUMP TO next_{i}
+    }} ELSE {{
+        CALL proc
+    }}
+    LABEL next_{i}""")
+
+    return ("MACRO bench {" + ''.join(body) + "\n}\n\n"
+            "PROC proc {\n    JUMP TO inner\n    LABEL inner\n}\n")
+
+
+def measure(interpreter_cls, program, opts, runs):
+    times = []
+    for _ in range(runs):
+        interpreter = interpreter_cls(*program, opts)
+        start = perf_counter()
+        interpreter.interpret('bench')
+        times.append(perf_counter() - start)
+
+    counting = CountingInterpreter(*program, opts)
+    counting.interpret('bench')
+    return median(times), counting.executed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp).joinpath('bench.txt')
+        path.write_text(generate_macro(args.blocks))
+        opts = {**OPTS, 'file': str(path)}
+
+        parsed = Parser(str(path)).parse()
+        programs = {
+            'parsed': parsed,
+            'optimized': Optimizer(*parsed).optimize(),
+        }
+
+        for name, program in programs.items():
+            elapsed, executed = measure(Interpreter, program, opts, args.runs)
+            print(f"{name:<10} {len(program[0]):>7} instructions "
+                  f"{executed:>7} executed {elapsed * 1000:8.1f} ms "
+                  f"{elapsed / executed * 1e6:6.2f} us/instruction")
+
+
+if __name__ == '__main__':
+    main()
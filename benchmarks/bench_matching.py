@@ -0,0 +1,126 @@
+"""Compare the latency and accuracy of the image matching engines.
+
+Synthetic desktop-like screens are generated, so no display is needed.
+The pyautogui (pyscreeze) matching is measured as well, if it is installed.
+
+Usage: python benchmarks/bench_matching.py [--runs N] [--engine NAME ...]
+                                           [--workers N]
+"""
+import argparse
+import random
+from statistics import median
+from time import perf_counter
+
+import cv2
+
+from mausmakro.bench import draw_button, generate_screen
+from mausmakro.matching import Matcher, PyramidMatcher, StepMatcher, \
+    TiledMatcher
+
+RESOLUTIONS = {'1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def generate_cases(size, count, seed):
+    """Yield (screen, template, expected top left or None) triples."""
+    rnd = random.Random(seed)
+    for i in range(count):
+        screen = generate_screen(size, seed + i)
+        template = draw_button(f'Button {i}')
+        h, w = template.shape[:2]
+        x, y = rnd.randrange(size[0] - w), rnd.randrange(size[1] - h)
+
+        if i % 3 == 2:
+            # Near miss, a slightly different button is on the screen
+            screen[y:y + h, x:x + w] = draw_button(f'Button {i + 1}')
+            yield screen, template, None
+
+        else:
+            screen[y:y + h, x:x + w] = template
+            yield screen, template, (x, y)
+
+
+class PyscreezeMatcher(Matcher):
+    """The pyautogui matching, as used by the interpreter so far."""
+
+    def __init__(self, step):
+        import pyscreeze
+        self._pyscreeze = pyscreeze
+        self.step = step
+
+    def match(self, screen, template):
+        grayscale = len(screen.shape) == 2
+        try:
+            box = self._pyscreeze.locate(template, screen, step=self.step,
+                                         grayscale=grayscale)
+
+        except self._pyscreeze.ImageNotFoundException:
+            return None
+
+        return (int(box.left), int(box.top)) if box else None
+
+
+def engines(workers=1):
+    result = {
+        'step-1': StepMatcher(1),
+        'step-2': StepMatcher(2),
+        'pyramid': PyramidMatcher(),
+    }
+
+    if workers > 1:
+        for name, matcher in list(result.items()):
+            result[f'{name}-w{workers}'] = TiledMatcher(matcher, workers)
+
+    try:
+        result['pyautogui-1'] = PyscreezeMatcher(1)
+        result['pyautogui-2'] = PyscreezeMatcher(2)
+
+    except ImportError:
+        pass
+
+    return result
+
+
+def run(runs, names, workers):
+    print(f"{'resolution':<11}{'mode':<7}{'engine':<13}"
+          f"{'median ms':>10}{'max ms':>9}{'correct':>10}")
+
+    for res_name, size in RESOLUTIONS.items():
+        cases = list(generate_cases(size, runs, seed=1))
+        for mode in ('gray', 'color'):
+            if mode == 'gray':
+                prepared = [(cv2.cvtColor(s, cv2.COLOR_BGR2GRAY),
+                             cv2.cvtColor(t, cv2.COLOR_BGR2GRAY), e)
+                            for s, t, e in cases]
+            else:
+                prepared = cases
+
+            for name, matcher in engines(workers).items():
+                if names and name not in names:
+                    continue
+
+                times = []
+                correct = 0
+                for screen, template, expected in prepared:
+                    start = perf_counter()
+                    found = matcher.match(screen, template)
+                    times.append((perf_counter() - start) * 1000)
+
+                    if found is not None:
+                        found = tuple(found[:2])
+
+                    correct += found == expected
+
+                print(f"{res_name:<11}{mode:<7}{name:<13}"
+                      f"{median(times):>10.1f}{max(times):>9.1f}"
+                      f"{correct:>7}/{len(prepared)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--engine', action='append', dest='engines',
+                        help="Engine to measure, defaults to all of them")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Measure also tiled matching with N threads")
+    args = parser.parse_args()
+    run(args.runs, args.engines, args.workers)
@@ -0,0 +1,68 @@
+"""Measure the preprocessor on generated projects with many imports.
+
+Every generated file defines a procedure and imports a shared common file
+and two other files, so most of the files are imported many times. The time
+per output line should stay flat as the project grows.
+
+Usage: python benchmarks/bench_preprocessor.py [--files N ...] [--runs N]
+"""
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from mausmakro.preprocessor import Preprocessor
+
+
+def generate_project(path: Path, files: int) -> Path:
+    path.joinpath('common.txt').write_text(
+        "PROC common {\n    WAIT 1s\n}\n"
+    )
+
+    for i in range(files):
+        imports = ['common.txt']
+        imports += [f'lib_{j}.txt' for j in (2 * i + 1, 2 * i + 2)
+                    if j < files]
+        body = '\n'.join(f'    CLICK {i},{n}' for n in range(20))
+        path.joinpath(f'lib_{i}.txt').write_text(
+            ''.join(f'%IMPORT {name}\n' for name in imports)
+            + f"\nPROC proc_{i} {{\n{body}\n    CALL common\n}}\n"
+        )
+
+    main = path.joinpath('main.txt')
+    main.write_text(
+        ''.join(f'%IMPORT lib_{i}.txt\n' for i in range(files))
+        + "\nMACRO main {\n    CALL proc_0\n}\n"
+    )
+    return main
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, nargs='+',
+                        default=[100, 300, 1000])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for files in args.files:
+        with tempfile.TemporaryDirectory() as tmp:
+            main_file = generate_project(Path(tmp), files)
+            imports = sum(
+                f.read_text().count('%IMPORT') for f in Path(tmp).iterdir()
+            )
+
+            times = []
+            for _ in range(args.runs):
+                start = perf_counter()
+                content = Preprocessor(str(main_file)).process()
+                times.append(perf_counter() - start)
+
+        lines = content.count('\n')
+        elapsed = median(times)
+        print(f"{files:>6} files {imports:>6} imports {lines:>7} lines "
+              f"{elapsed * 1000:8.1f} ms {elapsed / lines * 1e6:6.2f} us/line")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Measure the cold start of the CLI and fail if it exceeds the budget.
+
+Every scenario is run in a fresh interpreter with `python -X importtime`
+and the total import time is taken as the median of the runs. The check
+must also not import any of the heavy or display dependent modules.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-check MS]
+                                          [--budget-help MS] [--file FILE]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Must not be imported by the check, they are slow or need a display
+FORBIDDEN = ('cv2', 'numpy', 'PIL', 'pyautogui', 'pynput', 'mss')
+
+
+def import_times(stderr: str):
+    """Parse the -X importtime output into {module: cumulative us}."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only the top level imports, the nested ones are included in them
+        if not name.startswith('  '):
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def run(args, env):
+    start = perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'mausmakro', *args],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"mausmakro {' '.join(args)} failed:\n{result.stdout}"
+                 f"{result.stderr}")
+
+    return import_times(result.stderr), wall
+
+
+def measure(name, args, runs, env):
+    totals, walls, modules = [], [], set()
+    # The first run compiles the bytecode and warms the program cache
+    run(args, env)
+    for _ in range(runs):
+        times, wall = run(args, env)
+        totals.append(sum(times.values()) / 1000)
+        walls.append(wall * 1000)
+        modules.update(times)
+
+    print(f"{name:<24} imports {median(totals):7.1f} ms, "
+          f"process {median(walls):7.1f} ms")
+    return median(totals), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-check', type=float, default=150,
+                        help="Import time budget of the check in ms.")
+    parser.add_argument('--budget-help', type=float, default=150,
+                        help="Import time budget of interpret --help in ms.")
+    parser.add_argument('--file', default=str(ROOT / 'examples/simple.mkr'),
+                        help="Macro file to check.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache:
+        env = {**os.environ, 'XDG_CACHE_HOME': cache}
+        env.pop('DISPLAY', None)
+        scenarios = [
+            ('check', ['check', '-f', args.file], args.budget_check),
+            ('check (no cache)',
+             ['check', '-f', args.file, '--no-program-cache'],
+             args.budget_check),
+            ('interpret --help', ['interpret', '--help'], args.budget_help),
+        ]
+
+        failed = False
+        for name, cmd, budget in scenarios:
+            total, modules = measure(name, cmd, args.runs, env)
+            if total > budget:
+                print(f"  over the budget of {budget:.0f} ms")
+                failed = True
+
+            forbidden = sorted(m for m in FORBIDDEN if m in modules)
+            if forbidden:
+                print(f"  imports {', '.join(forbidden)}")
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
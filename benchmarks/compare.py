@@ -0,0 +1,51 @@
+"""Compare two `mausmakro bench` reports, e.g. of two releases.
+
+Exits with 1 if any configuration got slower by more than the allowed
+ratio, or if it got any case wrong which the baseline got right.
+
+Usage: python benchmarks/compare.py BASELINE CURRENT [--max-slowdown 1.2]
+"""
+import argparse
+import json
+import sys
+
+
+def key(result):
+    return (result['resolution'], result['command'], result['match_engine'],
+            result['match_step'], result['color_match'])
+
+
+def compare(baseline, current, max_slowdown):
+    base = {key(r): r for r in baseline['results']}
+    failed = False
+
+    print(f"{'configuration':<40}{'p50 ms':>16}{'p95 ms':>16}{'correct':>12}")
+    for result in current['results']:
+        old = base.get(key(result))
+        if old is None:
+            continue
+
+        ratio = result['p50_ms'] / old['p50_ms'] if old['p50_ms'] else 1.0
+        slower = ratio > max_slowdown
+        worse = result['correct'] < old['correct']
+        failed = failed or slower or worse
+
+        name = ' '.join(str(k) for k in key(result))
+        mark = ' <-' if slower or worse else ''
+        print(f"{name:<40}"
+              f"{old['p50_ms']:>7.1f} -> {result['p50_ms']:>5.1f}"
+              f"{old['p95_ms']:>7.1f} -> {result['p95_ms']:>5.1f}"
+              f"{old['correct']:>5} -> {result['correct']:<3}{mark}")
+
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--max-slowdown', type=float, default=1.2)
+    args = parser.parse_args()
+
+    with open(args.baseline) as b, open(args.current) as c:
+        sys.exit(int(compare(json.load(b), json.load(c), args.max_slowdown)))
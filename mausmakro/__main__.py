@@ -1,12 +1,97 @@
 #!/usr/local/bin/python3
+import json
+import os
 import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
 
 import click
 
+from mausmakro.lib.enums import CaptureBackend, MatchEngine
+from mausmakro.lib.observable import Level, MessageType
+from mausmakro.lib.types import Block
+from mausmakro.lib.utils import cache_dir
+from mausmakro.optimizer import Optimizer, dump
 from mausmakro.parsing import Parser
-from mausmakro.recorder import Recorder
-from mausmakro.show_coords import ShowCoords
-from mausmakro.ui import Ui
+from mausmakro.program_cache import ProgramCache
+
+# Only what the check needs is imported here, everything else (OpenCV,
+# pyautogui, input listeners) is imported by the commands using it.
+# The check then works even on a headless machine.
+
+
+# Options of the commands running a macro, added by run_options()
+RUN_OPTIONS = {
+    'enable_retry': click.option(
+        '--enable-retry', is_flag=True,
+        help="Enable command retrying before failing completely."
+    ),
+    'retry_times': click.option(
+        '--retry-times', type=click.IntRange(1, None), default=1,
+        help="Retry the failing command specified times before failing. "
+             "Defaults to 1. Has no effect if --enable-retry is not "
+             "specified."
+    ),
+    'color_match': click.option(
+        '--color-match', is_flag=True,
+        help="Perform color image find by default"
+    ),
+    'match_step': click.option(
+        '--match-step', type=click.IntRange(1, 5), default=2,
+        help="Image match step. Higher value means faster search, but "
+             "lowers accuracy. Recommended for higher res (>1080p) "
+             "displays. Defaults to 2. Used only by the step engine."
+    ),
+    'match_engine': click.option(
+        '--match-engine', type=click.Choice(MatchEngine.values()),
+        default='step',
+        help="Image matching engine. The step engine is the classic row "
+             "skipping one, the pyramid engine matches downscaled images "
+             "first and verifies the best candidates at full resolution. "
+             "Defaults to step."
+    ),
+    'capture': click.option(
+        '--capture', type=click.Choice(CaptureBackend.values()),
+        default='pyautogui',
+        help="Screen capture backend. The mss backend is much faster, but "
+             "requires the mss package. The file backend reads the frames "
+             "from --capture-path instead of the screen, the timeline "
+             "backend replays a recording from it. Defaults to pyautogui."
+    ),
+    'capture_path': click.option(
+        '--capture-path', type=click.Path(exists=True),
+        help="Image or directory of images used as screen frames by the "
+             "file capture backend, or the recording of the timeline "
+             "backend."
+    ),
+    'program_cache': click.option(
+        '--program-cache/--no-program-cache', default=True,
+        help="Reuse the compiled program if the file has not changed since "
+             "the last run. Enabled by default."
+    ),
+    'optimize': click.option(
+        '--optimize/--no-optimize', default=True,
+        help="Optimize the program before interpreting it. "
+             "Enabled by default."
+    ),
+    'watcher_interval': click.option(
+        '--watcher-interval', type=click.FloatRange(0.05, None),
+        default=0.5,
+        help="Seconds between the checks of the images declared by "
+             "ON ... CALL ... in the file. Defaults to 0.5."
+    ),
+}
+
+
+def run_options(*names: str):
+    """Add the RUN_OPTIONS of the names to the command, in their order."""
+    def decorator(f):
+        for name in reversed(names):
+            f = RUN_OPTIONS[name](f)
+        return f
+
+    return decorator
 
 
 @click.group()
@@ -18,35 +103,248 @@ def main():
 @click.option('--output', '-o', default=None,
               help="Output file")
 def record(output):
+    # Input listeners need a display, import them only when used
+    from mausmakro.recorder import Recorder
+
     rec = Recorder(output)
     rec.record()
 
 
 @main.command(help="Show mouse coords on every click.")
 def show_coords():
+    from mausmakro.show_coords import ShowCoords
+
     show = ShowCoords()
     show.start()
 
 
-@main.command(help="Check specified file and exit.")
+@main.command()
+@click.argument('corpus', type=click.Path(file_okay=False),
+                default='benchmarks/corpus')
+@click.option('--generate', is_flag=True,
+              help="Generate a synthetic corpus in CORPUS first.")
+@click.option('--engine', 'engines', type=click.Choice(MatchEngine.values()),
+              multiple=True, help="Matching engine to measure. "
+                                  "Can be repeated, defaults to all.")
+@click.option('--match-step', 'steps', type=click.IntRange(1, 5),
+              multiple=True, help="Match step of the step engine to "
+                                  "measure. Can be repeated, defaults to 1 "
+                                  "and 2.")
+@click.option('--match-workers', type=click.IntRange(1, None), default=1,
+              help="Number of threads matching parts of the screen in "
+                   "parallel. Defaults to 1.")
+@click.option('--resolution', 'resolutions', multiple=True,
+              help="Measure only screenshots of this resolution, "
+                   "e.g. 1080p. Can be repeated.")
+@click.option('--runs', type=click.IntRange(1, None), default=3,
+              help="Number of searches for every case. Defaults to 3.")
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help="Output file for the JSON report, "
+                   "standard output is used by default.")
+def bench(**kwargs):
+    """Benchmark the image search on a CORPUS of screenshots.
+
+    CORPUS is a directory with screenshots and templates described in its
+    corpus.json file. Defaults to benchmarks/corpus.
+
+    Every combination of FIND/PFIND, matching engine, match step and
+    color matching is measured and reported as JSON.
+    """
+    from mausmakro.bench import MANIFEST, configurations, generate_corpus, \
+        run_bench
+
+    corpus = kwargs.get('corpus')
+    try:
+        if kwargs.get('generate'):
+            generate_corpus(corpus)
+
+        elif not Path(corpus).joinpath(MANIFEST).exists():
+            print(f"No corpus found in {corpus}, "
+                  "use --generate to create one.", file=sys.stderr)
+            sys.exit(1)
+
+        configs = configurations(kwargs.get('engines') or MatchEngine.values(),
+                                 kwargs.get('steps') or (1, 2))
+        report = run_bench(
+            corpus,
+            configs,
+            runs=kwargs.get('runs'),
+            resolutions=kwargs.get('resolutions'),
+            opts={'match_workers': kwargs.get('match_workers')}
+        )
+
+    except Exception as e:
+        print(f"An error occurred while benchmarking:\n{e}", file=sys.stderr)
+        sys.exit(1)
+
+    output = json.dumps(report, indent=2)
+    if kwargs.get('output'):
+        with open(kwargs.get('output'), 'w') as f:
+            f.write(output)
+
+    else:
+        print(output)
+
+
+def program_cache(enabled: bool) -> Optional[ProgramCache]:
+    return ProgramCache(cache_dir() / 'programs') if enabled else None
+
+
+@main.command()
+@click.argument('paths', nargs=-1, type=click.Path(exists=True))
 @click.option('--file', '-f', help="Source file with macros")
 @click.option('--full', is_flag=True,
-              help="Extend check to images existence and "
-                   "all called labels are defined")
+              help="Extend check to images existence, "
+                   "all called labels are defined and the control flow "
+                   "between the macros and procedures")
+@click.option('--strict', is_flag=True,
+              help="Fail on the warnings of the full check too.")
+@click.option('--program-cache/--no-program-cache', default=True,
+              help="Reuse the compiled program if the file has not changed "
+                   "since the last run. Enabled by default.")
+@click.option('--pattern', default='*.mkr',
+              help="Macro files to check in the directories. "
+                   "Defaults to *.mkr.")
+@click.option('--jobs', '-j', type=click.IntRange(1, None),
+              help="Number of processes checking the files. "
+                   "Defaults to the number of CPUs.")
+@click.option('--result-cache/--no-result-cache', default=True,
+              help="Check again only the files which changed, or whose "
+                   "imports or images changed, since the last check. "
+                   "Enabled by default.")
+@click.option('--format', 'output_format', type=click.Choice(['text', 'json']),
+              default='text', help="Output format of the results.")
 def check(**kwargs):
+    """Check the macro files and exit.
+
+    PATHS are macro files or directories searched for the macro files.
+    Without them, the file of --file is checked.
+    """
+    if kwargs.get('paths'):
+        check_paths(**kwargs)
+        return
+
+    diagnostics = []
     try:
-        parser = Parser(kwargs.get('file'))
+        parser = Parser(kwargs.get('file'),
+                        program_cache(kwargs.get('program_cache')))
         parser.parse()
 
         if kwargs.get('full'):
             parser.perform_checks()
-
-        print("No errors found.")
+            diagnostics = parser.analyze()
 
     except Exception as e:
         print(f"An error occurred while parsing the file:\n{e}")
         sys.exit(1)
 
+    for diagnostic in diagnostics:
+        print(f"Warning: {diagnostic}")
+
+    if diagnostics and kwargs.get('strict'):
+        print(f"Check failed with {len(diagnostics)} warnings.")
+        sys.exit(1)
+
+    print("No errors found.")
+
+
+def check_paths(**kwargs):
+    from mausmakro.checker import CheckCache, check_files, discover
+
+    start = perf_counter()
+    files = discover(kwargs.get('paths'), kwargs.get('pattern'))
+    if kwargs.get('file'):
+        files.append(kwargs.get('file'))
+
+    cache = CheckCache(cache_dir() / 'check.json') \
+        if kwargs.get('result_cache') else None
+    results = check_files(
+        files,
+        full=kwargs.get('full'),
+        jobs=kwargs.get('jobs') or os.cpu_count() or 1,
+        cache=cache,
+        program_cache=str(cache_dir() / 'programs')
+        if kwargs.get('program_cache') else None
+    )
+
+    if cache:
+        try:
+            cache.save()
+
+        except OSError as e:
+            print(f"Failed to save the result cache: {e}", file=sys.stderr)
+
+    strict = kwargs.get('strict')
+
+    def passed(result):
+        return result['error'] is None \
+            and not (strict and result['warnings'])
+
+    failed = sum(1 for r, _ in results if not passed(r))
+    cached = sum(1 for _, was_cached in results if was_cached)
+    elapsed = (perf_counter() - start) * 1000
+
+    if kwargs.get('output_format') == 'json':
+        print(json.dumps({
+            'files': [
+                {'file': r['file'], 'ok': passed(r), 'error': r['error'],
+                 'warnings': r['warnings'], 'cached': was_cached}
+                for r, was_cached in results
+            ],
+            'checked': len(results),
+            'cached': cached,
+            'failed': failed,
+            'elapsed_ms': round(elapsed, 1),
+        }, indent=2))
+
+    else:
+        for result, _ in results:
+            if result['error'] is not None:
+                print(f"{result['file']}: error: {result['error']}")
+
+            for warning in result['warnings']:
+                print(f"{result['file']}: warning: {warning['message']}")
+
+        print(f"Checked {len(results)} files ({cached} cached) "
+              f"in {elapsed:.0f} ms, {failed} failed.")
+
+    sys.exit(1 if failed else 0)
+
+
+@main.command(name='compile')
+@click.argument('file', type=click.Path(exists=True))
+@click.option('--dump', 'dump_program', is_flag=True,
+              help="Print the program before and after the optimization.")
+@click.option('--program-cache/--no-program-cache', default=True,
+              help="Reuse the compiled program if the file has not changed "
+                   "since the last run. Enabled by default.")
+def compile_file(**kwargs):
+    """Compile the FILE and report the errors, if any.
+
+    The compiled program is stored in the program cache, so the next
+    interpret of the FILE starts faster.
+    """
+    try:
+        parser = Parser(kwargs.get('file'),
+                        program_cache(kwargs.get('program_cache')))
+        instructions, label_table = parser.parse()
+        parser.check_labels()
+        optimized, optimized_table = Optimizer(instructions,
+                                               label_table).optimize()
+
+    except Exception as e:
+        print(f"An error occurred while compiling the file:\n{e}")
+        sys.exit(1)
+
+    if kwargs.get('dump_program'):
+        print(dump(instructions, label_table, "Parsed"))
+        print()
+        print(dump(optimized, optimized_table, "Optimized"))
+
+    else:
+        print(f"Compiled {len(instructions)} instructions "
+              f"into {len(optimized)}.")
+
 
 @main.command()
 @click.argument('file', type=click.Path(exists=True))
@@ -54,21 +352,73 @@ def check(**kwargs):
 @click.option('--times', '-t', type=int, default=-1,
               help="Number of times to repeat specified macro, "
                    "defaults to -1 (infinite)")
-@click.option('--enable-retry', is_flag=True,
-              help="Enable command retrying before failing completely.")
-@click.option('--retry-times', type=click.IntRange(1, None), default=1,
-              help="Retry the failing command specified times before failing. "
-                   "Defaults to 1. Has no effect if --retry-times command "
-                   "is not specified")
-@click.option('--color-match', is_flag=True,
-              help="Perform color image find by default")
-@click.option('--match-step', type=click.IntRange(1, 5), default=2,
-              help="Image match step. Higher value means faster search, "
-                   "but lowers accuracy. Recommended for higher res (>1080p) "
-                   "displays. Defaults to 2.")
+@run_options('enable_retry', 'retry_times', 'color_match', 'match_step',
+             'match_engine')
+@click.option('--match-workers', type=click.IntRange(1, None), default=1,
+              help="Number of threads matching parts of the screen in "
+                   "parallel. Speeds up matching on high resolution and "
+                   "multi-monitor setups. Defaults to 1.")
 @click.option('--pause-on-fail', is_flag=True,
               help="Pause execution if current instruction fails, "
                    "instead of exiting.")
+@click.option('--template-cache-size', type=click.IntRange(1, None),
+              default=256,
+              help="Maximum memory in MiB held by decoded images. "
+                   "Defaults to 256.")
+@click.option('--auto-region', is_flag=True,
+              help="Search for an image around its last found location "
+                   "first, before searching the whole screen.")
+@click.option('--region-padding', type=click.IntRange(0, None), default=100,
+              help="Padding in pixels around the last found location "
+                   "searched with --auto-region. Defaults to 100.")
+@click.option('--location-cache', is_flag=True,
+              help="Remember the found image locations across runs and "
+                   "search there first. Implies --auto-region.")
+@click.option('--location-cache-file', type=click.Path(dir_okay=False),
+              help="File of the --location-cache. Defaults to "
+                   "~/.cache/mausmakro/locations.json.")
+@run_options('capture', 'capture_path')
+@click.option('--frame-diff/--no-frame-diff', default=True,
+              help="Skip image matching while the screen does not change "
+                   "and match only the changed parts of the screen. "
+                   "Enabled by default.")
+@click.option('--lookahead/--no-lookahead', default=True,
+              help="Start searching for the image of the command following "
+                   "a WAIT during the last second of the WAIT. "
+                   "Enabled by default.")
+@run_options('program_cache', 'optimize')
+@click.option('--stats', is_flag=True,
+              help="Print image matching statistics after each iteration, "
+                   "also after a failed or stopped one.")
+@click.option('--watch', is_flag=True,
+              help="Reload the file when it or any imported file changes. "
+                   "The new version runs from the next repetition of the "
+                   "macro, the old one keeps running if it has errors.")
+@run_options('watcher_interval')
+@click.option('--async', 'async_mode', is_flag=True,
+              help="Run the macro in an asyncio event loop, searches and "
+                   "waits of RACE and PARALLEL blocks run at the same time. "
+                   "Enabled automatically for the macros using them.")
+@click.option('--log-level', type=click.Choice(Level.names()),
+              default='info',
+              help="Print only the messages of this level or higher, debug "
+                   "shows every executed command. Defaults to info.")
+@click.option('--quiet', '-q', is_flag=True,
+              help="Print only the warnings and errors, the same as "
+                   "--log-level warning.")
+@click.option('--log-json', type=click.Path(dir_okay=False),
+              help="Append the messages to this file too, one JSON object "
+                   "per line.")
+@click.option('--metrics-port', type=click.IntRange(1, 65535),
+              help="Serve the metrics of the macro in the Prometheus text "
+                   "format on this port of localhost.")
+@click.option('--metrics-file', type=click.Path(dir_okay=False),
+              help="Append the metrics of the macro to this file "
+                   "periodically, rotating it.")
+@click.option('--metrics-interval', type=click.FloatRange(1, None),
+              default=60,
+              help="Seconds between the writes of the --metrics-file. "
+                   "Defaults to 60.")
 def interpret(**kwargs):
     """Interpret the MACRO in a FILE.
 
@@ -81,26 +431,250 @@ def interpret(**kwargs):
     macro = kwargs.get('macro')
     times = kwargs.get('times')
     opts = {
+        'async': kwargs.get('async_mode'),
+        'auto_region': kwargs.get('auto_region'),
+        'capture': kwargs.get('capture'),
+        'capture_path': kwargs.get('capture_path'),
         'color_match': kwargs.get('color_match'),
         'enable_retry': kwargs.get('enable_retry'),
         'file': file,
+        'frame_diff': kwargs.get('frame_diff'),
+        'location_cache': None,
+        'lookahead': kwargs.get('lookahead'),
+        'match_engine': kwargs.get('match_engine'),
         'match_step': kwargs.get('match_step'),
+        'match_workers': kwargs.get('match_workers'),
+        'metrics_file': kwargs.get('metrics_file'),
+        'metrics_interval': kwargs.get('metrics_interval'),
+        'metrics_port': kwargs.get('metrics_port'),
         'retry_times': kwargs.get('retry_times'),
-        'pause_on_fail': kwargs.get('pause_on_fail')
+        'pause_on_fail': kwargs.get('pause_on_fail'),
+        'region_padding': kwargs.get('region_padding'),
+        'stats': kwargs.get('stats'),
+        'template_cache_size': kwargs.get('template_cache_size') * 1024 * 1024,
+        'watcher_interval': kwargs.get('watcher_interval'),
     }
 
+    if kwargs.get('location_cache'):
+        from mausmakro.locations import default_cache_file
+
+        opts['location_cache'] = kwargs.get('location_cache_file') \
+            or default_cache_file()
+
+    from mausmakro.reloader import Reloader, compile_program
+
+    cache = program_cache(kwargs.get('program_cache'))
     try:
-        parser = Parser(file)
-        instructions, label_table = parser.parse()
-        parser.perform_checks()
-        parser.macro_exists(macro)
+        parser, (instructions, label_table, images, watchers) = \
+            compile_program(file, macro, cache, kwargs.get('optimize'))
+        opts['images'] = images
+        opts['watchers'] = watchers
+        if not opts['async'] and any(isinstance(ins, Block)
+                                     for ins in instructions):
+            print("The file uses RACE or PARALLEL, running in asyncio mode.")
+            opts['async'] = True
 
     except Exception as e:
         print(f"An error occurred while parsing the file:\n{e}")
         sys.exit(1)
 
-    program = Ui()
-    program.start(macro, times, instructions, label_table, opts)
+    reloader = None
+    if kwargs.get('watch'):
+        reloader = Reloader(file, macro, parser.sources, cache,
+                            kwargs.get('optimize'))
+
+    from mausmakro.events import ConsoleSink, EventPipeline, JsonLinesSink
+    from mausmakro.ui import Ui
+
+    level = Level.WARNING if kwargs.get('quiet') \
+        else Level[kwargs.get('log_level').upper()]
+    sinks = [ConsoleSink()]
+    if kwargs.get('log_json'):
+        sinks.append(JsonLinesSink(kwargs.get('log_json')))
+
+    program = Ui(EventPipeline(sinks, level))
+    program.start(macro, times, instructions, label_table, opts, reloader)
+
+
+@main.command()
+@click.argument('file', type=click.Path(exists=True))
+@click.argument('macro', type=str)
+@click.option('--times', '-t', type=click.IntRange(1, None), default=1,
+              help="Number of times to repeat the macro. Defaults to 1.")
+@click.option('--top', type=click.IntRange(1, None), default=10,
+              help="Number of the hottest lines and images reported. "
+                   "Defaults to 10.")
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help="File for the collapsed stacks, which flamegraph.pl and "
+                   "other flame graph tools read. Defaults to MACRO.folded.")
+@run_options('color_match', 'match_step', 'match_engine', 'capture',
+             'capture_path', 'program_cache')
+def profile(**kwargs):
+    """Interpret the MACRO in a FILE and report where the time went.
+
+    The time of every executed command is attributed to its line, to the
+    macro and the procedures on the call stack, and for the searches also
+    to the image, split into capturing, matching and waiting. The program
+    is not optimized, so that every command keeps its line. Stop the macro
+    with Ctrl+C to get the report of what has run so far.
+    """
+    from mausmakro.events import ConsoleSink, EventObserver, EventPipeline
+    from mausmakro.profiler import Profiler, ProfilingInterpreter
+    from mausmakro.reloader import compile_program
+
+    file = kwargs.get('file')
+    macro = kwargs.get('macro')
+    try:
+        parser, (instructions, label_table, images, watchers) = \
+            compile_program(file, macro,
+                            program_cache(kwargs.get('program_cache')),
+                            optimize=False)
+
+    except Exception as e:
+        print(f"An error occurred while parsing the file:\n{e}")
+        sys.exit(1)
+
+    opts = {
+        'capture': kwargs.get('capture'),
+        'capture_path': kwargs.get('capture_path'),
+        'color_match': kwargs.get('color_match'),
+        'enable_retry': False,
+        'file': file,
+        'images': images,
+        'match_engine': kwargs.get('match_engine'),
+        'match_step': kwargs.get('match_step'),
+        'pause_on_fail': False,
+        'retry_times': 1,
+        'watchers': watchers,
+    }
+
+    profiler = Profiler(instructions, parser.lines, label_table,
+                        parser.macros + parser.procedures)
+    events = EventPipeline([ConsoleSink()], Level.WARNING)
+    events.start()
+    interpreter = ProfilingInterpreter(instructions, label_table, opts,
+                                       profiler)
+    interpreter.register(EventObserver(events))
+    try:
+        for _ in range(kwargs.get('times')):
+            interpreter.interpret(macro)
+
+    # The EXIT command ends the macro too
+    except (KeyboardInterrupt, SystemExit):
+        interpreter.stop()
+
+    events.close()
+
+    output = kwargs.get('output') or f"{macro}.folded"
+    profiler.write_collapsed(output)
+    print('\n'.join(profiler.report(kwargs.get('top'))))
+    print(f"\nCollapsed stacks written to {output}")
+
+
+@main.command()
+@click.argument('file', type=click.Path(exists=True))
+@click.argument('macro')
+@click.argument('timeline', type=click.Path(exists=True))
+@click.option('--times', '-t', type=click.IntRange(1, None), default=1,
+              help="How many times to repeat the macro. Defaults to 1.")
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help="Output file for the clicks. If not specified, standard "
+                   "output is used.")
+@run_options('enable_retry', 'retry_times', 'color_match', 'match_step',
+             'match_engine', 'watcher_interval', 'program_cache', 'optimize')
+@click.option('--log-level', type=click.Choice(Level.names()),
+              default='warning',
+              help="Print only the messages of this level or higher. "
+                   "Defaults to warning.")
+def simulate(**kwargs):
+    """Simulate the MACRO in a FILE on a recorded TIMELINE of the screen.
+
+    The macro runs on a virtual clock, the waits and timeouts take no time.
+    The screen is the frame of the TIMELINE at the virtual time, a directory
+    or a zip or tar archive of images named by their time in seconds, like
+    1.5.png. The clicks are listed with their virtual time instead of done.
+    Fails if the macro does.
+    """
+    from mausmakro.clock import VirtualClock
+    from mausmakro.events import ConsoleSink, EventObserver, EventPipeline
+    from mausmakro.lib.exceptions import MausMakroException
+    from mausmakro.reloader import compile_program
+    from mausmakro.simulation import SimulatedInterpreter
+
+    file = kwargs.get('file')
+    macro = kwargs.get('macro')
+    try:
+        _, (instructions, label_table, images, watchers) = \
+            compile_program(file, macro,
+                            program_cache(kwargs.get('program_cache')),
+                            kwargs.get('optimize'))
+
+    except Exception as e:
+        print(f"An error occurred while parsing the file:\n{e}")
+        sys.exit(1)
+
+    if any(isinstance(ins, Block) for ins in instructions):
+        print("RACE and PARALLEL blocks cannot be simulated.")
+        sys.exit(1)
+
+    opts = {
+        'capture_path': kwargs.get('timeline'),
+        'color_match': kwargs.get('color_match'),
+        'enable_retry': kwargs.get('enable_retry'),
+        'file': file,
+        'images': images,
+        'match_engine': kwargs.get('match_engine'),
+        'match_step': kwargs.get('match_step'),
+        'pause_on_fail': False,
+        'retry_times': kwargs.get('retry_times'),
+        'watcher_interval': kwargs.get('watcher_interval'),
+        'watchers': watchers,
+    }
+
+    events = EventPipeline([ConsoleSink()],
+                           Level[kwargs.get('log_level').upper()])
+    events.start()
+    start = perf_counter()
+    try:
+        interpreter = SimulatedInterpreter(instructions, label_table, opts,
+                                           VirtualClock())
+
+    except MausMakroException as e:
+        events.close()
+        print(f"Failed to start the simulation:\n{e}")
+        sys.exit(2)
+
+    interpreter.register(EventObserver(events))
+    runs = 0
+    try:
+        while runs < kwargs.get('times') and interpreter.error is None:
+            interpreter.interpret(macro)
+            runs += 1
+
+    # Like running out of the retries, not reported by the interpreter
+    except MausMakroException as e:
+        interpreter.notify(MessageType.MAUSMAKRO_EXCEPTION, str(e))
+        runs += 1
+
+    # The EXIT command ends the macro
+    except SystemExit:
+        runs += 1
+
+    events.close()
+
+    log = '\n'.join(map(str, interpreter.clicks))
+    if kwargs.get('output'):
+        with open(kwargs.get('output'), 'w', encoding='utf-8') as output:
+            output.write(log + '\n' if log else '')
+
+    elif log:
+        print(log)
+
+    print(f"Simulated {runs} runs, {interpreter.clock.now:.3f} s of the "
+          f"virtual time in {perf_counter() - start:.3f} s.",
+          file=sys.stderr)
+    if interpreter.error is not None:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
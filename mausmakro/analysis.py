@@ -0,0 +1,413 @@
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from mausmakro.lib.enums import DiagnosticKind, OPCODE_CODES, Opcode
+from mausmakro.lib.types import Block, Instruction
+
+CALL = OPCODE_CODES[Opcode.CALL]
+END = OPCODE_CODES[Opcode.END]
+IF = OPCODE_CODES[Opcode.IF]
+JUMP = OPCODE_CODES[Opcode.JUMP]
+PARALLEL = OPCODE_CODES[Opcode.PARALLEL]
+RACE = OPCODE_CODES[Opcode.RACE]
+RETURN = OPCODE_CODES[Opcode.RETURN]
+
+# Commands moving the mouse
+INPUTS = frozenset(OPCODE_CODES[opcode] for opcode in (
+    Opcode.CLICK, Opcode.DOUBLE_CLICK, Opcode.PCLICK
+))
+
+
+class Diagnostic:
+    kind: DiagnosticKind
+    name: str
+    message: str
+
+    def __init__(self, kind: DiagnosticKind, name: str, message: str):
+        self.kind = kind
+        self.name = name
+        self.message = message
+
+    def __eq__(self, other):
+        return self.kind == other.kind and self.name == other.name \
+            and self.message == other.message
+
+    def __repr__(self):
+        return f"Diagnostic({self.kind.value}, {self.name!r})"
+
+    def __str__(self):
+        return self.message
+
+
+class Routine:
+    """Code entered at a label, as a macro or by a CALL."""
+    callees: Set[int]
+    entry: int
+    reaches_end: bool
+    return_at: int
+    returns: bool
+    visited: Set[int]
+
+    def __init__(self, entry: int):
+        self.callees = set()
+        self.entry = entry
+        self.reaches_end = False
+        self.return_at = -1
+        self.returns = False
+        self.visited = set()
+
+
+class CallGraph:
+    """Analysis of the control flow between the macros and procedures.
+
+    Every routine is walked from its entry once, following the jumps and
+    both ways of the conditionals. The walk continues after a CALL only
+    when the callee can return, and is resumed from there as soon as it is
+    found out the callee can. So the whole program is walked in linear
+    time, and a routine which can return only through an endless recursion
+    is never marked as returning. PARALLEL continues when all its branches
+    can finish, RACE when any of them can.
+    """
+    _handlers: List[str]
+    _instructions: List[Instruction]
+    _label_names: Dict[int, str]
+    _label_table: Dict[str, int]
+    _macros: List[str]
+    _procedures: List[str]
+    _reached: bytearray
+    _routines: Dict[int, Routine]
+    _starts: List[int]
+    _waiting: Dict[int, List[Tuple[Routine, int]]]
+
+    def __init__(self, instructions: List[Instruction],
+                 label_table: Dict[str, int], macros: List[str],
+                 procedures: List[str], handlers: Iterable[str] = ()):
+        self._instructions = instructions
+        self._label_names = {i: label for label, i in label_table.items()}
+        self._label_table = label_table
+        self._macros = macros
+        self._handlers = list(handlers)
+        self._procedures = procedures
+        self._reached = bytearray(len(instructions))
+        self._routines = {}
+        # Macros and procedures are consecutive blocks of the instructions
+        self._starts = sorted(label_table[name]
+                              for name in (*macros, *procedures))
+        self._waiting = {}
+
+    def analyze(self) -> List[Diagnostic]:
+        self._walk()
+        ending = self._ending()
+        return self._unreachable() + self._recursion(ending) \
+            + self._empty_returns() + self._no_end(ending)
+
+    def parallel_inputs(self) -> List[Tuple[str, str]]:
+        """Procedures which can click, called by a branch of PARALLEL.
+
+        Pairs of the macro or procedure with the PARALLEL and the called
+        procedure, the branches of PARALLEL may not click at all.
+        """
+        found = []
+        for i, ins in enumerate(self._instructions):
+            if ins.code != PARALLEL:
+                continue
+
+            for cmd in ins.branches:
+                if cmd.code == CALL and self._can_click(self._index(cmd.arg)):
+                    found.append((self._owner(i),
+                                  self._label_names[self._index(cmd.arg)]))
+
+        return found
+
+    def _index(self, target: Union[str, int]) -> int:
+        return target if isinstance(target, int) else self._label_table[target]
+
+    def _routine(self, entry: int, work: List[Tuple[Routine, int]]) \
+            -> Routine:
+        routine = self._routines.get(entry)
+        if routine is None:
+            routine = self._routines[entry] = Routine(entry)
+            work.append((routine, entry))
+
+        return routine
+
+    def _walk(self):
+        instructions = self._instructions
+        reached = self._reached
+        work = []
+        # Procedures called by the watchers can run at any time
+        for name in (*self._macros, *self._handlers):
+            self._routine(self._label_table[name], work)
+
+        while work:
+            routine, i = work.pop()
+            visited = routine.visited
+            while i not in visited:
+                visited.add(i)
+                reached[i] = 1
+                ins = instructions[i]
+                code = ins.code
+
+                if code == END:
+                    routine.reaches_end = True
+                    break
+
+                elif code == RETURN:
+                    if not routine.returns:
+                        routine.returns = True
+                        routine.return_at = i
+                        work.extend(self._waiting.pop(routine.entry, ()))
+                    break
+
+                elif code == JUMP:
+                    i = self._index(ins.arg)
+                    continue
+
+                elif code == IF:
+                    target = ins.end_label if ins.else_label is None \
+                        else ins.else_label
+                    work.append((routine, self._index(target)))
+
+                elif code == CALL:
+                    callee = self._routine(self._index(ins.arg), work)
+                    routine.callees.add(callee.entry)
+                    if not callee.returns:
+                        self._waiting.setdefault(callee.entry, []).append(
+                            (routine, i + 1)
+                        )
+                        break
+
+                elif code == PARALLEL or code == RACE:
+                    if not self._block(routine, ins, i, work):
+                        break
+
+                i += 1
+
+    def _block(self, routine: Routine, block: Block, index: int,
+               work: List[Tuple[Routine, int]]) -> bool:
+        """Whether the walk continues after the block right away."""
+        callees = []
+        finishing = False
+        for cmd in block.branches:
+            if cmd.code != CALL:
+                finishing = True
+                continue
+
+            callee = self._routine(self._index(cmd.arg), work)
+            routine.callees.add(callee.entry)
+            callees.append(callee)
+            finishing = finishing or callee.returns
+
+        if block.code == RACE:
+            if not finishing:
+                for callee in callees:
+                    self._waiting.setdefault(callee.entry, []).append(
+                        (routine, index + 1)
+                    )
+
+            return finishing
+
+        for callee in callees:
+            if not callee.returns:
+                # Checked again once the callee returns
+                routine.visited.discard(index)
+                self._waiting.setdefault(callee.entry, []).append(
+                    (routine, index)
+                )
+                return False
+
+        return True
+
+    def _can_click(self, entry: int) -> bool:
+        """Whether the code entered at the index can click, or a callee."""
+        instructions = self._instructions
+        visited = set()
+        work = [entry]
+        while work:
+            i = work.pop()
+            while i not in visited:
+                visited.add(i)
+                ins = instructions[i]
+                code = ins.code
+
+                if code in INPUTS:
+                    return True
+
+                if code == END or code == RETURN:
+                    break
+
+                if code == JUMP:
+                    i = self._index(ins.arg)
+                    continue
+
+                if code == IF:
+                    work.append(self._index(
+                        ins.end_label if ins.else_label is None
+                        else ins.else_label
+                    ))
+
+                elif code == CALL:
+                    work.append(self._index(ins.arg))
+
+                elif code == PARALLEL or code == RACE:
+                    for cmd in ins.branches:
+                        if cmd.code in INPUTS:
+                            return True
+
+                        if cmd.code == CALL:
+                            work.append(self._index(cmd.arg))
+
+                i += 1
+
+        return False
+
+    def _ending(self) -> Set[int]:
+        """Entries of the routines which can reach END, or call one."""
+        callers = {}
+        for routine in self._routines.values():
+            for callee in routine.callees:
+                callers.setdefault(callee, []).append(routine.entry)
+
+        ending = set()
+        stack = [r.entry for r in self._routines.values() if r.reaches_end]
+        while stack:
+            entry = stack.pop()
+            if entry not in ending:
+                ending.add(entry)
+                stack.extend(callers.get(entry, ()))
+
+        return ending
+
+    def _describe(self, entry: int) -> str:
+        name = self._label_names[entry]
+        if name in self._macros:
+            return f"Macro {name}"
+
+        if name in self._procedures:
+            return f"Procedure {name}"
+
+        return f"Label {name}"
+
+    def _owner(self, index: int) -> str:
+        return self._label_names[self._starts[
+            bisect_right(self._starts, index) - 1
+        ]]
+
+    def _unreachable(self) -> List[Diagnostic]:
+        return [
+            Diagnostic(DiagnosticKind.UNREACHABLE_PROCEDURE, name,
+                       f"Procedure {name} is never called from any macro.")
+            for name in self._procedures
+            if not self._reached[self._label_table[name]]
+        ]
+
+    def _empty_returns(self) -> List[Diagnostic]:
+        diagnostics = []
+        for macro in self._macros:
+            routine = self._routines[self._label_table[macro]]
+            if routine.returns:
+                owner = self._owner(routine.return_at)
+                where = '' if owner == macro else f" in {owner}"
+                diagnostics.append(Diagnostic(
+                    DiagnosticKind.EMPTY_RETURN, macro,
+                    f"Macro {macro} can RETURN{where} "
+                    "with an empty call stack."
+                ))
+
+        return diagnostics
+
+    def _no_end(self, ending: Set[int]) -> List[Diagnostic]:
+        return [
+            Diagnostic(DiagnosticKind.NO_END, macro,
+                       f"Macro {macro} can never reach its END.")
+            for macro in self._macros
+            if self._label_table[macro] not in ending
+        ]
+
+    def _recursion(self, ending: Set[int]) -> List[Diagnostic]:
+        diagnostics = []
+        for component in self._cycles():
+            stuck = [entry for entry in component
+                     if not self._routines[entry].returns
+                     and entry not in ending]
+            if not stuck:
+                continue
+
+            entry = min(stuck)
+            cycle = ' -> '.join(self._label_names[e]
+                                for e in self._cycle(entry, set(component)))
+            diagnostics.append(Diagnostic(
+                DiagnosticKind.RECURSION, self._label_names[entry],
+                f"{self._describe(entry)} calls itself through {cycle} "
+                "and can never return."
+            ))
+
+        return diagnostics
+
+    def _cycles(self) -> List[List[int]]:
+        """Strongly connected components of the calls, which are cycles."""
+        # Iterative Tarjan's algorithm, the call chains can be very deep
+        index, low, on_stack = {}, {}, set()
+        stack, components = [], []
+        for root in sorted(self._routines):
+            if root in index:
+                continue
+
+            frames = [(root, iter(sorted(self._routines[root].callees)))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while frames:
+                entry, callees = frames[-1]
+                for callee in callees:
+                    if callee not in index:
+                        index[callee] = low[callee] = len(index)
+                        stack.append(callee)
+                        on_stack.add(callee)
+                        frames.append((callee, iter(
+                            sorted(self._routines[callee].callees)
+                        )))
+                        break
+
+                    if callee in on_stack:
+                        low[entry] = min(low[entry], index[callee])
+
+                else:
+                    frames.pop()
+                    if frames:
+                        parent = frames[-1][0]
+                        low[parent] = min(low[parent], low[entry])
+
+                    if low[entry] == index[entry]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == entry:
+                                break
+
+                        if len(component) > 1 \
+                                or entry in self._routines[entry].callees:
+                            components.append(sorted(component))
+
+        return components
+
+    def _cycle(self, entry: int, component: Set[int]) -> List[int]:
+        """Shortest chain of calls from the entry back to itself."""
+        previous = {}
+        queue = [entry]
+        for current in queue:
+            for callee in sorted(self._routines[current].callees):
+                if callee == entry:
+                    path = [entry]
+                    while current != entry:
+                        path.append(current)
+                        current = previous[current]
+                    return [entry] + path[:0:-1] + [entry]
+
+                if callee in component and callee not in previous:
+                    previous[callee] = current
+                    queue.append(callee)
+
+        return [entry, entry]
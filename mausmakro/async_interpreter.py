@@ -0,0 +1,437 @@
+import asyncio
+import copy
+from contextlib import suppress
+from functools import partial
+from time import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from mausmakro.finder import Steps, cooperative
+from mausmakro.interpreter import DEBUG, END_CODE, WARNING, Interpreter
+from mausmakro.lib.enums import OPCODE_CODES, Opcode
+from mausmakro.lib.exceptions import ConditionException, \
+    InterruptException, MausMakroException, RetryException
+from mausmakro.lib.observable import Level, MessageType
+from mausmakro.lib.types import Block, Command, Conditional, Instruction, \
+    Stack
+
+# Pushed by the CALL of a branch, returning to it ends the branch
+BRANCH_RETURN = -2
+
+AsyncHandler = Callable[[Any], Awaitable[None]]
+
+
+class AsyncInterpreter(Interpreter):
+    """Executes the program in an asyncio event loop.
+
+    Searches, waits and pauses are coroutines, so the branches of RACE and
+    PARALLEL run at the same time, each one on a copy of the interpreter
+    with its own program counter and call stack. Every branch is run until
+    it finishes its command, or returns from the procedure it calls.
+
+    The first branch of RACE to finish wins and the others are cancelled.
+    A branch about to click wins right away, so only one of the branches
+    ever gets to click. Clicks of all the branches are serialized through
+    one input lock.
+    """
+    _branch_command: Optional[Command] = None
+    _claims: Tuple[Callable[[], None], ...]
+    _coroutines: List[AsyncHandler]
+    _input_lock: Optional[asyncio.Lock]
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _task: Optional[asyncio.Task]
+
+    # How often a paused macro checks whether to continue, in seconds
+    RESUME_INTERVAL = 0.1
+
+    def __init__(self, instructions,
+                 label_table: Dict[str, int],
+                 opts: Dict[str, Any]):
+        super(AsyncInterpreter, self).__init__(instructions, label_table, opts)
+        self._claims = ()
+        self._coroutines = self._coroutine_table()
+        self._input_lock = None
+        self._loop = None
+        self._task = None
+
+    def _interpret(self, macro: str):
+        self._cont_flag.set()
+        with suppress(asyncio.CancelledError):
+            asyncio.run(self._main(macro))
+
+    def stop(self):
+        super(AsyncInterpreter, self).stop()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            # The loop may have just finished
+            with suppress(RuntimeError):
+                loop.call_soon_threadsafe(task.cancel)
+
+    async def _main(self, macro: str):
+        self._input_lock = asyncio.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._program_counter = self._label_table[macro]
+
+        retries = 0
+        try:
+            while not self._exit_flag.is_set():
+                try:
+                    await self._run()
+                    return
+
+                except InterruptException:
+                    self._call_handler()
+
+                except MausMakroException as e:
+                    if self._exit_flag.is_set():
+                        return
+
+                    self.metrics.failures.inc()
+                    self.notify_msg("Command execution failed",
+                                    level=WARNING)
+                    if (
+                            self.opts['enable_retry']
+                            and retries <= self.opts['retry_times']
+                    ):
+                        self.notify_msg(
+                            "Command retry enabled, retrying command..."
+                        )
+                        await self._retry(
+                            self._instructions[self._program_counter]
+                        )
+
+                    elif self.opts['pause_on_fail']:
+                        self.notify_msg("Pause on fail option enabled.")
+                        self.pause_execution()
+
+                    else:
+                        self.notify(MessageType.MAUSMAKRO_EXCEPTION, str(e))
+                        return
+
+        finally:
+            self._loop = None
+            self._task = None
+
+    async def _run(self) -> bool:
+        """Run until END, or until the program counter leaves the program.
+
+        Returns whether END was reached, the program counter stays on it.
+        """
+        cont_flag = self._cont_flag
+        exit_flag = self._exit_flag
+        coroutines = self._coroutines
+        instructions = self._instructions
+        interrupt = self._interrupt
+        count_executed = self.metrics.instructions.inc
+
+        while self._program_counter >= 0 and not exit_flag.is_set():
+            if not cont_flag.is_set():
+                await self._resumed()
+                continue
+
+            if interrupt.is_set():
+                raise InterruptException("Interrupted by a watcher")
+
+            instr = instructions[self._program_counter]
+            if instr.code == END_CODE:
+                return True
+
+            await coroutines[instr.code](instr)
+            self._program_counter += 1
+            count_executed()
+
+        return False
+
+    async def _resumed(self):
+        # Polled, a thread waiting for the flag could not be cancelled
+        while not self._cont_flag.is_set():
+            await asyncio.sleep(self.RESUME_INTERVAL)
+
+    async def _retry(self, instr: Instruction):
+        retries = 1
+
+        while retries <= self.opts['retry_times']:
+            await self._resumed()
+            if self._exit_flag.is_set():
+                return
+
+            self.notify_msg("Retries: %d/%d", retries,
+                            self.opts['retry_times'])
+            self.metrics.retries.inc()
+
+            try:
+                await self._coroutines[instr.code](instr)
+                return
+
+            except InterruptException:
+                # The command is run again after the handler has returned
+                self._call_handler()
+                return
+
+            except Exception as e:
+                self.notify_msg("Retry failed: %s", e, level=WARNING)
+                retries += 1
+
+        raise RetryException("Maximum retries reached, giving up.")
+
+    def _coroutine_table(self) -> List[AsyncHandler]:
+        coroutines = {
+            Opcode.CLICK: self._co_click,
+            Opcode.DOUBLE_CLICK: self._co_double_click,
+            Opcode.FIND: self._co_find,
+            Opcode.FIND_ALL: self._co_find_all,
+            Opcode.FIND_ANY: self._co_find_any,
+            Opcode.IF: self._co_if,
+            Opcode.PARALLEL: self._co_parallel,
+            Opcode.PAUSE: self._co_pause,
+            Opcode.PCLICK: self._co_pclick,
+            Opcode.PFIND: self._co_pfind,
+            Opcode.RACE: self._co_race,
+            Opcode.WAIT: self._co_wait,
+            Opcode.WAIT_UNTIL: self._co_wait_until,
+            Opcode.WAIT_WHILE: self._co_wait_while,
+        }
+
+        # Instructions which never wait run as they are
+        table = [self._immediate(handler) for handler in self._handlers]
+        for opcode, coroutine in coroutines.items():
+            table[OPCODE_CODES[opcode]] = coroutine
+
+        return table
+
+    @staticmethod
+    def _immediate(handler: Callable[[Any], None]) -> AsyncHandler:
+        async def run(instruction: Instruction):
+            handler(instruction)
+
+        return run
+
+    async def _co_click(self, command: Command):
+        await self._do_click_async(command.arg)
+
+    async def _co_double_click(self, command: Command):
+        await self._do_click_async(command.arg, is_double=True)
+
+    async def _co_find(self, command: Command):
+        await cooperative(self._find_image_steps(
+            *command.arg,
+            grayscale=not self.opts['color_match'],
+            match_step=self.opts['match_step']
+        ), self._interrupt)
+
+    async def _co_find_all(self, command: Command):
+        await cooperative(self._find_images_steps(
+            *command.arg,
+            grayscale=not self.opts['color_match'],
+            match_step=self.opts['match_step'],
+            require_all=True
+        ), self._interrupt)
+
+    async def _co_find_any(self, command: Command):
+        await cooperative(self._find_images_steps(
+            *command.arg,
+            grayscale=not self.opts['color_match'],
+            match_step=self.opts['match_step']
+        ), self._interrupt)
+
+    async def _co_if(self, cond: Conditional):
+        try:
+            await self._coroutines[cond.condition.code](cond.condition)
+            failed = True if cond.negate else False
+
+        except ConditionException:
+            failed = False if cond.negate else True
+
+        if cond.else_label is not None and failed:
+            self._jump(cond.else_label)
+
+        elif failed:
+            self._jump(cond.end_label)
+
+    async def _co_parallel(self, block: Block):
+        branches = [self._branch(cmd, self._claims) for cmd in block.branches]
+        tasks = [asyncio.ensure_future(b._run_branch()) for b in branches]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+
+        finally:
+            await self._cancel(tasks)
+
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+        self._found_images = set().union(*(b._found_images
+                                           for b in branches))
+        for task in tasks:
+            self._finish_block(task.result())
+
+    async def _co_pause(self, _: Command):
+        self.pause_execution()
+        await self._resumed()
+
+    async def _co_pclick(self, command: Command):
+        await self._do_click_async(command.arg, precise=True)
+
+    async def _co_pfind(self, command: Command):
+        await cooperative(self._find_image_steps(*command.arg,
+                                                 grayscale=False,
+                                                 match_step=1),
+                          self._interrupt)
+
+    async def _co_race(self, block: Block):
+        tasks = []
+        winner: Optional[asyncio.Task] = None
+
+        def claim(index: int):
+            nonlocal winner
+            if winner is None:
+                winner = tasks[index]
+                for task in tasks:
+                    if task is not winner:
+                        task.cancel()
+
+            elif winner is not tasks[index]:
+                raise asyncio.CancelledError()
+
+        # Claims of the branch are bound to it, nested blocks claim it too
+        branches = [self._branch(cmd, (*self._claims, partial(claim, i)))
+                    for i, cmd in enumerate(block.branches)]
+        tasks.extend(asyncio.ensure_future(b._run_branch()) for b in branches)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.cancelled() \
+                            or winner is not None and task is not winner:
+                        continue
+
+                    error = task.exception()
+                    if isinstance(error, InterruptException):
+                        raise error
+
+                    if winner is None \
+                            and isinstance(error, MausMakroException):
+                        continue
+
+                    winner = task
+                    branch = branches[tasks.index(task)]
+                    # Raised when the branch which has clicked fails
+                    self._finish_block(task.result())
+                    self._found_images = branch._found_images
+                    return
+
+        finally:
+            await self._cancel(pending)
+
+        raise ConditionException(f"None of the {len(tasks)} branches of "
+                                 "RACE has finished")
+
+    async def _co_wait(self, command: Command):
+        self.notify_msg("Waiting %s seconds", command.arg, level=DEBUG)
+        lookahead = self._start_lookahead() if self._watcher is None else None
+        if lookahead is not None:
+            await cooperative(self._lookahead_steps(command.arg, *lookahead))
+            return
+
+        if self._watcher is None:
+            await asyncio.sleep(command.arg)
+            return
+
+        await cooperative(self._sleep_steps(command.arg), self._interrupt)
+
+    def _sleep_steps(self, seconds: float) -> Steps[None]:
+        # Woken up regularly to see whether a watcher has interrupted it
+        end = time() + seconds
+        remaining = seconds
+        while remaining > 0:
+            yield min(remaining, self.RESUME_INTERVAL)
+            remaining = end - time()
+
+    async def _co_wait_until(self, command: Command):
+        await cooperative(self._wait_image_steps(*command.arg),
+                          self._interrupt)
+
+    async def _co_wait_while(self, command: Command):
+        await cooperative(self._wait_image_steps(*command.arg, gone=True),
+                          self._interrupt)
+
+    def _branch(self, command: Command,
+                claims: Tuple[Callable[[], None], ...]) -> 'AsyncInterpreter':
+        branch = copy.copy(self)
+        branch._call_stack = Stack()
+        branch._claims = claims
+        branch._found_images = set(self._found_images)
+        branch._handler_depth = 0
+        branch._lookahead = None
+        branch._handlers = branch._dispatch_table()
+        branch._coroutines = branch._coroutine_table()
+        branch._program_counter = BRANCH_RETURN
+        branch._branch_command = command
+        return branch
+
+    async def _run_branch(self) -> int:
+        """Run the command of the branch, the index of END if reached."""
+        command = self._branch_command
+        await self._coroutines[command.code](command)
+        if command.code != OPCODE_CODES[Opcode.CALL]:
+            return -1
+
+        self._program_counter += 1
+        return self._program_counter if await self._run() else -1
+
+    def _finish_block(self, end: int):
+        # Macro called by a branch ends the whole macro at its END
+        if end >= 0:
+            self._program_counter = end - 1
+
+    @staticmethod
+    async def _cancel(tasks):
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _do_click_async(self, args: Tuple[Any, Any], is_double=False,
+                              precise=False):
+        clicks = 2 if is_double else 1
+
+        if isinstance(args[0], int):
+            self.notify_msg("Clicking at %s,%s", args[0], args[1],
+                            level=DEBUG)
+            await self._input(args[0], args[1], clicks)
+            return
+
+        if precise:
+            coords = await cooperative(self._find_image_steps(
+                *args,
+                grayscale=False,
+                match_step=1
+            ), self._interrupt)
+        else:
+            coords = await cooperative(self._find_image_steps(
+                *args,
+                grayscale=not self.opts['color_match'],
+                match_step=self.opts['match_step']
+            ), self._interrupt)
+
+        await self._input(*coords, clicks)
+
+    async def _input(self, x: int, y: int, clicks: int):
+        for claim in self._claims:
+            claim()
+
+        async with self._input_lock:
+            click = asyncio.get_running_loop().run_in_executor(
+                None, self._click, x, y, clicks
+            )
+            try:
+                await asyncio.shield(click)
+
+            except asyncio.CancelledError:
+                # Started click cannot be taken back, keep the lock until done
+                await asyncio.wait({click})
+                raise
@@ -0,0 +1,236 @@
+import json
+import random
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from mausmakro.capture import Capture
+from mausmakro.finder import ImageFinder
+from mausmakro.lib.enums import MatchEngine
+from mausmakro.lib.exceptions import BenchException
+from mausmakro.matching import Box, ENGINES
+
+MANIFEST = 'corpus.json'
+
+# Found location may differ from the expected one by this many pixels
+TOLERANCE = 2
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4K': (3840, 2160),
+}
+
+
+class CorpusCapture(Capture):
+    """Serves the screenshot of the currently measured case."""
+    frame: Optional[np.ndarray]
+
+    def __init__(self):
+        super(CorpusCapture, self).__init__()
+        self.frame = None
+
+    def _grab(self, region: Optional[Box]) -> np.ndarray:
+        if region:
+            left, top, width, height = region
+            return self.frame[top:top + height, left:left + width]
+
+        return self.frame
+
+
+def generate_screen(size, seed: int) -> np.ndarray:
+    """Draw a desktop-like screen full of colored boxes and text."""
+    rnd = random.Random(seed)
+    width, height = size
+    screen = np.full((height, width, 3), 235, dtype=np.uint8)
+
+    for _ in range(width * height // 20000):
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        w, h = rnd.randrange(40, 400), rnd.randrange(20, 200)
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        cv2.rectangle(screen, (x, y), (x + w, y + h), color, -1)
+
+    for _ in range(width * height // 8000):
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        text = ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz ')
+                       for _ in range(rnd.randrange(3, 16)))
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        cv2.putText(screen, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    rnd.uniform(0.4, 1.0), color, 1, cv2.LINE_AA)
+
+    return screen
+
+
+def draw_button(label: str, size=(120, 36)) -> np.ndarray:
+    button = np.full((size[1], size[0], 3), (200, 120, 40), dtype=np.uint8)
+    cv2.rectangle(button, (0, 0), (size[0] - 1, size[1] - 1), (90, 50, 10), 2)
+    cv2.putText(button, label, (10, size[1] - 12), cv2.FONT_HERSHEY_SIMPLEX,
+                0.6, (255, 255, 255), 1, cv2.LINE_AA)
+    return button
+
+
+def generate_corpus(path: str, screens: int = 3,
+                    resolutions: Optional[Dict[str, Any]] = None):
+    """Generate a synthetic corpus of screenshots and templates.
+
+    Every screen gets a hit (the template is on the screen), a miss (the
+    template is not there at all) and a near miss (a button differing only
+    in its label is there instead).
+    """
+    root = Path(path)
+    root.joinpath('screens').mkdir(parents=True, exist_ok=True)
+    root.joinpath('templates').mkdir(parents=True, exist_ok=True)
+    resolutions = resolutions or RESOLUTIONS
+
+    cases = []
+    seed = 0
+    for res_name, size in resolutions.items():
+        for i in range(screens):
+            seed += 1
+            rnd = random.Random(seed)
+            screen = generate_screen(size, seed)
+            name = f'{res_name}_{i}'
+
+            hit = draw_button(f'Ok {seed}')
+            near = draw_button(f'Ok {seed + 1}')
+            miss = draw_button(f'Cancel {seed}')
+            h, w = hit.shape[:2]
+
+            hit_pos = rnd.randrange(size[0] - w), rnd.randrange(size[1] - h)
+            near_pos = rnd.randrange(size[0] - w), rnd.randrange(size[1] - h)
+            screen[near_pos[1]:near_pos[1] + h,
+                   near_pos[0]:near_pos[0] + w] = near
+            screen[hit_pos[1]:hit_pos[1] + h, hit_pos[0]:hit_pos[0] + w] = hit
+
+            # Near miss template differs from both buttons only in its label
+            templates = {'hit': hit, 'miss': miss,
+                         'near_miss': draw_button(f'Ok {seed + 2}')}
+            cv2.imwrite(str(root.joinpath(f'screens/{name}.png')), screen)
+            for kind, template in templates.items():
+                file = f'templates/{name}_{kind}.png'
+                cv2.imwrite(str(root.joinpath(file)), template)
+                cases.append({
+                    'resolution': res_name,
+                    'screen': f'screens/{name}.png',
+                    'template': file,
+                    'kind': kind,
+                    'expected': list(hit_pos) if kind == 'hit' else None,
+                })
+
+    with open(root.joinpath(MANIFEST), 'w') as manifest:
+        json.dump({'cases': cases}, manifest, indent=2)
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(Path(path).joinpath(MANIFEST)) as manifest:
+            cases = json.load(manifest)['cases']
+
+    except (OSError, ValueError, KeyError) as e:
+        raise BenchException(f"Failed to load corpus {path}: {e}")
+
+    for case in cases:
+        case['screen'] = str(Path(path).joinpath(case['screen']))
+        case['template'] = str(Path(path).joinpath(case['template']))
+
+    return cases
+
+
+def configurations(engines: Iterable[str] = ENGINES,
+                   steps: Iterable[int] = (1, 2)) -> List[Dict[str, Any]]:
+    """All the FIND and PFIND variants of the interpret options."""
+    configs = []
+    for engine in engines:
+        # The match step is used only by the step engine
+        engine_steps = steps if engine == MatchEngine.STEP else (1,)
+        for color in (False, True):
+            for step in engine_steps:
+                configs.append({'command': 'FIND', 'match_engine': engine,
+                                'match_step': step, 'color_match': color})
+
+        configs.append({'command': 'PFIND', 'match_engine': engine,
+                        'match_step': 1, 'color_match': True})
+
+    return configs
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def is_correct(box: Optional[Box], expected: Optional[Tuple[int, int]]):
+    if box is None or expected is None:
+        return box is None and expected is None
+
+    return abs(box[0] - expected[0]) <= TOLERANCE \
+        and abs(box[1] - expected[1]) <= TOLERANCE
+
+
+def run_configuration(cases: List[Dict[str, Any]], config: Dict[str, Any],
+                      runs: int = 1,
+                      opts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run the finder over the corpus with the interpret options."""
+    capture = CorpusCapture()
+    finder = ImageFinder({**(opts or {}), **config}, capture=capture)
+    grayscale = not config['color_match'] and config['command'] == 'FIND'
+    step = config['match_step'] if config['command'] == 'FIND' else 1
+    finder.templates.preload(case['template'] for case in cases)
+
+    screens = {}
+    for case in cases:
+        if case['screen'] not in screens:
+            screen = cv2.imread(case['screen'])
+            if screen is None:
+                raise BenchException(f"Failed to read {case['screen']}!")
+
+            screens[case['screen']] = screen
+
+    times = []
+    kinds = {}
+    for case in cases:
+        capture.frame = screens[case['screen']]
+        expected = tuple(case['expected']) if case['expected'] else None
+        for _ in range(runs):
+            start = perf_counter()
+            box = finder.find(case['template'], 0, grayscale=grayscale,
+                              match_step=step)
+            times.append(perf_counter() - start)
+
+            result = kinds.setdefault(case['kind'], {'total': 0, 'correct': 0})
+            result['total'] += 1
+            result['correct'] += is_correct(box, expected)
+
+    total = sum(times)
+    return {
+        **config,
+        'finds': len(times),
+        'p50_ms': percentile(times, 50) * 1000,
+        'p95_ms': percentile(times, 95) * 1000,
+        'p99_ms': percentile(times, 99) * 1000,
+        'throughput': len(times) / total if total else 0.0,
+        'correct': sum(k['correct'] for k in kinds.values()),
+        'kinds': kinds,
+    }
+
+
+def run_bench(corpus: str, configs: List[Dict[str, Any]], runs: int = 1,
+              resolutions: Optional[Iterable[str]] = None,
+              opts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    cases = load_corpus(corpus)
+    if resolutions:
+        cases = [c for c in cases if c['resolution'] in resolutions]
+
+    results = []
+    for resolution in dict.fromkeys(c['resolution'] for c in cases):
+        res_cases = [c for c in cases if c['resolution'] == resolution]
+        for config in configs:
+            result = run_configuration(res_cases, config, runs, opts)
+            results.append({'resolution': resolution, **result})
+
+    return {'corpus': str(corpus), 'runs': runs, 'results': results}
@@ -0,0 +1,284 @@
+import tarfile
+import threading
+import zipfile
+from bisect import bisect_right
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from mausmakro.clock import Clock
+from mausmakro.lib.enums import CaptureBackend
+from mausmakro.lib.exceptions import CaptureException
+from mausmakro.matching import Box
+
+IMAGE_SUFFIXES = ('.jpeg', '.jpg', '.png')
+
+
+class Capture:
+    """Screen capture backend.
+
+    Frames are returned as BGR or BGRA numpy arrays, whichever is native to
+    the backend, so no conversion is done before it is really needed.
+    """
+    frames: int
+    last_time: float
+    total_time: float
+
+    def __init__(self):
+        self.frames = 0
+        self.last_time = 0.0
+        self.total_time = 0.0
+
+    def grab(self, region: Optional[Box] = None) -> np.ndarray:
+        start = perf_counter()
+        frame = self._grab(region)
+
+        self.last_time = perf_counter() - start
+        self.total_time += self.last_time
+        self.frames += 1
+        return frame
+
+    def screen_size(self) -> Tuple[int, int]:
+        """Width and height of the whole captured screen.
+
+        Measured on a grab, so the size is in the pixels of the frames,
+        which are not the logical pixels of the screen on a Retina display.
+        """
+        frame = self._grab(None)
+        return frame.shape[1], frame.shape[0]
+
+    def stats(self) -> Dict[str, float]:
+        avg = self.total_time / self.frames if self.frames else 0.0
+        return {
+            'frames': self.frames,
+            'avg_ms': avg * 1000,
+            'last_ms': self.last_time * 1000,
+        }
+
+    def _grab(self, region: Optional[Box]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class PyautoguiCapture(Capture):
+    """Portable, but slow capture through pyautogui (PIL)."""
+
+    def _grab(self, region: Optional[Box]) -> np.ndarray:
+        import pyautogui
+
+        frame = np.asarray(pyautogui.screenshot(region=region))
+        if frame.shape[2] == 4:
+            return cv2.cvtColor(frame, cv2.COLOR_RGBA2BGRA)
+
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+
+class MssCapture(Capture):
+    """Fast capture through the mss package.
+
+    The raw BGRA buffer of the screenshot is wrapped without copying.
+    mss instances cannot be shared between threads, so every thread
+    gets its own.
+    """
+    _local: threading.local
+
+    def __init__(self):
+        super(MssCapture, self).__init__()
+        try:
+            import mss
+
+        except ImportError:
+            raise CaptureException("The mss capture backend requires the mss "
+                                   "package. Install it with: pip install mss")
+
+        self._mss = mss
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+
+        return sct
+
+    def _grab(self, region: Optional[Box]) -> np.ndarray:
+        sct = self._sct()
+
+        # Same as pyautogui, the coords are relative to the primary monitor
+        primary = sct.monitors[1]
+        if region:
+            monitor = {
+                'left': primary['left'] + region[0],
+                'top': primary['top'] + region[1],
+                'width': region[2],
+                'height': region[3],
+            }
+
+        else:
+            monitor = primary
+
+        shot = sct.grab(monitor)
+        frame = np.frombuffer(shot.raw, dtype=np.uint8)
+        return frame.reshape(shot.height, shot.width, 4)
+
+
+class FileCapture(Capture):
+    """Serves frames from an image file or a directory of images.
+
+    Directory images are served in the order of their names, one per grab,
+    starting over after the last one. All frames are decoded upfront,
+    so the grab itself costs nearly nothing.
+    """
+    _frames: List[np.ndarray]
+    _index: int
+
+    def __init__(self, path: str):
+        super(FileCapture, self).__init__()
+        source = Path(path)
+        if source.is_dir():
+            files = sorted(f for f in source.iterdir()
+                           if f.suffix.lower() in IMAGE_SUFFIXES)
+        else:
+            files = [source]
+
+        self._frames = [self._decode(f) for f in files]
+        self._index = 0
+
+        if not self._frames:
+            raise CaptureException(f"No images found in {path}!")
+
+    def screen_size(self) -> Tuple[int, int]:
+        # Grabbing would skip a frame
+        frame = self._frames[0]
+        return frame.shape[1], frame.shape[0]
+
+    def _grab(self, region: Optional[Box]) -> np.ndarray:
+        frame = self._frames[self._index]
+        self._index = (self._index + 1) % len(self._frames)
+
+        if region:
+            left, top, width, height = region
+            return frame[top:top + height, left:left + width]
+
+        return frame
+
+    @staticmethod
+    def _decode(path: Path) -> np.ndarray:
+        try:
+            data = np.fromfile(str(path), dtype=np.uint8)
+
+        except OSError:
+            raise CaptureException(f"Failed to read frame {path}!")
+
+        return decode_frame(data, str(path))
+
+
+class TimelineCapture(Capture):
+    """Serves the frames of a recording, as they were on the screen.
+
+    Frames are images in a directory, or in a zip or tar archive, named by
+    the time they appeared at, in seconds from the start of the recording,
+    like 0.png, 1.5.png or 12.png. Every grab returns the frame on the screen
+    at the time of the clock, the first one before it and the last one
+    after the end of the recording.
+    """
+    _clock: Clock
+    _frames: List[np.ndarray]
+    _times: List[float]
+
+    def __init__(self, path: str, clock: Optional[Clock] = None):
+        super(TimelineCapture, self).__init__()
+        self._clock = clock or Clock()
+        frames = sorted(self._read(Path(path)), key=lambda item: item[0])
+        if not frames:
+            raise CaptureException(f"No images found in {path}!")
+
+        self._times = [time for time, _ in frames]
+        self._frames = [frame for _, frame in frames]
+
+    def _grab(self, region: Optional[Box]) -> np.ndarray:
+        index = bisect_right(self._times, self._clock.time()) - 1
+        frame = self._frames[max(index, 0)]
+
+        if region:
+            left, top, width, height = region
+            return frame[top:top + height, left:left + width]
+
+        return frame
+
+    @classmethod
+    def _read(cls, path: Path) -> Iterator[Tuple[float, np.ndarray]]:
+        if path.is_dir():
+            for file in path.iterdir():
+                if file.suffix.lower() in IMAGE_SUFFIXES:
+                    yield cls._time(file.name), FileCapture._decode(file)
+
+        elif zipfile.is_zipfile(str(path)):
+            with zipfile.ZipFile(str(path)) as archive:
+                for name in archive.namelist():
+                    if Path(name).suffix.lower() in IMAGE_SUFFIXES:
+                        data = np.frombuffer(archive.read(name), np.uint8)
+                        yield cls._time(name), decode_frame(data, name)
+
+        elif path.is_file() and tarfile.is_tarfile(str(path)):
+            with tarfile.open(str(path)) as archive:
+                for member in archive.getmembers():
+                    if not member.isfile() or Path(member.name).suffix \
+                            .lower() not in IMAGE_SUFFIXES:
+                        continue
+
+                    file = archive.extractfile(member)
+                    data = np.frombuffer(file.read(), np.uint8)
+                    yield cls._time(member.name), \
+                        decode_frame(data, member.name)
+
+        else:
+            raise CaptureException(f"{path} is neither a directory nor "
+                                   f"an archive of frames!")
+
+    @staticmethod
+    def _time(name: str) -> float:
+        try:
+            return float(Path(name).stem)
+
+        except ValueError:
+            raise CaptureException(f"Frame {name} is not named by its time, "
+                                   f"like 1.5.png!")
+
+
+def decode_frame(data: np.ndarray, name: str) -> np.ndarray:
+    frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise CaptureException(f"Failed to decode frame {name}!")
+
+    return frame
+
+
+BACKENDS = CaptureBackend.values()
+
+
+def create_capture(backend: str, path: Optional[str] = None,
+                   clock: Optional[Clock] = None) -> Capture:
+    if backend == CaptureBackend.PYAUTOGUI:
+        return PyautoguiCapture()
+
+    elif backend == CaptureBackend.MSS:
+        return MssCapture()
+
+    elif backend == CaptureBackend.FILE:
+        if not path:
+            raise CaptureException("The file capture backend requires "
+                                   "a path to the frames.")
+
+        return FileCapture(path)
+
+    elif backend == CaptureBackend.TIMELINE:
+        if not path:
+            raise CaptureException("The timeline capture backend requires "
+                                   "a path to the frames.")
+
+        return TimelineCapture(path, clock)
+
+    raise CaptureException(f"Unknown capture backend '{backend}'")
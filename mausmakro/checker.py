@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from mausmakro.lib.ebnf import ebnf
+from mausmakro.lib.utils import resolve_image_path
+from mausmakro.parsing import Parser
+from mausmakro.program_cache import COMPILER_MODULES, ProgramCache
+
+# Sources of the modules deciding the result of a check
+CHECKER_MODULES = (*COMPILER_MODULES, 'analysis.py', 'checker.py')
+
+
+def discover(paths: Iterable[Union[str, Path]],
+             pattern: str = '*.mkr') -> List[str]:
+    """Macro files in the paths, the directories are searched recursively."""
+    files = {}
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.update((str(f), None) for f in sorted(path.rglob(pattern))
+                         if f.is_file())
+
+        else:
+            files[str(path)] = None
+
+    return list(files)
+
+
+def check_file(path: str, full: bool = False,
+               program_cache: Optional[str] = None) -> Dict[str, Any]:
+    """Check one macro file, the result can be passed between processes.
+
+    Files without any macro are libraries meant to be imported. Their
+    images are looked up next to the importing file and nothing can be run
+    from them, so the full check of them checks only the labels.
+    """
+    result = {'file': path, 'error': None, 'warnings': [], 'sources': None,
+              'images': []}
+    try:
+        parser = Parser(path, ProgramCache(program_cache)
+                        if program_cache else None)
+        parser.parse()
+
+        if full:
+            parser.check_labels()
+            parser.check_parallel()
+
+        if full and parser.macro_defined:
+            parser.check_images()
+            result['warnings'] = [
+                {'kind': d.kind.value, 'name': d.name, 'message': d.message}
+                for d in parser.analyze()
+            ]
+            result['images'] = [str(resolve_image_path(img, path).resolve())
+                                for img in parser.images]
+
+        result['sources'] = parser.sources
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+
+class CheckCache:
+    """Results of the checks stored on disk.
+
+    A result is reused while the content of the checked file, of all the
+    files it imports and of all its images (for the full check) stays the
+    same. The hashes of the file contents are kept with the size and the
+    modification time of the files, so an unchanged file is not read again.
+    Failed checks are not stored, they are run again every time.
+    """
+    _checker_digest: Optional[str] = None
+    _hashes: Dict[str, List[Any]]
+    _results: Dict[str, Dict[str, Any]]
+    _seen: Dict[str, Optional[str]]
+
+    path: Path
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path]):
+        self._hashes = {}
+        self._results = {}
+        self._seen = {}
+
+        self.path = Path(path)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+
+            if data.get('version') != self.VERSION \
+                    or data.get('checker') != self._checker():
+                return
+
+            self._hashes = data['hashes']
+            self._results = data['results']
+
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Without readable results every file is checked again
+            return
+
+    def save(self):
+        data = json.dumps({'version': self.VERSION,
+                           'checker': self._checker(),
+                           'hashes': self._hashes,
+                           'results': self._results})
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+
+        os.replace(tmp_path, self.path)
+
+    def get(self, path: str, full: bool) -> Optional[Dict[str, Any]]:
+        entry = self._results.get(self._key(path, full))
+        if entry is None:
+            return None
+
+        for dependency, digest in entry['dependencies'].items():
+            if self.hash(dependency) != digest:
+                return None
+
+        return entry['result']
+
+    def store(self, path: str, full: bool, result: Dict[str, Any]):
+        if result['error'] is not None:
+            self._results.pop(self._key(path, full), None)
+            return
+
+        dependencies = [*result['sources'], *result['images']]
+        self._results[self._key(path, full)] = {
+            'dependencies': {f: self.hash(f) for f in dependencies},
+            'result': result,
+        }
+
+    def hash(self, path: str) -> Optional[str]:
+        """Hash of the file content, None if it does not exist."""
+        if path in self._seen:
+            return self._seen[path]
+
+        try:
+            stat = os.stat(path)
+            cached = self._hashes.get(path)
+            if cached and cached[0] == stat.st_size \
+                    and cached[1] == stat.st_mtime_ns:
+                digest = cached[2]
+
+            else:
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+
+                self._hashes[path] = [stat.st_size, stat.st_mtime_ns, digest]
+
+        except OSError:
+            digest = None
+
+        self._seen[path] = digest
+        return digest
+
+    @staticmethod
+    def _key(path: str, full: bool) -> str:
+        mode = 'full' if full else 'syntax'
+        return f'{mode}|{Path(path).resolve()}'
+
+    @classmethod
+    def _checker(cls) -> str:
+        if cls._checker_digest is None:
+            digest = hashlib.sha256(f'{cls.VERSION}\0{ebnf}'.encode())
+            package = Path(__file__).parent
+            for module in CHECKER_MODULES:
+                digest.update(package.joinpath(module).read_bytes())
+
+            cls._checker_digest = digest.hexdigest()
+
+        return cls._checker_digest
+
+
+def check_files(files: List[str], full: bool = False, jobs: int = 1,
+                cache: Optional[CheckCache] = None,
+                program_cache: Optional[str] = None) \
+        -> List[Tuple[Dict[str, Any], bool]]:
+    """Check the files, in a pool of processes with more jobs.
+
+    Returns the result of every file and whether it was cached.
+    """
+    results = {}
+    pending = []
+    for path in files:
+        cached = cache.get(path, full) if cache else None
+        if cached is not None:
+            results[path] = (cached, True)
+
+        else:
+            pending.append(path)
+
+    check = partial(check_file, full=full, program_cache=program_cache)
+    if jobs > 1 and len(pending) > 1:
+        # Imported only when needed, it takes a while
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            checked = list(pool.map(check, pending,
+                                    chunksize=max(len(pending) // jobs // 4,
+                                                  1)))
+
+    else:
+        checked = [check(path) for path in pending]
+
+    for path, result in zip(pending, checked):
+        results[path] = (result, False)
+        if cache:
+            cache.store(path, full, result)
+
+    return [results[path] for path in files]
@@ -0,0 +1,36 @@
+from time import sleep, time
+
+
+class Clock:
+    """Seconds since the clock was created, in real time."""
+    _start: float
+
+    def __init__(self):
+        self._start = time()
+
+    def time(self) -> float:
+        return time() - self._start
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """Time which passes only by sleeping, and instantly.
+
+    Used by the simulation, so the waits and the timeouts of the searches
+    take no time at all and the macro runs the same way every time.
+    """
+    now: float
+
+    def __init__(self, start: float = 0.0):
+        super(VirtualClock, self).__init__()
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
@@ -0,0 +1,133 @@
+import json
+import sys
+from queue import SimpleQueue
+from threading import Thread
+from typing import Any, IO, List, Optional
+
+from mausmakro.lib.observable import Event, Level, MessageType
+from mausmakro.lib.observer import Observer
+
+
+class Sink:
+    """Writes the events out, called from the consumer thread only."""
+
+    def write(self, event: Event):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ConsoleSink(Sink):
+    """Messages to the standard output, warnings and errors to stderr."""
+
+    def write(self, event: Event):
+        if event.level >= Level.WARNING:
+            print(event.message, file=sys.stderr)
+
+        else:
+            print(event.message)
+
+
+class JsonLinesSink(Sink):
+    """One JSON object per event and line, appended to the file."""
+    _file: IO[str]
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, event: Event):
+        self._file.write(json.dumps(event.to_dict()) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class EventPipeline:
+    """Hands the events over to a background thread writing them out.
+
+    The queue is bounded, so that a slow terminal or a pipe cannot make
+    it grow without limit. When it is full, the messages below the WARNING
+    level are dropped and counted. Putting an event never waits for
+    the consumer, not even for a lock.
+    """
+    _queue: SimpleQueue
+    _sinks: List[Sink]
+    _thread: Optional[Thread]
+
+    dropped: int
+    level: Level
+    size: int
+
+    def __init__(self, sinks: List[Sink], level: Level = Level.INFO,
+                 size: int = 1024):
+        self._queue = SimpleQueue()
+        self._sinks = sinks
+        self._thread = None
+
+        self.dropped = 0
+        self.level = level
+        self.size = size
+
+    def start(self):
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, event: Event):
+        # Nobody would take it from the queue when not running
+        if event.level < self.level or self._thread is None:
+            return
+
+        if event.level < Level.WARNING and self._queue.qsize() >= self.size:
+            self.dropped += 1
+            return
+
+        self._queue.put(event)
+
+    def close(self, timeout: float = 5.0):
+        """Write out the queued events and close the sinks."""
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+        if self.dropped:
+            self._write(Event(Level.WARNING,
+                              "%d messages were dropped, the output "
+                              "could not keep up", (self.dropped,)))
+
+        for sink in self._sinks:
+            sink.close()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+
+            self._write(event)
+
+    def _write(self, event: Event):
+        for sink in self._sinks:
+            sink.write(event)
+
+
+class EventObserver(Observer):
+    """Passes the messages of the observables to the pipeline."""
+    _events: EventPipeline
+
+    def __init__(self, events: EventPipeline):
+        super(EventObserver, self).__init__()
+        self._events = events
+        self.level = events.level
+
+    def update(self, msg_type: MessageType, msg_data: Any):
+        # Printed by the pipeline, the interpreter does not wait for it
+        if msg_type == MessageType.MESSAGE:
+            self._events.put(msg_data)
+
+        elif msg_type == MessageType.MAUSMAKRO_EXCEPTION:
+            self._events.put(Event(Level.ERROR, "An error occurred:\n%s",
+                                   (msg_data,)))
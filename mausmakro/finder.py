@@ -0,0 +1,564 @@
+import asyncio
+from pathlib import Path
+from threading import Event
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, \
+    Tuple, TypeVar, Union
+
+import cv2
+import numpy as np
+
+from mausmakro.capture import Capture, create_capture
+from mausmakro.clock import Clock
+from mausmakro.framediff import FrameDiff, intersects
+from mausmakro.lib.exceptions import InterruptException
+from mausmakro.locations import LocationCache
+from mausmakro.matching import Box, Match, Matcher, create_matcher
+from mausmakro.templates import DEFAULT_CACHE_SIZE, TemplateCache
+
+T = TypeVar('T')
+
+# Changed rectangles of the screen, None when all of it has to be searched
+Changes = Optional[List[Box]]
+
+# Search yielding the seconds to wait before its next attempt
+Steps = Generator[float, None, T]
+
+
+def blocking(steps: Steps[T], interrupt: Optional[Event] = None) -> T:
+    """Run the search, sleeping between the attempts.
+
+    With the interrupt flag, the search is given up as soon as it is set.
+    """
+    try:
+        while True:
+            delay = next(steps)
+            if interrupt is not None:
+                if interrupt.wait(delay):
+                    raise InterruptException("Search interrupted")
+
+            elif delay > 0:
+                sleep(delay)
+
+    except StopIteration as stop:
+        return stop.value
+
+    finally:
+        steps.close()
+
+
+async def cooperative(steps: Steps[T],
+                      interrupt: Optional[Event] = None) -> T:
+    """Run the search, letting other tasks run between the attempts.
+
+    The search stops at the next attempt when the task is cancelled, or
+    when the interrupt flag is set.
+    """
+    try:
+        while True:
+            await asyncio.sleep(next(steps))
+            if interrupt is not None and interrupt.is_set():
+                raise InterruptException("Search interrupted")
+
+    except StopIteration as stop:
+        return stop.value
+
+    finally:
+        steps.close()
+
+
+class Lookahead:
+    """Search for an image started before the command searching for it.
+
+    Frames are captured while the interpreter is waiting anyway. The last
+    frame and the match in it are kept, so the search itself then has to
+    match only what changed since, or nothing if the image is still there.
+    """
+    diff: FrameDiff
+    grayscale: bool
+    match: Optional[Match]
+    match_step: int
+    path: str
+    region: Optional[Box]
+    # Around the last location of the image, captured instead of the region
+    window: Optional[Box]
+
+    def __init__(self, path: Union[str, Path], grayscale: bool,
+                 match_step: int, region: Optional[Box],
+                 window: Optional[Box] = None):
+        self.diff = FrameDiff()
+        self.grayscale = grayscale
+        self.match = None
+        self.match_step = match_step
+        self.path = str(path)
+        self.region = region
+        self.window = window
+
+    def matches(self, path: Union[str, Path], grayscale: bool,
+                match_step: int, region: Optional[Box]) -> bool:
+        """Whether it has been started for this search."""
+        return self.path == str(path) and self.grayscale == grayscale \
+            and self.match_step == match_step and self.region == region
+
+
+class ImageFinder:
+    """Locates template images on the screen.
+
+    With the auto region enabled, the last location of every found image is
+    remembered and the next search for that image is first tried in a padded
+    window around it, falling back to the full screen on a miss.
+    With the location cache, the locations are also kept across runs.
+    """
+    _capture: Capture
+    _clock: Clock
+    _last_hits: Dict[str, Box]
+    _locations: Optional[LocationCache]
+    _matchers: Dict[int, Matcher]
+    _matches: int
+    _screen_size: Optional[Tuple[int, int]]
+    _templates: TemplateCache
+
+    auto_region: bool
+    engine: str
+    frame_diff: bool
+    lookahead_hits: int
+    match_time: float
+    matches_performed: int
+    matches_skipped: int
+    padding: int
+    window_hits: int
+    window_misses: int
+    workers: int
+
+    # Bounds of the adaptive polling interval of waits, in seconds
+    MIN_INTERVAL = 0.05
+    MAX_INTERVAL = 1.0
+
+    def __init__(self, opts: Dict[str, Any],
+                 capture: Optional[Capture] = None):
+        # The simulation runs on a virtual clock
+        self._clock = opts.get('clock') or Clock()
+        self._capture = capture or create_capture(
+            opts.get('capture', 'pyautogui'), opts.get('capture_path'),
+            self._clock
+        )
+        self._last_hits = {}
+        self._locations = None
+        self._matchers = {}
+        self._matches = 0
+        self._screen_size = None
+        self._templates = TemplateCache(
+            opts.get('template_cache_size', DEFAULT_CACHE_SIZE)
+        )
+
+        if opts.get('location_cache'):
+            self._locations = LocationCache(opts['location_cache'],
+                                            opts['file'],
+                                            self._capture.screen_size())
+
+        self.auto_region = opts.get('auto_region', False) \
+            or self._locations is not None
+        self.engine = opts.get('match_engine', 'step')
+        self.workers = opts.get('match_workers', 1)
+        self.frame_diff = opts.get('frame_diff', True)
+        self.lookahead_hits = 0
+        self.match_time = 0.0
+        self.matches_performed = 0
+        self.matches_skipped = 0
+        self.padding = opts.get('region_padding', 100)
+        self.window_hits = 0
+        self.window_misses = 0
+
+    @property
+    def capture(self) -> Capture:
+        return self._capture
+
+    @property
+    def locations(self) -> Optional[LocationCache]:
+        return self._locations
+
+    @property
+    def templates(self) -> TemplateCache:
+        return self._templates
+
+    def find(self, path: Path, timeout: int, grayscale: bool = True,
+             match_step: int = 2, region: Optional[Box] = None,
+             adaptive: bool = False) -> Optional[Box]:
+        """Search for the image until found or the timeout passes.
+
+        The screen is searched as fast as possible, unless adaptive,
+        in which case the polling slows down while the screen does not
+        change. Good for long waits, which would otherwise keep the CPU busy.
+        """
+        return blocking(self.find_steps(path, timeout, grayscale, match_step,
+                                        region, adaptive))
+
+    def find_steps(self, path: Path, timeout: int, grayscale: bool = True,
+                   match_step: int = 2, region: Optional[Box] = None,
+                   adaptive: bool = False,
+                   lookahead: Optional[Lookahead] = None) \
+            -> Steps[Optional[Box]]:
+        template = self._templates.get(path, grayscale=grayscale)
+        matcher = self._matcher(match_step)
+
+        if lookahead is not None:
+            # Its match may be stale, it is verified on a fresh frame
+            area = lookahead.window or region
+            screen = self._grab(area, grayscale)
+            match = self._rematch(matcher, screen, template, lookahead.diff,
+                                  lookahead.match)
+            if match:
+                self.lookahead_hits += 1
+                if lookahead.window:
+                    self.window_hits += 1
+                match = self._moved(match, area)
+                self._remember(path, match)
+                return match.box
+
+            # Frames of the window tell nothing about the rest of the screen
+            diff = lookahead.diff
+            if lookahead.window:
+                diff = None
+                self._window_missed(path)
+
+            match = yield from self._locate(matcher, template, grayscale,
+                                            region, timeout, adaptive, diff)
+            if match:
+                self._remember(path, match)
+                return match.box
+
+            return None
+
+        hint = self._hint(path) if region is None else None
+        window = self._padded(hint, matcher.alignment) if hint else None
+
+        if window:
+            match = yield from self._locate(matcher, template, grayscale,
+                                            window, 0)
+            if match:
+                self.window_hits += 1
+                self._remember(path, match)
+                return match.box
+
+            self._window_missed(path)
+
+        match = yield from self._locate(matcher, template, grayscale, region,
+                                        timeout, adaptive)
+        if match:
+            self._remember(path, match)
+            return match.box
+
+        return None
+
+    def lookahead(self, path: Path, grayscale: bool = True,
+                  match_step: int = 2,
+                  region: Optional[Box] = None) -> Lookahead:
+        """Start the search for the image ahead of time.
+
+        The frames are captured by advance(), the search is finished by
+        find_steps() with the lookahead.
+        """
+        # Decoded now, while there is time
+        self._templates.get(path, grayscale=grayscale)
+        hint = self._hint(path) if region is None else None
+        window = self._padded(hint, self._matcher(match_step).alignment) \
+            if hint else None
+        return Lookahead(path, grayscale, match_step, region, window)
+
+    def advance(self, lookahead: Lookahead):
+        """Capture and match one more frame for the lookahead."""
+        template = self._templates.get(lookahead.path,
+                                       grayscale=lookahead.grayscale)
+        screen = self._grab(lookahead.window or lookahead.region,
+                            lookahead.grayscale)
+        lookahead.match = self._rematch(self._matcher(lookahead.match_step),
+                                        screen, template, lookahead.diff,
+                                        lookahead.match)
+
+    def wait_gone(self, path: Path, timeout: int, grayscale: bool = True,
+                  match_step: int = 2, region: Optional[Box] = None) -> bool:
+        """Wait until the image is not on the screen, polling adaptively.
+
+        Returns False if the image is still there after the timeout.
+        """
+        return blocking(self.wait_gone_steps(path, timeout, grayscale,
+                                             match_step, region))
+
+    def wait_gone_steps(self, path: Path, timeout: int,
+                        grayscale: bool = True, match_step: int = 2,
+                        region: Optional[Box] = None) -> Steps[bool]:
+        template = self._templates.get(path, grayscale=grayscale)
+        matcher = self._matcher(match_step)
+        last = None
+
+        def attempt(screen: np.ndarray, changes: Changes) -> bool:
+            nonlocal last
+            # The image is still there, unless its part of the screen changed
+            if last and changes is not None \
+                    and not any(intersects(last.box, c) for c in changes):
+                return False
+
+            last = self._match(matcher, screen, template, None)
+            return last is None
+
+        gone = yield from self._poll(attempt, grayscale, region, timeout,
+                                     adaptive=True)
+        if last:
+            self._remember(path, self._moved(last, region))
+
+        return bool(gone)
+
+    def find_many(self, paths: Iterable[Path], timeout: int,
+                  grayscale: bool = True, match_step: int = 2,
+                  region: Optional[Box] = None,
+                  require_all: bool = False) -> Dict[str, Box]:
+        """Search for several images at once.
+
+        Every screenshot is matched against all the templates. The search
+        ends with the first screenshot containing any of the images, or all
+        of them if required. Returns locations of the found images.
+        """
+        return blocking(self.find_many_steps(paths, timeout, grayscale,
+                                             match_step, region, require_all))
+
+    def find_many_steps(self, paths: Iterable[Path], timeout: int,
+                        grayscale: bool = True, match_step: int = 2,
+                        region: Optional[Box] = None,
+                        require_all: bool = False) -> Steps[Dict[str, Box]]:
+        templates = {
+            str(path): self._templates.get(path, grayscale=grayscale)
+            for path in paths
+        }
+        matcher = self._matcher(match_step)
+        previous = {}
+
+        def attempt(screen: np.ndarray,
+                    changes: Changes) -> Optional[Dict[str, Match]]:
+            found = {}
+            for key, template in templates.items():
+                # Images found in the unchanged parts of the screen are still
+                # there, which matters when all of them have to be found
+                match = previous.get(key)
+                if match is None or changes is None \
+                        or any(intersects(match.box, c) for c in changes):
+                    match = self._match(matcher, screen, template, changes)
+
+                if match:
+                    found[key] = match
+
+            previous.clear()
+            previous.update(found)
+            if not found or (require_all and len(found) < len(templates)):
+                return None
+
+            return found
+
+        found = (yield from self._poll(attempt, grayscale, region,
+                                       timeout)) or {}
+        boxes = {}
+        for key, match in found.items():
+            match = self._moved(match, region)
+            self._remember(key, match)
+            boxes[key] = match.box
+
+        return boxes
+
+    def scan(self, paths: Iterable[Path], diff: FrameDiff,
+             grayscale: bool = True, match_step: int = 2,
+             region: Optional[Box] = None) -> Dict[str, Box]:
+        """Match all the templates against one screenshot.
+
+        The frame diff is kept by the caller between the scans, only the
+        parts of the screen changed since the previous scan are matched.
+        """
+        matcher = self._matcher(match_step)
+        screen = self._grab(region, grayscale)
+        changes = diff.update(screen) if self.frame_diff else None
+        if changes == []:
+            self.matches_skipped += 1
+            return {}
+
+        self.matches_performed += 1
+        found = {}
+        for path in paths:
+            template = self._templates.get(path, grayscale=grayscale)
+            match = self._match(matcher, screen, template, changes)
+            if match:
+                found[str(path)] = self._moved(match, region).box
+
+        return found
+
+    def save_locations(self):
+        if self._locations is not None:
+            self._locations.save()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'lookahead_hits': self.lookahead_hits,
+            'matches_performed': self.matches_performed,
+            'matches_skipped': self.matches_skipped,
+            'window_hits': self.window_hits,
+            'window_misses': self.window_misses,
+        }
+
+    def _matcher(self, match_step: int) -> Matcher:
+        if match_step not in self._matchers:
+            self._matchers[match_step] = create_matcher(
+                self.engine, match_step, self.workers
+            )
+
+        return self._matchers[match_step]
+
+    def _hint(self, path: Path) -> Optional[Box]:
+        """Last known location of the image, if worth trying first."""
+        if not self.auto_region:
+            return None
+
+        hint = self._last_hits.get(str(path))
+        if hint is None and self._locations is not None:
+            hint = self._locations.get(path)
+
+        return hint
+
+    def _remember(self, path: Path, match: Match):
+        self._last_hits[str(path)] = match.box
+        if self._locations is not None:
+            self._locations.hit(path, match)
+
+    def _window_missed(self, path: Path):
+        self.window_misses += 1
+        if self._locations is not None:
+            self._locations.miss(path)
+
+    def _padded(self, box: Box, alignment: int) -> Optional[Box]:
+        """Window around the box, None if it is not on the screen."""
+        if self._screen_size is None:
+            self._screen_size = self._capture.screen_size()
+
+        width, height = self._screen_size
+        left = max(box[0] - self.padding, 0)
+        top = max(box[1] - self.padding, 0)
+        left -= left % alignment
+        top -= top % alignment
+        right = min(box[0] + box[2] + self.padding, width)
+        bottom = min(box[1] + box[3] + self.padding, height)
+        if right <= left or bottom <= top:
+            # Not on the reported screen, the whole one is searched instead
+            return None
+
+        return left, top, right - left, bottom - top
+
+    def _locate(self, matcher: Matcher, template: np.ndarray,
+                grayscale: bool, region: Optional[Box],
+                timeout: int, adaptive: bool = False,
+                diff: Optional[FrameDiff] = None) -> Steps[Optional[Match]]:
+        found = yield from self._poll(
+            lambda screen, changes: self._match(matcher, screen, template,
+                                                changes),
+            grayscale, region, timeout, adaptive, diff
+        )
+
+        return self._moved(found, region) if found else None
+
+    def _match(self, matcher: Matcher, screen: np.ndarray,
+               template: np.ndarray, changes: Changes) -> Optional[Match]:
+        start = perf_counter()
+        self._matches += 1
+        try:
+            return self._match_changes(matcher, screen, template, changes)
+
+        finally:
+            self.match_time += perf_counter() - start
+
+    @staticmethod
+    def _match_changes(matcher: Matcher, screen: np.ndarray,
+                       template: np.ndarray,
+                       changes: Changes) -> Optional[Match]:
+        if changes is None:
+            return matcher.match(screen, template)
+
+        best = None
+        height, width = template.shape[:2]
+        for x, y, w, h in changes:
+            # Include every position where the template overlaps the change
+            left = max(x - width + 1, 0)
+            top = max(y - height + 1, 0)
+            left -= left % matcher.alignment
+            top -= top % matcher.alignment
+            right = min(x + w + width - 1, screen.shape[1])
+            bottom = min(y + h + height - 1, screen.shape[0])
+
+            found = matcher.match(screen[top:bottom, left:right], template)
+            if found and (best is None or found.score > best.score):
+                best = found.moved(left, top)
+
+        return best
+
+    def _rematch(self, matcher: Matcher, screen: np.ndarray,
+                 template: np.ndarray, diff: FrameDiff,
+                 previous: Optional[Match]) -> Optional[Match]:
+        """Match the screen, knowing the match in the previous frame."""
+        changes = diff.update(screen) if self.frame_diff else None
+        # Nothing changed over the previous match, it is reused as it is
+        if changes == [] or previous is not None and changes is not None \
+                and not any(intersects(previous.box, c) for c in changes):
+            self.matches_skipped += 1
+            return previous
+
+        self.matches_performed += 1
+        return self._match(matcher, screen, template, changes)
+
+    def _poll(self, attempt: Callable[[np.ndarray, Changes], Optional[T]],
+              grayscale: bool, region: Optional[Box], timeout: int,
+              adaptive: bool = False,
+              diff: Optional[FrameDiff] = None) -> Steps[Optional[T]]:
+        # With the diff of earlier frames, only what changed since is matched
+        if diff is None:
+            diff = FrameDiff()
+        interval = self.MIN_INTERVAL
+        start = self._clock.time()
+        while True:
+            screen = self._grab(region, grayscale)
+            changes = diff.update(screen) if self.frame_diff else None
+
+            # An unchanged screen has been already searched
+            if changes == []:
+                self.matches_skipped += 1
+                interval = min(interval * 2, self.MAX_INTERVAL)
+
+            else:
+                interval = self.MIN_INTERVAL
+                matches = self._matches
+                result = attempt(screen, changes)
+                # Known to be still there, where the screen has not changed
+                if self._matches == matches:
+                    self.matches_skipped += 1
+                else:
+                    self.matches_performed += 1
+
+                if result:
+                    return result
+
+            remaining = start + timeout - self._clock.time()
+            if remaining <= 0:
+                return None
+
+            yield min(interval, remaining) if adaptive else 0
+
+    @staticmethod
+    def _moved(match: Match, region: Optional[Box]) -> Match:
+        if region:
+            return match.moved(region[0], region[1])
+
+        return match
+
+    def _grab(self, region: Optional[Box], grayscale: bool) -> np.ndarray:
+        screen = self._capture.grab(region)
+        if screen.shape[2] == 4:
+            code = cv2.COLOR_BGRA2GRAY if grayscale else cv2.COLOR_BGRA2BGR
+        elif grayscale:
+            code = cv2.COLOR_BGR2GRAY
+        else:
+            return screen
+
+        return cv2.cvtColor(screen, code)
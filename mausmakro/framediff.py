@@ -0,0 +1,84 @@
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from mausmakro.matching import Box
+
+
+class FrameDiff:
+    """Finds the parts of the screen which changed since the previous frame.
+
+    The frames are compared in square cells, the changed cells are then
+    merged into rectangles. When most of the screen changed, it is not worth
+    to split it and the whole frame is reported as changed.
+    """
+    _previous: Optional[np.ndarray]
+
+    cell: int
+    max_changed: float
+
+    def __init__(self, cell: int = 32, max_changed: float = 0.5):
+        self._previous = None
+        self.cell = cell
+        self.max_changed = max_changed
+
+    def reset(self):
+        self._previous = None
+
+    def update(self, frame: np.ndarray) -> Optional[List[Box]]:
+        """Compare the frame with the previous one.
+
+        Returns None if the whole frame has to be searched, an empty list if
+        nothing changed, or the changed rectangles otherwise.
+        """
+        previous = self._previous
+        self._previous = frame
+
+        if previous is None or previous.shape != frame.shape:
+            return None
+
+        diff = cv2.absdiff(frame, previous)
+        if len(diff.shape) == 3:
+            diff = diff.max(axis=2)
+
+        if not cv2.countNonZero(diff):
+            return []
+
+        cells = self._changed_cells(diff)
+        if np.count_nonzero(cells) > self.max_changed * cells.size:
+            return None
+
+        return self._rectangles(cells, frame.shape[:2])
+
+    def _changed_cells(self, diff: np.ndarray) -> np.ndarray:
+        height, width = diff.shape
+        rows = -(-height // self.cell)
+        cols = -(-width // self.cell)
+
+        padded = np.zeros((rows * self.cell, cols * self.cell), dtype=np.uint8)
+        padded[:height, :width] = diff
+        cells = padded.reshape(rows, self.cell, cols, self.cell)
+        return cells.max(axis=(1, 3)) > 0
+
+    def _rectangles(self, cells: np.ndarray, shape) -> List[Box]:
+        count, _, stats, _ = cv2.connectedComponentsWithStats(
+            cells.astype(np.uint8), connectivity=8
+        )
+
+        rectangles = []
+        # The first component is the unchanged background
+        for x, y, w, h, _ in stats[1:count]:
+            left, top = x * self.cell, y * self.cell
+            width = min(w * self.cell, shape[1] - left)
+            height = min(h * self.cell, shape[0] - top)
+            rectangles.append((int(left), int(top), int(width), int(height)))
+
+        return rectangles
+
+
+def intersects(first: Box, second: Box) -> bool:
+    return first[0] < second[0] + second[2] \
+           and second[0] < first[0] + first[2] \
+           and first[1] < second[1] + second[3] \
+           and second[1] < first[1] + first[3]
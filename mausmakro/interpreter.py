@@ -1,42 +1,106 @@
 import sys
 from pathlib import Path
 from threading import Event
-from time import sleep
-from typing import Any, Dict, List, Optional, Tuple
+from time import sleep, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, \
+    Tuple, Union
 
-import pyautogui
-
-from mausmakro.lib.enums import Opcode
+from mausmakro.finder import ImageFinder, Lookahead, Steps, blocking
+from mausmakro.lib.enums import OPCODE_CODES, Opcode
 from mausmakro.lib.exceptions import ConditionException, InterpretException, \
-    MausMakroException, RetryException
-from mausmakro.lib.observable import MessageType, Observable
-from mausmakro.lib.types import Command, Conditional, Instruction, Stack
+    InterruptException, MausMakroException, RetryException
+from mausmakro.lib.observable import Level, MessageType, Observable
+from mausmakro.lib.types import Block, Command, Conditional, Instruction, \
+    Stack, Watcher
+from mausmakro.lib.utils import resolve_image_path
+from mausmakro.matching import Box
+from mausmakro.metrics import MacroMetrics
+from mausmakro.watchers import ScreenWatcher
+
+
+END_CODE = OPCODE_CODES[Opcode.END]
+LABEL_CODE = OPCODE_CODES[Opcode.LABEL]
+
+# Looked up once, the attributes of enums are slow to get
+DEBUG = Level.DEBUG
+WARNING = Level.WARNING
+
+# Searches which can be started ahead, and whether they are precise
+LOOKAHEAD_SEARCHES = {
+    OPCODE_CODES[Opcode.CLICK]: False,
+    OPCODE_CODES[Opcode.FIND]: False,
+    OPCODE_CODES[Opcode.PCLICK]: True,
+    OPCODE_CODES[Opcode.PFIND]: True,
+    OPCODE_CODES[Opcode.WAIT_UNTIL]: False,
+}
 
 
 class Interpreter(Observable):
+    """Executes the program, one instruction after another.
+
+    Instructions are dispatched by their integer opcode to the handlers
+    in the dispatch table, no opcode is compared in the main loop.
+    """
     _call_stack: Stack
-    _cont_flag = Event()
-    _exit_flag = Event()
+    _cont_flag: Event
+    _exit_flag: Event
+    _finder: ImageFinder
+    _found_images: Set[str]
+    _handler_depth: int
+    _handlers: List[Callable[[Any], None]]
     _instructions: List[Instruction]
+    _interrupt: Event
+    _label_names: Dict[int, str]
     _label_table: Dict[str, int]
+    _lookahead: Optional[Tuple[int, Lookahead]]
     _program_counter: int
+    _watcher: Optional[ScreenWatcher]
+    _watchers: List[Watcher]
 
+    metrics: MacroMetrics
     opts: Dict[str, Any]
 
+    # Frames for the next search are captured only at the end of a WAIT
+    LOOKAHEAD_WINDOW = 1.0
+    LOOKAHEAD_INTERVAL = 0.2
+
     def __init__(self, instructions,
                  label_table: Dict[str, int],
                  opts: Dict[str, Any]):
 
         super(Interpreter, self).__init__()
+        self._cont_flag = Event()
+        self._exit_flag = Event()
+        self._handlers = self._dispatch_table()
+        self._interrupt = Event()
+        self._watcher = None
+
+        self.metrics = MacroMetrics()
+        self.opts = opts
+
+        self._finder = ImageFinder(opts)
+        self.load(instructions, label_table, opts.get('images', []),
+                  opts.get('watchers', []))
+
+    def load(self, instructions: List[Instruction],
+             label_table: Dict[str, int], images: Iterable[str] = (),
+             watchers: Iterable[Watcher] = ()):
+        """Replace the program, only while the macro is not running."""
         self._call_stack = Stack()
+        self._found_images = set()
+        self._handler_depth = 0
         self._instructions = instructions
+        self._label_names = {i: label for label, i in label_table.items()}
         self._label_table = label_table
+        self._lookahead = None
         self._program_counter = 0
+        self._watchers = list(watchers)
+        # Kept for all the runs, with its finder and capture
+        self._watcher = self._create_watcher() if self._watchers else None
 
-        self.opts = opts
-
-        # Throw exceptions instead of returning None
-        pyautogui.useImageNotFoundException()
+        self._finder.templates.preload(
+            resolve_image_path(img, self.opts['file']) for img in images
+        )
 
     def toggle_execution(self):
         if self._cont_flag.is_set():
@@ -54,28 +118,71 @@ class Interpreter(Observable):
         self._cont_flag.set()
 
     def interpret(self, macro: str):
+        self._start_watcher()
+        start = time()
+        try:
+            self._interpret(macro)
+
+        finally:
+            self.metrics.iterations.inc()
+            self.metrics.iteration_seconds.observe(time() - start)
+            # Also of the iterations which failed or were stopped
+            if self.opts.get('stats'):
+                self.report_stats()
+
+            if self._watcher is not None:
+                self._watcher.stop()
+
+            try:
+                self._finder.save_locations()
+
+            except OSError as e:
+                self.notify_msg("Failed to save the location cache: %s", e,
+                                level=WARNING)
+
+    def _interpret(self, macro: str):
         self._cont_flag.set()
         self._program_counter = self._label_table[macro]
 
+        # Hot loop, the lookups are kept in locals
+        cont_flag = self._cont_flag
+        exit_flag = self._exit_flag
+        handlers = self._handlers
+        instructions = self._instructions
+        interrupt = self._interrupt
+        # Counted as they go, an endless macro is scraped while it runs
+        count_executed = self.metrics.instructions.inc
+
         retries = 0
-        while not self._exit_flag.is_set():
-            self._cont_flag.wait()
-            if self._exit_flag.is_set():
-                break
+        while not exit_flag.is_set():
+            if not cont_flag.is_set():
+                cont_flag.wait()
+                if exit_flag.is_set():
+                    break
+
+            if interrupt.is_set():
+                self._call_handler()
+                continue
 
-            instr = self._instructions[self._program_counter]
-            if instr.opcode == Opcode.END:
+            instr = instructions[self._program_counter]
+            if instr.code == END_CODE:
                 break
 
             try:
-                self._execute_instruction(instr)
+                handlers[instr.code](instr)
                 self._program_counter += 1
+                count_executed()
+
+            except InterruptException:
+                self._call_handler()
 
             except MausMakroException as e:
                 if self._exit_flag.is_set():
                     break
 
-                self.notify_msg("Command execution failed")
+                self.metrics.failures.inc()
+                self.notify_msg("Command execution failed",
+                                level=WARNING)
                 if (
                         self.opts['enable_retry']
                         and retries <= self.opts['retry_times']
@@ -93,10 +200,85 @@ class Interpreter(Observable):
                     self.notify(MessageType.MAUSMAKRO_EXCEPTION, str(e))
                     return
 
+    def report_stats(self):
+        stats = self._finder.templates.stats()
+        self.notify_msg(
+            f"Template cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['entries']} entries, {stats['bytes']} bytes held"
+        )
+
+        stats = self._finder.capture.stats()
+        self.notify_msg(
+            f"Capture: {stats['frames']} frames, "
+            f"{stats['avg_ms']:.1f} ms per frame on average, "
+            f"{stats['last_ms']:.1f} ms the last one"
+        )
+
+        stats = self._finder.stats()
+        self.notify_msg(
+            f"Matching: {stats['matches_performed']} performed, "
+            f"{stats['matches_skipped']} skipped on unchanged screen"
+        )
+
+        if self.opts.get('lookahead'):
+            self.notify_msg(
+                f"Lookahead: {stats['lookahead_hits']} searches "
+                "found ready after a WAIT"
+            )
+
+        if self._finder.auto_region:
+            self.notify_msg(
+                f"Auto region: {stats['window_hits']} window hits, "
+                f"{stats['window_misses']} full screen fallbacks"
+            )
+
+        if self._watcher is not None:
+            performed, skipped = self._watcher.stats()
+            self.notify_msg(
+                f"Watchers: {performed} checks matched, "
+                f"{skipped} skipped on unchanged screen"
+            )
+
+        if self._finder.locations is not None:
+            self.notify_msg(
+                f"Location cache: {len(self._finder.locations)} entries "
+                f"in {self._finder.locations.path}"
+            )
+
+    def _create_watcher(self) -> ScreenWatcher:
+        return ScreenWatcher(self._watchers, self.opts, self._interrupt)
+
+    def _start_watcher(self):
+        self._interrupt.clear()
+        self._handler_depth = 0
+        if self._watcher is not None:
+            self._watcher.start()
+
+    def _call_handler(self):
+        """Call the procedure of the watcher whose image has appeared.
+
+        The interrupted instruction is run again once the procedure returns,
+        the watcher is paused until then.
+        """
+        watcher = self._watcher.triggered
+        self._interrupt.clear()
+        self._lookahead = None
+        self.notify_msg("Image %s appeared, calling %s", watcher.image,
+                        watcher.handler)
+
+        self._call_stack.push(self._program_counter - 1)
+        self._handler_depth = len(self._call_stack)
+        self._program_counter = self._label_table[watcher.handler]
+
     def stop(self):
         self._cont_flag.set()
         self._exit_flag.set()
 
+    @property
+    def stopped(self) -> bool:
+        """Whether stopped, the next runs would end right away."""
+        return self._exit_flag.is_set()
+
     def _retry_instruction(self, instr: Instruction):
         retries = 1
 
@@ -105,128 +287,280 @@ class Interpreter(Observable):
             if self._exit_flag.is_set():
                 return
 
-            self.notify_msg(f"Retries: {retries}/{self.opts['retry_times']}")
+            self.notify_msg("Retries: %d/%d", retries,
+                            self.opts['retry_times'])
+            self.metrics.retries.inc()
 
             try:
                 self._execute_instruction(instr)
                 return
 
+            except InterruptException:
+                # The command is run again after the handler has returned
+                self._call_handler()
+                return
+
             except Exception as e:
-                print(e)
+                self.notify_msg("Retry failed: %s", e, level=WARNING)
                 retries += 1
 
         raise RetryException("Maximum retries reached, giving up.")
 
     def _execute_instruction(self, instruction: Instruction):
-        if isinstance(instruction, Command):
-            return self._execute_command(instruction)
+        self._handlers[instruction.code](instruction)
+
+    def _dispatch_table(self) -> List[Callable[[Any], None]]:
+        handlers = {
+            Opcode.CALL: self._op_call,
+            Opcode.CLICK: self._op_click,
+            Opcode.DOUBLE_CLICK: self._op_double_click,
+            Opcode.EXIT: self._op_exit,
+            Opcode.FIND: self._op_find,
+            Opcode.FIND_ALL: self._op_find_all,
+            Opcode.FIND_ANY: self._op_find_any,
+            Opcode.FOUND: self._op_found,
+            Opcode.IF: self._op_if,
+            Opcode.JUMP: self._op_jump,
+            Opcode.LABEL: self._op_label,
+            Opcode.PARALLEL: self._op_block,
+            Opcode.PAUSE: self._op_pause,
+            Opcode.PCLICK: self._op_pclick,
+            Opcode.PFIND: self._op_pfind,
+            Opcode.RACE: self._op_block,
+            Opcode.RETURN: self._op_return,
+            Opcode.WAIT: self._op_wait,
+            Opcode.WAIT_UNTIL: self._op_wait_until,
+            Opcode.WAIT_WHILE: self._op_wait_while,
+        }
+
+        table = [self._op_not_implemented] * len(OPCODE_CODES)
+        for opcode, handler in handlers.items():
+            table[OPCODE_CODES[opcode]] = handler
+
+        return table
 
-        instruction: Conditional
-        self._execute_conditional(instruction)
+    @staticmethod
+    def _op_block(block: Block):
+        raise InterpretException(f"{block.opcode.name} can run only in "
+                                 "the asyncio mode, please use --async.")
+
+    def _op_call(self, command: Command):
+        self.notify_msg("Call %s", self._label_name(command.arg),
+                        level=DEBUG)
+        self._call_stack.push(self._program_counter)
+        self._jump(command.arg)
+
+    def _op_click(self, command: Command):
+        self._do_click(command.arg)
+
+    def _op_double_click(self, command: Command):
+        self._do_click(command.arg, is_double=True)
+
+    def _op_exit(self, _: Command):
+        self.notify_msg("Exiting...")
+        sys.exit(0)
+
+    def _op_find(self, command: Command):
+        self._find_image(
+            *command.arg,
+            grayscale=not self.opts['color_match'],
+            match_step=self.opts['match_step']
+        )
+
+    def _op_find_all(self, command: Command):
+        self._find_images(
+            *command.arg,
+            grayscale=not self.opts['color_match'],
+            match_step=self.opts['match_step'],
+            require_all=True
+        )
+
+    def _op_find_any(self, command: Command):
+        self._find_images(
+            *command.arg,
+            grayscale=not self.opts['color_match'],
+            match_step=self.opts['match_step']
+        )
+
+    def _op_found(self, command: Command):
+        if command.arg not in self._found_images:
+            raise ConditionException(f"Image {command.arg} "
+                                     "was not found by the last search")
+
+    def _op_if(self, cond: Conditional):
+        try:
+            self._execute_instruction(cond.condition)
+            failed = True if cond.negate else False
 
-    def _execute_command(self, command: Command) -> Optional[bool]:
-        if command.opcode == Opcode.CALL:
-            self.notify_msg(f"Call {command.arg}")
-            self._call_stack.push(self._program_counter)
-            index = self._label_table[command.arg]
-            self._program_counter = index
+        except ConditionException:
+            failed = False if cond.negate else True
 
-        elif command.opcode == Opcode.CLICK:
-            return self._do_click(command.arg)
+        if cond.else_label is not None and failed:
+            self._jump(cond.else_label)
 
-        elif command.opcode == Opcode.DOUBLE_CLICK:
-            return self._do_click(command.arg, is_double=True)
+        elif failed:
+            self._jump(cond.end_label)
 
-        elif command.opcode == Opcode.EXIT:
-            self.notify_msg("Exiting...")
-            sys.exit(0)
+    def _op_jump(self, command: Command):
+        self.notify_msg("Jump to %s", self._label_name(command.arg),
+                        level=DEBUG)
+        self._jump(command.arg)
 
-        elif command.opcode == Opcode.FIND:
-            self._find_image(
-                command.arg[0],
-                command.arg[1],
-                grayscale=not self.opts['color_match'],
-                match_step=self.opts['match_step']
-            )
+    def _op_label(self, _: Command):
+        return
 
-        elif command.opcode == Opcode.JUMP:
-            self.notify_msg(f"Jump to {command.arg}")
-            index = self._label_table[command.arg]
-            self._program_counter = index
+    def _op_pause(self, _: Command):
+        self.pause_execution()
 
-        elif command.opcode == Opcode.LABEL:
-            return
+    def _op_pclick(self, command: Command):
+        self._do_click(command.arg, precise=True)
 
-        elif command.opcode == Opcode.PAUSE:
-            self.pause_execution()
+    def _op_pfind(self, command: Command):
+        self._find_image(*command.arg, grayscale=False, match_step=1)
 
-        elif command.opcode == Opcode.PCLICK:
-            self._do_click(command.arg, precise=True)
+    def _op_return(self, _: Command):
+        if self._call_stack.empty():
+            raise InterpretException("Cannot return, no caller!")
 
-        elif command.opcode == Opcode.PFIND:
-            self._find_image(command.arg[0], command.arg[1], grayscale=False,
-                             match_step=1)
+        index = self._call_stack.pop()
+        self._program_counter = index
 
-        elif command.opcode == Opcode.RETURN:
-            if self._call_stack.empty():
-                raise InterpretException("Cannot return, no caller!")
+        if len(self._call_stack) < self._handler_depth:
+            self._handler_depth = 0
+            self._watcher.resume()
 
-            index = self._call_stack.pop()
-            self._program_counter = index
+    def _op_wait(self, command: Command):
+        self.notify_msg("Waiting %s seconds", command.arg, level=DEBUG)
+        lookahead = self._start_lookahead()
+        if lookahead is not None:
+            blocking(self._lookahead_steps(command.arg, *lookahead),
+                     self._interrupt)
 
-        elif command.opcode == Opcode.WAIT:
-            self.notify_msg(f"Waiting {command.arg} seconds")
+        elif self._watcher is None:
             sleep(command.arg)
 
-        else:
-            raise NotImplementedError(
-                f"Instruction {command.opcode} "
-                "is not implemented!"
-            )
+        elif self._interrupt.wait(command.arg):
+            raise InterruptException("Waiting interrupted")
 
-    def _execute_conditional(self, cond: Conditional):
-        try:
-            self._execute_instruction(cond.condition)
-            failed = True if cond.negate else False
+    def _op_wait_until(self, command: Command):
+        self._wait_image(*command.arg)
 
-        except ConditionException:
-            failed = False if cond.negate else True
+    def _op_wait_while(self, command: Command):
+        self._wait_image(*command.arg, gone=True)
+
+    @staticmethod
+    def _op_not_implemented(instruction: Instruction):
+        raise NotImplementedError(f"Instruction {instruction.opcode} "
+                                  "is not implemented!")
+
+    def _start_lookahead(self) -> Optional[Tuple[int, Lookahead]]:
+        """Start the search of the next instruction, if it searches."""
+        if not self.opts.get('lookahead') or self._program_counter < 0:
+            return None
+
+        instructions = self._instructions
+        index = self._program_counter + 1
+        while index < len(instructions) \
+                and instructions[index].code == LABEL_CODE:
+            index += 1
+
+        if index == len(instructions):
+            return None
+
+        instr = instructions[index]
+        if isinstance(instr, Conditional):
+            instr = instr.condition
+
+        precise = LOOKAHEAD_SEARCHES.get(instr.code)
+        if precise is None or not isinstance(instr.arg[0], str):
+            return None
+
+        region = instr.arg[2] if len(instr.arg) == 3 else None
+        return index, self._finder.lookahead(
+            resolve_image_path(instr.arg[0], self.opts['file']),
+            grayscale=False if precise else not self.opts['color_match'],
+            match_step=1 if precise else self.opts['match_step'],
+            region=self._fix_region(region)
+        )
+
+    def _lookahead_steps(self, seconds: float, index: int,
+                         lookahead: Lookahead) -> Steps[None]:
+        """Wait, capturing the frames for the next search near the end."""
+        end = time() + seconds
+        cost = 0.0
+        while True:
+            remaining = end - time()
+            if remaining <= 0:
+                break
 
-        if cond.else_label and failed:
-            new_pc = self._label_table[cond.else_label]
+            if remaining > self.LOOKAHEAD_WINDOW:
+                yield remaining - self.LOOKAHEAD_WINDOW
 
-        elif not cond.else_label and failed:
-            new_pc = self._label_table[cond.end_label]
+            elif remaining <= cost:
+                # Another frame would make the wait longer
+                yield remaining
 
-        else:
-            new_pc = self._program_counter
+            else:
+                start = time()
+                self._finder.advance(lookahead)
+                cost = time() - start
+                yield min(self.LOOKAHEAD_INTERVAL, max(end - time(), 0))
+
+        self._lookahead = index, lookahead
+
+    def _take_lookahead(self, path: Path, grayscale: bool, match_step: int,
+                        region: Optional[Box]) -> Optional[Lookahead]:
+        # Thrown away unless it is this search which follows the WAIT
+        pending, self._lookahead = self._lookahead, None
+        if pending is None or pending[0] != self._program_counter \
+                or not pending[1].matches(path, grayscale, match_step,
+                                          region):
+            return None
+
+        return pending[1]
 
-        self._program_counter = new_pc
+    def _label_name(self, target: Union[str, int]) -> str:
+        return self._label_names.get(target, str(target))
+
+    def _jump(self, target: Union[str, int]):
+        # Program counter is incremented after every instruction, so it is set
+        # to the label itself, or before the instruction of a resolved target
+        if isinstance(target, int):
+            self._program_counter = target - 1
+
+        else:
+            self._program_counter = self._label_table[target]
 
     def _do_click(self, args: Tuple[Any, Any], is_double=False, precise=False):
         clicks = 2 if is_double else 1
 
         if isinstance(args[0], int):
-            self.notify_msg(f"Clicking at {args[0]},{args[1]}")
-            pyautogui.click(x=args[0], y=args[1], clicks=clicks)
+            self.notify_msg("Clicking at %s,%s", args[0], args[1],
+                            level=DEBUG)
+            self._click(args[0], args[1], clicks)
             return
 
         if precise:
             coords = self._find_image(
-                args[0],
-                args[1],
+                *args,
                 grayscale=False,
                 match_step=1
             )
         else:
             coords = self._find_image(
-                args[0],
-                args[1],
+                *args,
                 grayscale=not self.opts['color_match'],
                 match_step=self.opts['match_step']
             )
 
-        pyautogui.click(*coords, clicks=clicks)
+        self._click(*coords, clicks)
+
+    @staticmethod
+    def _click(x: int, y: int, clicks: int):
+        # Imported only when needed, it connects to the display on import
+        import pyautogui
+
+        pyautogui.click(x=x, y=y, clicks=clicks)
 
     @staticmethod
     def _fix_coords(coords: Tuple[int, int]) -> Tuple[int, int]:
@@ -235,26 +569,122 @@ class Interpreter(Observable):
 
         return coords
 
-    def _find_image(self, image: str, timeout: int, grayscale: bool = True,
-                    match_step: int = 2) -> Tuple[int, int]:
-        img_path = Path(image)
-
-        if not img_path.is_absolute():
-            abs_path = Path(self.opts['file']).parent
-            img_path = abs_path.joinpath(Path(f'images/{image}'))
+    @staticmethod
+    def _fix_region(region: Optional[Box]) -> Optional[Box]:
+        # Regions are written in screen coords, but searched in screenshots
+        if region and sys.platform == 'darwin':
+            return tuple(n * 2 for n in region)
 
-        self.notify_msg(f"Finding image .. {image}")
+        return region
 
-        try:
-            coords = pyautogui.locateCenterOnScreen(
-                str(img_path),
-                grayscale=grayscale,
-                step=match_step,
-                minSearchTime=timeout
-            )
+    def _find_image(self, image: str, timeout: int,
+                    region: Optional[Box] = None, grayscale: bool = True,
+                    match_step: int = 2) -> Tuple[int, int]:
+        return blocking(self._find_image_steps(image, timeout, region,
+                                               grayscale, match_step),
+                        self._interrupt)
+
+    def _find_image_steps(self, image: str, timeout: int,
+                          region: Optional[Box] = None,
+                          grayscale: bool = True,
+                          match_step: int = 2) -> Steps[Tuple[int, int]]:
+        img_path = resolve_image_path(image, self.opts['file'])
+        region = self._fix_region(region)
+
+        self.notify_msg("Finding image .. %s", image, level=DEBUG)
+
+        start = time()
+        box = yield from self._finder.find_steps(
+            img_path,
+            timeout,
+            grayscale=grayscale,
+            match_step=match_step,
+            region=region,
+            lookahead=self._take_lookahead(img_path, grayscale, match_step,
+                                           region)
+        )
+
+        self.metrics.find(image, time() - start, box is not None)
+        if box is None:
+            raise ConditionException("Image not found within the time limit")
 
-            self.notify_msg("Image found")
-            return self._fix_coords(coords)
+        self.notify_msg("Image found", level=DEBUG)
+        left, top, width, height = box
+        return self._fix_coords((left + width // 2, top + height // 2))
+
+    def _wait_image(self, image: str, timeout: int,
+                    region: Optional[Box] = None, gone: bool = False):
+        blocking(self._wait_image_steps(image, timeout, region, gone),
+                 self._interrupt)
+
+    def _wait_image_steps(self, image: str, timeout: int,
+                          region: Optional[Box] = None,
+                          gone: bool = False) -> Steps[None]:
+        img_path = resolve_image_path(image, self.opts['file'])
+        kwargs = {
+            'grayscale': not self.opts['color_match'],
+            'match_step': self.opts['match_step'],
+            'region': self._fix_region(region),
+        }
+
+        if gone:
+            self.notify_msg("Waiting while image is on the screen .. %s",
+                            image, level=DEBUG)
+            if not (yield from self._finder.wait_gone_steps(img_path, timeout,
+                                                            **kwargs)):
+                raise ConditionException("Image still on the screen "
+                                         "after the time limit")
+
+            self.notify_msg("Image is gone", level=DEBUG)
+            return
 
-        except pyautogui.ImageNotFoundException:
+        self.notify_msg("Waiting until image is on the screen .. %s", image,
+                        level=DEBUG)
+        lookahead = self._take_lookahead(img_path, **kwargs)
+        start = time()
+        box = yield from self._finder.find_steps(img_path, timeout,
+                                                 adaptive=True,
+                                                 lookahead=lookahead, **kwargs)
+        self.metrics.find(image, time() - start, box is not None)
+        if box is None:
             raise ConditionException("Image not found within the time limit")
+
+        self.notify_msg("Image found", level=DEBUG)
+
+    def _find_images(self, images: Iterable[str], timeout: int,
+                     region: Optional[Box] = None, grayscale: bool = True,
+                     match_step: int = 2, require_all: bool = False):
+        blocking(self._find_images_steps(images, timeout, region, grayscale,
+                                         match_step, require_all),
+                 self._interrupt)
+
+    def _find_images_steps(self, images: Iterable[str], timeout: int,
+                           region: Optional[Box] = None,
+                           grayscale: bool = True, match_step: int = 2,
+                           require_all: bool = False) -> Steps[None]:
+        paths = {
+            str(resolve_image_path(img, self.opts['file'])): img
+            for img in images
+        }
+
+        mode = 'all' if require_all else 'any'
+        self.notify_msg("Finding %s of images .. %s", mode, ', '.join(images),
+                        level=DEBUG)
+
+        start = time()
+        found = yield from self._finder.find_many_steps(
+            paths,
+            timeout,
+            grayscale=grayscale,
+            match_step=match_step,
+            region=self._fix_region(region),
+            require_all=require_all
+        )
+
+        self.metrics.find(None, time() - start, bool(found))
+        self._found_images = set(paths[path] for path in found)
+        if not found:
+            raise ConditionException("Images not found within the time limit")
+
+        self.notify_msg("Found %s", ', '.join(sorted(self._found_images)),
+                        level=DEBUG)
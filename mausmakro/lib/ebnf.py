@@ -17,24 +17,48 @@ EXTENSION                      : "jpeg" | "jpg" | "png"
 {ArgType.NAME.name}            : (LETTER | "_" | "-" | DIGIT)+
 {ArgType.FILE.name}            : FILENAME "." EXTENSION
 {ArgType.COORDS.name}          : INT WS* "," WS* INT
+{ArgType.REGION.name}          : INT WS* "," WS* INT WS* "," WS* INT WS* "," WS* INT
 {ArgType.TIME.name}            : INT WS* ("s" | "m" | "h")
 
 {Opcode.CALL.value}            : "{Opcode.CALL.name}" {ArgType.NAME.name}
-{Opcode.CLICK.value}           : "{Opcode.CLICK.name}" ({ArgType.COORDS.name} | "ON" {ArgType.FILE.name} "WITHIN" {ArgType.TIME.name})
+{Opcode.CLICK.value}           : "{Opcode.CLICK.name}" ({ArgType.COORDS.name} | "ON" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name})
 {Opcode.DOUBLE_CLICK.value}    : "{Opcode.DOUBLE_CLICK.name}" {ArgType.COORDS.name}
-{Opcode.FIND.value}            : "{Opcode.FIND.name}" {ArgType.FILE.name} "WITHIN" {ArgType.TIME.name}
+{Opcode.FIND.value}            : "{Opcode.FIND.name}" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name}
+{Opcode.FIND_ALL.value}        : "{Opcode.FIND.name}" "ALL" {ArgType.FILE.name} ("," {ArgType.FILE.name})* ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name}
+{Opcode.FIND_ANY.value}        : "{Opcode.FIND.name}" "ANY" {ArgType.FILE.name} ("," {ArgType.FILE.name})* ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name}
+{Opcode.FOUND.value}           : "{Opcode.FOUND.name}" {ArgType.FILE.name}
 {Opcode.JUMP.value}            : "{Opcode.JUMP.name}" "TO" {ArgType.NAME.name}
 {Opcode.LABEL.value}           : "{Opcode.LABEL.name}" {ArgType.NAME.name}
 {Opcode.PAUSE.value}           : "{Opcode.PAUSE.name}"
-{Opcode.PCLICK.value}          : "{Opcode.PCLICK.name}" ({ArgType.COORDS.name} | "ON" {ArgType.FILE.name} "WITHIN" {ArgType.TIME.name})
-{Opcode.PFIND.value}           : "{Opcode.PFIND.name}" {ArgType.FILE.name} "WITHIN" {ArgType.TIME.name}
+{Opcode.PCLICK.value}          : "{Opcode.PCLICK.name}" ({ArgType.COORDS.name} | "ON" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name})
+{Opcode.PFIND.value}           : "{Opcode.PFIND.name}" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name}
 {Opcode.RETURN.value}          : "{Opcode.RETURN.name}"
 {Opcode.WAIT.value}            : "{Opcode.WAIT.name}" {ArgType.TIME.name}
+{Opcode.WAIT_UNTIL.value}      : "{Opcode.WAIT.name}" "UNTIL" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name}
+{Opcode.WAIT_WHILE.value}      : "{Opcode.WAIT.name}" "WHILE" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "WITHIN" {ArgType.TIME.name}
+
+{Opcode.PARALLEL.value}        : "{Opcode.PARALLEL.name}" "{{" parallel_branch+ "}}"
+{Opcode.RACE.value}            : "{Opcode.RACE.name}" "{{" race_branch+ "}}"
+
+?parallel_branch : {Opcode.CALL.value}
+                | {Opcode.FIND.value}
+                | {Opcode.FIND_ALL.value}
+                | {Opcode.FIND_ANY.value}
+                | {Opcode.PFIND.value}
+                | {Opcode.WAIT.value}
+                | {Opcode.WAIT_UNTIL.value}
+                | {Opcode.WAIT_WHILE.value}
+?race_branch     : parallel_branch
+                | {Opcode.CLICK.value}
+                | {Opcode.DOUBLE_CLICK.value}
+                | {Opcode.PCLICK.value}
 
 instruction     : {Opcode.CALL.value}
                 | {Opcode.CLICK.value}
                 | {Opcode.DOUBLE_CLICK.value}
                 | {Opcode.FIND.value}
+                | {Opcode.FIND_ALL.value}
+                | {Opcode.FIND_ANY.value}
                 | {Opcode.JUMP.value}
                 | {Opcode.LABEL.value}
                 | {Opcode.PAUSE.value}
@@ -42,12 +66,15 @@ instruction     : {Opcode.CALL.value}
                 | {Opcode.PFIND.value}
                 | {Opcode.RETURN.value}
                 | {Opcode.WAIT.value}
+                | {Opcode.WAIT_UNTIL.value}
+                | {Opcode.WAIT_WHILE.value}
 """ + r"""
-body            : "{" (instruction | conditional | neg_conditional)+ "}"
+body            : "{" (instruction | conditional | neg_conditional | race | parallel)+ "}"
 """ + f"""
-conditional     : "IF" ({Opcode.FIND.value} | {Opcode.PFIND.value}) body ("ELSE" body)?
+conditional     : "IF" ({Opcode.FIND.value} | {Opcode.PFIND.value} | {Opcode.FIND_ALL.value} | {Opcode.FIND_ANY.value} | {Opcode.FOUND.value}) body ("ELSE" body)?
 procedure       : "PROC" {ArgType.NAME.name} body
-neg_conditional : "IF NOT" {Opcode.FIND.value} body ("ELSE" body)?
+neg_conditional : "IF NOT" ({Opcode.FIND.value} | {Opcode.FIND_ALL.value} | {Opcode.FIND_ANY.value} | {Opcode.FOUND.value}) body ("ELSE" body)?
 macro           : "MACRO" {ArgType.NAME.name} body 
-start           : (macro | procedure)+
+watcher         : "ON" {ArgType.FILE.name} ("IN" {ArgType.REGION.name})? "CALL" {ArgType.NAME.name}
+start           : (macro | procedure | watcher)+
 """
@@ -1,11 +1,27 @@
 from enum import Enum
+from typing import Dict, Tuple
 
 
 class EqualEnum(Enum):
 
     def __eq__(self, other):
+        # Members are singletons, no need to compare the strings then
+        if self is other:
+            return True
+
+        if isinstance(other, EqualEnum) and type(other) is type(self):
+            return False
+
         return str(self) == str(other) \
-               or str(self.value).lower() == str(other).lower()
+            or str(self.value).lower() == str(other).lower()
+
+    def __hash__(self):
+        # Same as of the value, which the member is equal to
+        return hash(str(self.value).lower())
+
+    @classmethod
+    def values(cls) -> Tuple[str, ...]:
+        return tuple(member.value for member in cls)
 
 
 class Opcode(EqualEnum):
@@ -15,19 +31,52 @@ class Opcode(EqualEnum):
     END = 'end'
     EXIT = 'exit'
     FIND = 'find'
+    FIND_ALL = 'find_all'
+    FIND_ANY = 'find_any'
+    FOUND = 'found'
     GOTO = 'goto'
     IF = 'if'
     JUMP = 'jump'
     LABEL = 'label'
+    PARALLEL = 'parallel'
     PAUSE = 'pause'
     PCLICK = 'pclick'
     PFIND = 'pfind'
+    RACE = 'race'
     RETURN = 'return'
     WAIT = 'wait'
+    WAIT_UNTIL = 'wait_until'
+    WAIT_WHILE = 'wait_while'
+
+
+# Integer codes of the opcodes, indexes to the interpreter dispatch table
+OPCODE_CODES: Dict[Opcode, int] = {
+    opcode: code for code, opcode in enumerate(Opcode)
+}
+
+
+class CaptureBackend(EqualEnum):
+    PYAUTOGUI = 'pyautogui'
+    MSS = 'mss'
+    FILE = 'file'
+    TIMELINE = 'timeline'
+
+
+class DiagnosticKind(EqualEnum):
+    EMPTY_RETURN = 'empty-return'
+    NO_END = 'no-end'
+    RECURSION = 'recursion'
+    UNREACHABLE_PROCEDURE = 'unreachable-procedure'
+
+
+class MatchEngine(EqualEnum):
+    STEP = 'step'
+    PYRAMID = 'pyramid'
 
 
 class ArgType(EqualEnum):
     NAME = 'name'
     FILE = 'file'
     COORDS = 'coords'
+    REGION = 'region'
     TIME = 'time'
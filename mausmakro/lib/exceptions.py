@@ -8,6 +8,14 @@ class MausMakroException(Exception):
         return self.msg
 
 
+class BenchException(MausMakroException):
+    pass
+
+
+class CaptureException(MausMakroException):
+    pass
+
+
 class ConditionException(MausMakroException):
     pass
 
@@ -20,6 +28,10 @@ class InterpretException(MausMakroException):
     pass
 
 
+class InterruptException(MausMakroException):
+    pass
+
+
 class LabelException(MausMakroException):
     pass
 
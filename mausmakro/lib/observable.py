@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from enum import Enum, auto
-from typing import Any, List, TYPE_CHECKING
+from enum import Enum, IntEnum, auto
+from time import time
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from lib.observer import Observer
@@ -12,21 +13,84 @@ class MessageType(Enum):
     MAUSMAKRO_EXCEPTION = auto()
 
 
+class Level(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+    @classmethod
+    def names(cls) -> Tuple[str, ...]:
+        return tuple(member.name.lower() for member in cls)
+
+
+# Level of the observables nobody observes, no message is sent then
+SILENT = Level.ERROR + 1
+
+
+class Event:
+    """A message with its level, formatted only once someone reads it."""
+    __slots__ = ('args', 'level', 'msg', 'time')
+
+    args: Tuple[Any, ...]
+    level: Level
+    msg: str
+    time: float
+
+    def __init__(self, level: Level, msg: str, args: Tuple[Any, ...] = ()):
+        self.args = args
+        self.level = level
+        self.msg = msg
+        self.time = time()
+
+    def __eq__(self, other):
+        return isinstance(other, Event) and self.level == other.level \
+            and self.message == other.message
+
+    def __repr__(self):
+        return f"Event({self.level.name}, {self.message!r})"
+
+    def __str__(self):
+        return self.message
+
+    @property
+    def message(self) -> str:
+        return self.msg % self.args if self.args else self.msg
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'time': self.time,
+            'level': self.level.name.lower(),
+            'message': self.message,
+        }
+
+
 class Observable:
     _observers: List[Observer]
 
+    # The lowest level any of the observers wants to know about
+    level: int
+
     def __init__(self):
         self._observers = []
+        self.level = SILENT
 
     def register(self, observer: Observer):
         self._observers.append(observer)
+        self.level = min(o.level for o in self._observers)
 
     def unregister(self, observer: Observer):
         self._observers.remove(observer)
+        self.level = min((o.level for o in self._observers), default=SILENT)
 
     def notify(self, msg_type: MessageType, msg_data: Any):
         for observer in self._observers:
             observer.update(msg_type, msg_data)
 
-    def notify_msg(self, msg: str):
-        return self.notify(MessageType.MESSAGE, msg)
+    def notify_msg(self, msg: str, *args: Any, level: Level = Level.INFO):
+        """Notify about a message, formatted with the args as by %.
+
+        Nothing is done for the messages nobody wants to know about.
+        """
+        if level >= self.level:
+            self.notify(MessageType.MESSAGE, Event(level, msg, args))
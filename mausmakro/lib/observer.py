@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Any, List, TYPE_CHECKING
 
+from mausmakro.lib.observable import Level
+
 if TYPE_CHECKING:
     from lib.observable import Observable, MessageType
 
@@ -9,8 +11,12 @@ if TYPE_CHECKING:
 class Observer:
     _observables: List[Observable]
 
+    # Messages of the lower levels are not sent to the observer at all
+    level: Level
+
     def __init__(self):
         self._observables = []
+        self.level = Level.DEBUG
 
     def register(self, observable: Observable):
         self._observables.append(observable)
@@ -1,17 +1,26 @@
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple, Union
 
-from mausmakro.lib.enums import Opcode
+from mausmakro.lib.enums import OPCODE_CODES, Opcode
 
 
 class Instruction:
+    __slots__ = ('code', 'opcode')
+
+    code: int
     opcode: Opcode
 
+    def __init__(self, opcode: Opcode):
+        self.code = OPCODE_CODES[opcode]
+        self.opcode = opcode
+
 
 class Command(Instruction):
+    __slots__ = ('arg',)
+
     arg: Any
 
     def __init__(self, opcode: Opcode, arg: Any = None):
-        self.opcode = opcode
+        super(Command, self).__init__(opcode)
         self.arg = arg
 
     def __eq__(self, other):
@@ -19,13 +28,17 @@ class Command(Instruction):
 
 
 class Conditional(Instruction):
+    __slots__ = ('condition', 'negate', 'end_label', 'else_label')
+
     condition: Command
-    negate = False
-    end_label: str
-    else_label: Optional[str]
+    negate: bool
+    # Label names, or indexes of the instructions once resolved
+    end_label: Union[str, int]
+    else_label: Optional[Union[str, int]]
 
     def __init__(self, opcode: Opcode):
-        self.opcode = opcode
+        super(Conditional, self).__init__(opcode)
+        self.negate = False
 
     def __eq__(self, other):
         return self.opcode == other.opcode and \
@@ -35,6 +48,41 @@ class Conditional(Instruction):
                self.else_label == other.else_label
 
 
+class Block(Instruction):
+    __slots__ = ('branches',)
+
+    # Commands run at the same time
+    branches: List[Command]
+
+    def __init__(self, opcode: Opcode, branches: List[Command]):
+        super(Block, self).__init__(opcode)
+        self.branches = branches
+
+    def __eq__(self, other):
+        return self.opcode == other.opcode and \
+               self.branches == getattr(other, 'branches', None)
+
+
+class Watcher:
+    __slots__ = ('image', 'handler', 'region')
+
+    image: str
+    # Procedure called when the image appears on the screen
+    handler: str
+    region: Optional[Tuple[int, int, int, int]]
+
+    def __init__(self, image: str, handler: str,
+                 region: Optional[Tuple[int, int, int, int]] = None):
+        self.image = image
+        self.handler = handler
+        self.region = region
+
+    def __eq__(self, other):
+        return self.image == other.image and \
+               self.handler == other.handler and \
+               self.region == other.region
+
+
 class Macro:
     name: str
     body: List[Instruction]
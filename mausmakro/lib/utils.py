@@ -0,0 +1,22 @@
+import os
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """Directory for the files kept across runs."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_home) / 'mausmakro'
+
+
+def resolve_image_path(image: str, source_file: str) -> Path:
+    """Resolve the image path as written in the macro file.
+
+    Relative paths are looked up in the implicit 'images' directory
+    next to the macro source file.
+    """
+    img_path = Path(image)
+    if not img_path.is_absolute():
+        abs_path = Path(source_file).parent
+        img_path = abs_path.joinpath(Path(f'images/{image}'))
+
+    return img_path
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple, Union
+
+from mausmakro.lib.utils import cache_dir
+from mausmakro.matching import Box, Match
+
+
+def default_cache_file() -> Path:
+    return cache_dir() / 'locations.json'
+
+
+class LocationCache:
+    """Locations of the found images, kept across runs.
+
+    Entries are keyed by the macro file, the screen size and the hash of the
+    image content, so an edited image or a different screen layout never
+    reuses an old location. Entries of the macro file stored for another
+    screen size are dropped when loading, and an entry is dropped after
+    several searches in a row did not find the image at its location.
+    """
+    _entries: Dict[str, Dict[str, Any]]
+    _hashes: Dict[str, str]
+    _lock: Lock
+
+    geometry: str
+    macro: str
+    path: Path
+
+    # Entry is dropped after this many misses in a row
+    MAX_MISSES = 3
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path], macro_file: str,
+                 screen_size: Tuple[int, int]):
+        self._entries = {}
+        self._hashes = {}
+        self._lock = Lock()
+
+        self.geometry = f'{screen_size[0]}x{screen_size[1]}'
+        self.macro = str(Path(macro_file).resolve())
+        self.path = Path(path)
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+
+            if data.get('version') != self.VERSION:
+                return
+
+            entries = data['entries']
+
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Missing or broken cache is the same as an empty one
+            return
+
+        prefix = f'{self.macro}|'
+        current = f'{prefix}{self.geometry}|'
+        self._entries = {
+            key: entry for key, entry in entries.items()
+            if not key.startswith(prefix) or key.startswith(current)
+        }
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({'version': self.VERSION,
+                               'entries': self._entries})
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+
+        os.replace(tmp_path, self.path)
+
+    def get(self, image: Union[str, Path]) -> Optional[Box]:
+        entry = self._entries.get(self._key(image))
+        return tuple(entry['box']) if entry else None
+
+    def hit(self, image: Union[str, Path], match: Match):
+        with self._lock:
+            self._entries[self._key(image)] = {
+                'box': list(match.box),
+                'score': match.score,
+                'misses': 0,
+            }
+
+    def miss(self, image: Union[str, Path]):
+        key = self._key(image)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+
+            entry['misses'] += 1
+            if entry['misses'] >= self.MAX_MISSES:
+                del self._entries[key]
+
+    def _key(self, image: Union[str, Path]) -> str:
+        image = str(image)
+        digest = self._hashes.get(image)
+        if digest is None:
+            with open(image, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+
+            self._hashes[image] = digest
+
+        return f'{self.macro}|{self.geometry}|{digest}'
@@ -0,0 +1,288 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from mausmakro.lib.enums import MatchEngine
+
+# (left, top, width, height) in screenshot pixels
+Box = Tuple[int, int, int, int]
+
+
+class Match(NamedTuple):
+    left: int
+    top: int
+    width: int
+    height: int
+    score: float
+
+    @property
+    def box(self) -> Box:
+        return self.left, self.top, self.width, self.height
+
+    def moved(self, x: int, y: int) -> 'Match':
+        return self._replace(left=self.left + x, top=self.top + y)
+
+
+class Matcher:
+    """Finds a template image in a screen image.
+
+    Both images are numpy arrays, either grayscale or BGR,
+    but always of the same kind. Searching in a part of the screen gives the
+    same results only if the part is aligned to the alignment of the matcher.
+    """
+    alignment = 1
+
+    def match(self, screen: np.ndarray,
+              template: np.ndarray) -> Optional[Match]:
+        raise NotImplementedError
+
+    @staticmethod
+    def fits(screen: np.ndarray, template: np.ndarray) -> bool:
+        return screen.shape[0] >= template.shape[0] \
+               and screen.shape[1] >= template.shape[1]
+
+    @staticmethod
+    def correlate(screen: np.ndarray, template: np.ndarray) -> np.ndarray:
+        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        # Flat (single color) areas have no variance to correlate
+        return np.nan_to_num(result, copy=False, nan=0, posinf=0, neginf=0)
+
+
+class StepMatcher(Matcher):
+    """The matching algorithm used by pyautogui.
+
+    The first location in row order which exceeds the confidence is
+    returned. Step 2 skips every other row and column of both images and
+    lowers the confidence by 5% to compensate, any other step is ignored.
+    """
+    confidence: float
+    step: int
+
+    def __init__(self, step: int = 1, confidence: float = 0.999):
+        self.confidence = confidence
+        self.step = 2 if step == 2 else 1
+        self.alignment = self.step
+
+    def match(self, screen: np.ndarray,
+              template: np.ndarray) -> Optional[Match]:
+        if not self.fits(screen, template):
+            return None
+
+        height, width = template.shape[:2]
+        confidence = self.confidence
+        if self.step == 2:
+            confidence *= 0.95
+            screen = screen[::2, ::2]
+            template = template[::2, ::2]
+
+        result = self.correlate(screen, template)
+        found = np.flatnonzero(result > confidence)
+        if found.size == 0:
+            return None
+
+        y, x = np.unravel_index(found[0], result.shape)
+        return Match(int(x) * self.step, int(y) * self.step, width, height,
+                     float(result[y, x]))
+
+
+class PyramidMatcher(Matcher):
+    """Coarse to fine matching.
+
+    The screen and the template are downscaled and matched first, then only
+    the few best candidates are verified at the full resolution. Small
+    templates are downscaled less, so they keep enough detail to match.
+    The coarse level is matched in grayscale even for color images, the
+    colors are compared only when verifying the candidates.
+    """
+    candidates: int
+    min_size: int
+    scale: int
+    threshold: float
+
+    # Candidates scoring lower than this at the coarse level are not verified
+    COARSE_THRESHOLD = 0.5
+
+    def __init__(self, threshold: float = 0.99, scale: int = 4,
+                 min_size: int = 16, candidates: int = 5):
+        self.candidates = candidates
+        self.min_size = min_size
+        self.scale = scale
+        self.threshold = threshold
+
+    def match(self, screen: np.ndarray,
+              template: np.ndarray) -> Optional[Match]:
+        if not self.fits(screen, template):
+            return None
+
+        factor = self._factor(template)
+        if factor == 1:
+            return self._verify(screen, template, (0, 0), screen.shape[:2])
+
+        small_screen = self._downscale(screen, factor)
+        small_template = self._downscale(template, factor)
+        if not self.fits(small_screen, small_template):
+            return self._verify(screen, template, (0, 0), screen.shape[:2])
+
+        result = self.correlate(small_screen, small_template)
+        margin = 2 * factor
+        height, width = template.shape[:2]
+
+        best = None
+        for x, y in self._peaks(result, small_template.shape[:2]):
+            top = max(y * factor - margin, 0)
+            left = max(x * factor - margin, 0)
+            bottom = min(y * factor + height + margin, screen.shape[0])
+            right = min(x * factor + width + margin, screen.shape[1])
+
+            found = self._verify(screen, template, (top, left),
+                                 (bottom, right))
+            if found and (best is None or found.score > best.score):
+                best = found
+
+        return best
+
+    def _factor(self, template: np.ndarray) -> int:
+        factor = self.scale
+        while factor > 1 and min(template.shape[:2]) // factor < self.min_size:
+            factor //= 2
+
+        return max(factor, 1)
+
+    @staticmethod
+    def _downscale(image: np.ndarray, factor: int) -> np.ndarray:
+        size = (image.shape[1] // factor, image.shape[0] // factor)
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        return image
+
+    def _peaks(self, result: np.ndarray,
+               size: Tuple[int, int]) -> List[Tuple[int, int]]:
+        # Take the best locations, suppressing the surroundings of each one
+        peaks = []
+        half_h = max(size[0] // 2, 1)
+        half_w = max(size[1] // 2, 1)
+
+        for _ in range(self.candidates):
+            _, score, _, (x, y) = cv2.minMaxLoc(result)
+            if score < self.COARSE_THRESHOLD:
+                break
+
+            peaks.append((x, y))
+            result[max(y - half_h, 0):y + half_h + 1,
+                   max(x - half_w, 0):x + half_w + 1] = -1
+
+        return peaks
+
+    def _verify(self, screen: np.ndarray, template: np.ndarray,
+                top_left: Tuple[int, int],
+                bottom_right: Tuple[int, int]) -> Optional[Match]:
+        top, left = top_left
+        roi = screen[top:bottom_right[0], left:bottom_right[1]]
+        if not self.fits(roi, template):
+            return None
+
+        result = self.correlate(roi, template)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        if score < self.threshold:
+            return None
+
+        height, width = template.shape[:2]
+        return Match(left + x, top + y, width, height, float(score))
+
+
+class TiledMatcher(Matcher):
+    """Matches overlapping tiles of the screen in parallel.
+
+    The screen is split into strips along its longer side, each strip
+    overlapping the next one by the template size, so no location is lost.
+    OpenCV releases the GIL while matching, so a thread pool is enough to use
+    all the cores. The best scoring match of all tiles wins.
+    """
+    _matcher: Matcher
+    _pool: ThreadPoolExecutor
+
+    workers: int
+
+    # Tiles smaller than this are not worth the overhead of the pool
+    MIN_TILE = 256
+
+    def __init__(self, matcher: Matcher, workers: int):
+        self._matcher = matcher
+        self._pool = ThreadPoolExecutor(workers,
+                                        thread_name_prefix='mausmakro-match')
+        self.alignment = matcher.alignment
+        self.workers = workers
+
+    def match(self, screen: np.ndarray,
+              template: np.ndarray) -> Optional[Match]:
+        tiles = self._tiles(screen.shape[:2], template.shape[:2])
+        if len(tiles) < 2:
+            return self._matcher.match(screen, template)
+
+        futures = [
+            self._pool.submit(self._match_tile, screen, template, tile)
+            for tile in tiles
+        ]
+
+        best = None
+        for future in futures:
+            found = future.result()
+            if found and (best is None or found.score > best.score):
+                best = found
+
+        return best
+
+    def _match_tile(self, screen: np.ndarray, template: np.ndarray,
+                    tile: Box) -> Optional[Match]:
+        left, top, width, height = tile
+        found = self._matcher.match(
+            screen[top:top + height, left:left + width], template
+        )
+
+        return found.moved(left, top) if found else None
+
+    def _tiles(self, screen: Tuple[int, int],
+               template: Tuple[int, int]) -> List[Box]:
+        vertical = screen[1] >= screen[0]
+        length = screen[1] if vertical else screen[0]
+        overlap = (template[1] if vertical else template[0]) - 1
+
+        count = min(self.workers, length // max(2 * overlap, self.MIN_TILE))
+        if count < 2:
+            return []
+
+        size = -(-length // count)
+        size += -size % self.alignment
+
+        tiles = []
+        for start in range(0, length, size):
+            end = min(start + size + overlap, length)
+            if vertical:
+                tiles.append((start, 0, end - start, screen[0]))
+            else:
+                tiles.append((0, start, screen[1], end - start))
+
+        return tiles
+
+
+ENGINES = MatchEngine.values()
+
+
+def create_matcher(engine: str, step: int = 1, workers: int = 1) -> Matcher:
+    if engine == MatchEngine.STEP:
+        matcher = StepMatcher(step)
+
+    elif engine == MatchEngine.PYRAMID:
+        matcher = PyramidMatcher()
+
+    else:
+        raise ValueError(f"Unknown matching engine '{engine}'")
+
+    if workers > 1:
+        return TiledMatcher(matcher, workers)
+
+    return matcher
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import os
+from bisect import bisect_left
+from threading import Event, Lock, Thread
+from time import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union, \
+    TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from http.server import HTTPServer
+
+# Upper bounds of the histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0)
+DURATION_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0,
+                    3600.0)
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    value: float
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {self.value}"]
+
+
+class Histogram:
+    __slots__ = ('bounds', 'buckets', 'count', 'sum')
+
+    bounds: Sequence[float]
+    buckets: List[int]
+    count: int
+    sum: float
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # The last one for the values over all the bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        # Labels of the buckets go after the labels of the histogram
+        prefix = labels[:-1] + ',' if labels else '{'
+        samples = []
+        total = 0
+        for bound, count in zip((*map(str, self.bounds), '+Inf'),
+                                self.buckets):
+            total += count
+            samples.append(f'{name}_bucket{prefix}le="{bound}"}} {total}')
+
+        samples.append(f"{name}_sum{labels} {self.sum}")
+        samples.append(f"{name}_count{labels} {self.count}")
+        return samples
+
+
+Metric = Union[Counter, Histogram]
+
+
+class Family:
+    """Metrics of the same name, one for every combination of labels."""
+    _buckets: Optional[Sequence[float]]
+    _children: Dict[Tuple[str, ...], Metric]
+    _lock: Lock
+
+    description: str
+    kind: str
+    label_names: Tuple[str, ...]
+    name: str
+
+    def __init__(self, name: str, description: str, kind: str,
+                 label_names: Tuple[str, ...] = (),
+                 buckets: Optional[Sequence[float]] = None):
+        self._buckets = buckets
+        self._children = {}
+        self._lock = Lock()
+
+        self.description = description
+        self.kind = kind
+        self.label_names = label_names
+        self.name = name
+
+    def labels(self, *values: str) -> Metric:
+        child = self._children.get(values)
+        if child is None:
+            # Rendered by another thread, the dict must not change meanwhile
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = Counter() if self.kind == 'counter' \
+                        else Histogram(self._buckets)
+                    self._children = {**self._children, values: child}
+
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}",
+                 f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._children.items():
+            labels = ','.join(f'{name}="{escape(value)}"' for name, value
+                              in zip(self.label_names, values))
+            lines.extend(child.samples(self.name,
+                                       f"{{{labels}}}" if labels else ''))
+
+        return lines
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+class Registry:
+    """Metrics exposed together, in the Prometheus text format."""
+    _families: List[Family]
+
+    def __init__(self):
+        self._families = []
+
+    def counter(self, name: str, description: str,
+                labels: Tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, description, 'counter', labels))
+
+    def histogram(self, name: str, description: str,
+                  buckets: Sequence[float],
+                  labels: Tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, description, 'histogram', labels,
+                                buckets))
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, family: Family) -> Family:
+        self._families.append(family)
+        return family
+
+
+class MacroMetrics:
+    """What the interpreter counts while running the macro."""
+    _find_seconds: Family
+
+    failures: Counter
+    find_hits: Counter
+    find_misses: Counter
+    instructions: Counter
+    iteration_seconds: Histogram
+    iterations: Counter
+    registry: Registry
+    retries: Counter
+
+    def __init__(self):
+        self.registry = Registry()
+        registry = self.registry
+
+        self.iterations = registry.counter(
+            'mausmakro_iterations_total', "Runs of the macro."
+        ).labels()
+        self.iteration_seconds = registry.histogram(
+            'mausmakro_iteration_seconds', "Duration of the runs.",
+            DURATION_BUCKETS
+        ).labels()
+        self.instructions = registry.counter(
+            'mausmakro_instructions_total', "Executed instructions."
+        ).labels()
+        self.failures = registry.counter(
+            'mausmakro_failures_total', "Failed commands."
+        ).labels()
+        self.retries = registry.counter(
+            'mausmakro_retries_total', "Retried commands."
+        ).labels()
+
+        finds = registry.counter('mausmakro_finds_total',
+                                 "Searches for images.", ('result',))
+        self.find_hits = finds.labels('hit')
+        self.find_misses = finds.labels('miss')
+        self._find_seconds = registry.histogram(
+            'mausmakro_find_seconds', "Duration of the searches by image.",
+            LATENCY_BUCKETS, ('image',)
+        )
+
+    def find(self, image: Optional[str], seconds: float, found: bool):
+        """Count a search, the time is kept only for single images."""
+        if found:
+            self.find_hits.inc()
+
+        else:
+            self.find_misses.inc()
+
+        if image is not None:
+            self._find_seconds.labels(image).observe(seconds)
+
+
+class MetricsServer:
+    """Serves the metrics over HTTP, on localhost only.
+
+    The requests are handled one after another, by a single thread.
+    """
+    _server: HTTPServer
+
+    def __init__(self, registry: Registry, port: int,
+                 host: str = '127.0.0.1'):
+        # Slow to import, most of the runs do not serve the metrics
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = HTTPServer((host, port), Handler)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsFile:
+    """Appends the metrics to a file periodically, rotating it.
+
+    Every snapshot is preceded by a comment with its time. When the file
+    grows over the size limit, it is renamed with the suffix .1, the
+    older ones to .2 and so on, and the oldest is deleted.
+    """
+    _stop_flag: Event
+    _thread: Optional[Thread]
+
+    backups: int
+    interval: float
+    max_bytes: int
+    path: str
+    registry: Registry
+
+    def __init__(self, registry: Registry, path: str, interval: float = 60.0,
+                 max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self._stop_flag = Event()
+        self._thread = None
+
+        self.backups = backups
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.path = path
+        self.registry = registry
+
+    def start(self):
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop, writing the last snapshot."""
+        self._stop_flag.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write(self):
+        snapshot = f"# {time():.3f}\n{self.registry.render()}"
+        if os.path.exists(self.path) \
+                and os.path.getsize(self.path) + len(snapshot) \
+                > self.max_bytes:
+            self._rotate()
+
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(snapshot)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+
+        else:
+            os.remove(self.path)
+
+    def _run(self):
+        while not self._stop_flag.wait(self.interval):
+            self.write()
+
+        self.write()
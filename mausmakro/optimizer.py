@@ -0,0 +1,227 @@
+import copy
+from typing import Dict, List, Optional, Set, Tuple
+
+from mausmakro.lib.enums import Opcode
+from mausmakro.lib.types import Block, Command, Conditional, Instruction
+
+# Instructions never continuing with the next one
+TERMINATORS = (Opcode.END, Opcode.EXIT, Opcode.JUMP, Opcode.RETURN)
+
+
+class Optimizer:
+    """Simplifies the parsed program before it is interpreted.
+
+    Jumps to jumps are threaded, consecutive waits merged and the code which
+    cannot be reached is dropped. Finally, the labels are removed and all
+    the jump, call and conditional targets are replaced by the index of the
+    instruction to continue with, so no label is looked up at run time.
+    The label table then maps the macro and procedure names to indexes of
+    their first instruction.
+    """
+    _instructions: List[Instruction]
+    _label_table: Dict[str, int]
+
+    def __init__(self, instructions: List[Instruction],
+                 label_table: Dict[str, int]):
+        # The parsed program stays untouched
+        self._instructions = [copy.copy(ins) for ins in instructions]
+        for ins in self._instructions:
+            if isinstance(ins, Conditional):
+                ins.condition = copy.copy(ins.condition)
+
+            elif isinstance(ins, Block):
+                ins.branches = [copy.copy(cmd) for cmd in ins.branches]
+
+        self._label_table = dict(label_table)
+
+    def optimize(self) -> Tuple[List[Instruction], Dict[str, int]]:
+        while True:
+            size = len(self._instructions)
+            self._thread_jumps()
+            self._drop_unreachable()
+            self._drop_unused_labels()
+            self._merge_waits()
+            if len(self._instructions) == size:
+                break
+
+        return self._resolve()
+
+    def _destinations(self) -> Dict[str, int]:
+        """Index of the first instruction after every label."""
+        destinations = {}
+        pending = []
+        for i, ins in enumerate(self._instructions):
+            if ins.opcode == Opcode.LABEL:
+                pending.append(ins.arg)
+
+            else:
+                destinations.update((label, i) for label in pending)
+                pending.clear()
+
+        return destinations
+
+    def _thread(self, label: str, destinations: Dict[str, int]) -> str:
+        seen = {label}
+        while True:
+            target = self._instructions[destinations[label]]
+            if target.opcode != Opcode.JUMP or target.arg in seen:
+                return label
+
+            label = target.arg
+            seen.add(label)
+
+    def _thread_jumps(self):
+        destinations = self._destinations()
+        kept = []
+        for i, ins in enumerate(self._instructions):
+            if isinstance(ins, Conditional):
+                ins.end_label = self._thread(ins.end_label, destinations)
+                if ins.else_label is not None:
+                    ins.else_label = self._thread(ins.else_label,
+                                                  destinations)
+
+            elif isinstance(ins, Block):
+                for cmd in self._branch_calls(ins):
+                    cmd.arg = self._thread(cmd.arg, destinations)
+
+            elif ins.opcode == Opcode.CALL or ins.opcode == Opcode.JUMP:
+                ins.arg = self._thread(ins.arg, destinations)
+
+                # Jump to the next instruction does nothing
+                if ins.opcode == Opcode.JUMP \
+                        and self._is_next(i, destinations[ins.arg]):
+                    continue
+
+            kept.append(ins)
+
+        self._instructions = kept
+
+    def _is_next(self, index: int, destination: int) -> bool:
+        return index < destination and all(
+            ins.opcode == Opcode.LABEL
+            for ins in self._instructions[index + 1:destination]
+        )
+
+    def _referenced(self) -> Set[str]:
+        labels = set()
+        for ins in self._instructions:
+            if isinstance(ins, Conditional):
+                labels.add(ins.end_label)
+                if ins.else_label is not None:
+                    labels.add(ins.else_label)
+
+            elif isinstance(ins, Block):
+                labels.update(cmd.arg for cmd in self._branch_calls(ins))
+
+            elif ins.opcode == Opcode.CALL or ins.opcode == Opcode.JUMP:
+                labels.add(ins.arg)
+
+        return labels
+
+    @staticmethod
+    def _branch_calls(block: Block) -> List[Command]:
+        return [cmd for cmd in block.branches if cmd.opcode == Opcode.CALL]
+
+    def _is_live(self, label: str, referenced: Set[str]) -> bool:
+        # Macros can be started from the outside, internal labels cannot
+        return label in referenced or '.' not in label
+
+    def _drop_unreachable(self):
+        referenced = self._referenced()
+        kept = []
+        reachable = True
+        for ins in self._instructions:
+            if ins.opcode == Opcode.LABEL:
+                reachable = reachable or self._is_live(ins.arg, referenced)
+
+            if reachable:
+                kept.append(ins)
+                if isinstance(ins, Command) and ins.opcode in TERMINATORS:
+                    reachable = False
+
+        self._instructions = kept
+
+    def _drop_unused_labels(self):
+        referenced = self._referenced()
+        self._instructions = [
+            ins for ins in self._instructions
+            if ins.opcode != Opcode.LABEL or self._is_live(ins.arg, referenced)
+        ]
+
+    def _merge_waits(self):
+        kept = []
+        for ins in self._instructions:
+            previous = kept[-1] if kept else None
+            if ins.opcode == Opcode.WAIT and previous is not None \
+                    and previous.opcode == Opcode.WAIT:
+                kept[-1] = Command(Opcode.WAIT, previous.arg + ins.arg)
+                continue
+
+            kept.append(ins)
+
+        self._instructions = kept
+
+    def _resolve(self) -> Tuple[List[Instruction], Dict[str, int]]:
+        targets = {}
+        instructions = []
+        for ins in self._instructions:
+            if ins.opcode == Opcode.LABEL:
+                targets[ins.arg] = len(instructions)
+
+            else:
+                instructions.append(ins)
+
+        for ins in instructions:
+            if isinstance(ins, Conditional):
+                ins.end_label = targets[ins.end_label]
+                if ins.else_label is not None:
+                    ins.else_label = targets[ins.else_label]
+
+            elif isinstance(ins, Block):
+                for cmd in self._branch_calls(ins):
+                    cmd.arg = targets[cmd.arg]
+
+            elif ins.opcode == Opcode.CALL or ins.opcode == Opcode.JUMP:
+                ins.arg = targets[ins.arg]
+
+        label_table = {label: index for label, index in targets.items()
+                       if label in self._label_table and '.' not in label}
+        return instructions, label_table
+
+
+def format_instruction(ins: Instruction) -> str:
+    if isinstance(ins, Conditional):
+        negate = 'NOT ' if ins.negate else ''
+        text = f"IF {negate}{format_instruction(ins.condition)}"
+        if ins.else_label is not None:
+            text += f" ELSE -> {ins.else_label}"
+
+        return f"{text} END -> {ins.end_label}"
+
+    if isinstance(ins, Block):
+        branches = ' | '.join(map(format_instruction, ins.branches))
+        return f"{ins.opcode.name} [{branches}]"
+
+    text = ins.opcode.name
+    if ins.arg is not None:
+        text += f" {ins.arg}"
+
+    return text
+
+
+def dump(instructions: List[Instruction], label_table: Dict[str, int],
+         title: Optional[str] = None) -> str:
+    """Human readable listing of the program."""
+    names = {}
+    for label, index in label_table.items():
+        names.setdefault(index, []).append(label)
+
+    lines = [f"; {title}, {len(instructions)} instructions"] if title else []
+    for i, ins in enumerate(instructions):
+        for label in names.get(i, []):
+            if ins.opcode != Opcode.LABEL:
+                lines.append(f"{label}:")
+
+        lines.append(f"{i:6}  {format_instruction(ins)}")
+
+    return '\n'.join(lines)
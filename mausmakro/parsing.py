@@ -1,65 +1,142 @@
-import random
-import string
-from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union
-
-from lark import Lark, Token, Tree, UnexpectedCharacters, UnexpectedToken
+from typing import Any, Dict, List, Optional, Set, TYPE_CHECKING, Tuple
 
+from mausmakro.analysis import CallGraph, Diagnostic
 from mausmakro.lib.ebnf import ebnf
 from mausmakro.lib.enums import ArgType, Opcode
 from mausmakro.lib.exceptions import ImageException, LabelException, \
     MausMakroException, ParserException
-from mausmakro.lib.types import Command, Conditional, Instruction
+from mausmakro.lib.types import Block, Command, Conditional, Instruction, \
+    Watcher
+from mausmakro.lib.utils import resolve_image_path
 from mausmakro.preprocessor import Preprocessor
+from mausmakro.program_cache import ProgramCache
+
+if TYPE_CHECKING:
+    from lark import Lark, Token, Tree
+
+_grammars: Dict[Optional[str], 'Lark'] = {}
+
+
+def build_grammar(cache_file: Optional[str] = None) -> 'Lark':
+    """Build the parser, only once per process.
+
+    With the cache file, the LALR tables are loaded from there instead of
+    being computed, unless the grammar has changed. Lark is imported only
+    here, a program restored from the cache does not need it at all.
+    """
+    from lark import Lark
+
+    if cache_file not in _grammars:
+        _grammars[cache_file] = Lark(ebnf, parser='lalr',
+                                     cache=cache_file or False,
+                                     propagate_positions=True)
+
+    return _grammars[cache_file]
 
 
 class Parser:
-    _defined_labels: List[str]
-    _called_labels: List[str]
+    _cache: Optional[ProgramCache]
+    _cache_key: Optional[str]
+    _called_labels: Dict[str, None]
+    _current_label: Optional[str]
+    _defined_labels: Set[str]
     _images_to_check: List[str]
+    _label_counter: int
+    _preprocessor: Preprocessor
     _source_path: str
-    _tree: Union[Tree, Tree]
+    _tree: Optional['Tree']
 
     instructions: List[Instruction]
     label_table: Dict[str, int]
+    # Original file and line of every instruction, before optimizing
+    lines: List[Tuple[str, int]]
     macro_defined = False
-
-    def __init__(self, path: str):
-        self._defined_labels = []
-        self._called_labels = []
+    macros: List[str]
+    procedures: List[str]
+    watchers: List[Watcher]
+
+    def __init__(self, path: str, cache: Optional[ProgramCache] = None):
+        self._cache = cache
+        self._cache_key = None
+        # Ordered, so the first undefined label is reported
+        self._called_labels = {}
+        self._current_label = None
+        self._defined_labels = set()
         self._images_to_check = []
+        self._label_counter = 0
+        self._preprocessor = Preprocessor(path)
         self._source_path = path
+        self._tree = None
+
+        self.instructions = []
+        self.label_table = {}
+        self.lines = []
+        self.macros = []
+        self.procedures = []
+        self.watchers = []
+
+        source = self._preprocessor.process(path)
+        if cache:
+            self._cache_key = cache.key(path, source)
+            program = cache.load(self._cache_key)
+            if program:
+                self._restore(program)
+                return
+
+        grammar_file = str(cache.grammar_file) if cache else None
+        self._tree = self._parse_source(source, grammar_file)
+
+    def _parse_source(self, source: str,
+                      grammar_file: Optional[str]) -> 'Tree':
+        from lark import UnexpectedCharacters, UnexpectedToken
 
-        lark = Lark(ebnf, parser='lalr')
-        preprocessor = Preprocessor(path)
         try:
-            source = preprocessor.process(path)
-            self._tree = lark.parse(source)
+            return build_grammar(grammar_file).parse(source)
 
         except UnexpectedToken as e:
             expected = set(t for t in e.expected if not t.startswith('__'))
-            msg = f"Invalid syntax on line {e.line}," \
+            msg = f"Invalid syntax {self._location(e.line)}," \
                   f" expected one of {expected}."
             raise ParserException(msg)
 
         except UnexpectedCharacters as e:
-            msg = f"Invalid character on line {e.line}!" \
+            msg = f"Invalid character {self._location(e.line)}!" \
                   f" Please make sure to use ASCII characters only."
             raise ParserException(msg)
 
-        self.instructions = []
-        self.label_table = {}
+    def _location(self, line: int) -> str:
+        # Lines of the preprocessed source, not of the original files
+        filename, line = self._preprocessor.locate(line)
+        return f"in {filename} on line {line}"
 
     def parse(self) -> Tuple[List[Instruction], Dict[str, int]]:
+        # Restored from the cache, already parsed
+        if self._tree is None:
+            return self.instructions, self.label_table
+
         self._parse_tree(self._tree)
         self._get_label_mappings()
+        self._tree = None
+
+        if self._cache:
+            self._cache.store(self._cache_key, self._program())
+
         return self.instructions, self.label_table
 
+    @property
+    def images(self) -> List[str]:
+        return list(dict.fromkeys(self._images_to_check))
+
+    @property
+    def sources(self) -> List[str]:
+        return self._preprocessor.files
+
     def perform_checks(self):
         if not self.macro_defined:
             raise ParserException("At least one macro must be defined!")
 
         self.check_labels()
+        self.check_parallel()
         self.check_images()
 
     def check_labels(self):
@@ -67,13 +144,29 @@ class Parser:
             if label not in self._defined_labels:
                 raise LabelException(f"Label {label} is not defined!")
 
-    def check_images(self):
-        for img in self._images_to_check:
-            img_path = Path(img)
-            if not img_path.is_absolute():
-                abs_path = Path(self._source_path).parent
-                img_path = abs_path.joinpath(Path(f'images/{img}'))
+        for watcher in self.watchers:
+            if watcher.handler not in self.procedures:
+                raise LabelException(f"{watcher.handler} called on "
+                                     f"{watcher.image} is not a procedure!")
+
+    def check_parallel(self):
+        """Clicking is allowed only in RACE, labels must be checked."""
+        for owner, procedure in CallGraph(self.instructions,
+                                          self.label_table, self.macros,
+                                          self.procedures).parallel_inputs():
+            raise ParserException(f"PARALLEL in {owner} calls {procedure}, "
+                                  "which can click! Clicking is allowed "
+                                  "only in RACE.")
+
+    def analyze(self) -> List[Diagnostic]:
+        """Find the problems of the control flow, labels must be checked."""
+        return CallGraph(self.instructions, self.label_table, self.macros,
+                         self.procedures,
+                         [w.handler for w in self.watchers]).analyze()
 
+    def check_images(self):
+        for img in self.images:
+            img_path = resolve_image_path(img, self._source_path)
             if not img_path.exists():
                 raise ImageException(f"Image {img} not found! "
                                      "Please make sure to put the images "
@@ -88,15 +181,34 @@ class Parser:
                 ins: Command
                 self.label_table[ins.arg] = i
 
-    def _parse_tree(self, tree: Tree):
+    def _parse_tree(self, tree: 'Tree'):
         if tree.data != 'start':
             raise ParserException("Invalid tree passed: "
                                   f"Expected 'start', got '{tree.data}'")
 
         for child in tree.children:
-            self._parse_macro(child)
+            if child.data == 'watcher':
+                self._parse_watcher(child)
 
-    def _parse_macro(self, tree: Tree):
+            else:
+                self._parse_macro(child)
+
+    def _parse_watcher(self, tree: 'Tree'):
+        try:
+            args = tuple(map(self.parse_token, tree.children))
+
+        except ParserException as e:
+            line = tree.children[0].line
+            raise ParserException(f"{e} ({self._location(line)})")
+
+        image, handler = args[0], args[-1]
+        region = args[1] if len(args) == 3 else None
+
+        self._images_to_check.append(image)
+        self._add_called_label(handler)
+        self.watchers.append(Watcher(image, handler, region))
+
+    def _parse_macro(self, tree: 'Tree'):
         if tree.data != 'macro' and tree.data != 'procedure':
             raise ParserException("Invalid tree passed: "
                                   "Expected 'macro' or 'procedure', "
@@ -104,18 +216,21 @@ class Parser:
 
         # noinspection PyTypeChecker
         name = self.parse_token(tree.children[0])
+        self._current_label = name
         self._define_label(name)
-        self.instructions.append(Command(Opcode.LABEL, name))
+        self._append(Command(Opcode.LABEL, name), tree.meta.line)
         self._parse_body(tree.children[1])
 
         if tree.data == 'macro':
             self.macro_defined = True
-            self.instructions.append(Command(Opcode.END))
+            self.macros.append(name)
+            self._append(Command(Opcode.END), tree.meta.end_line)
             return
 
-        self.instructions.append(Command(Opcode.RETURN))
+        self.procedures.append(name)
+        self._append(Command(Opcode.RETURN), tree.meta.end_line)
 
-    def _parse_body(self, tree: Tree):
+    def _parse_body(self, tree: 'Tree'):
         if tree.data != 'body':
             raise ParserException("Invalid tree passed: "
                                   f"Expected 'body' tree, got '{tree.data}'")
@@ -123,15 +238,26 @@ class Parser:
         for child in tree.children:
             if child.data == 'instruction':
                 cmd = self._parse_command(child.children[0])
-                self.instructions.append(cmd)
+                self._append(cmd, child.meta.line)
+
+            elif child.data == 'race' or child.data == 'parallel':
+                branches = [self._parse_command(c) for c in child.children]
+                self._append(Block(Opcode(child.data), branches),
+                             child.meta.line)
 
             else:
                 cond = self.parse_conditional(child.children)
                 cond.negate = child.data == 'neg_conditional'
 
-    def _parse_command(self, instruction: Tree) -> Command:
+    def _parse_command(self, instruction: 'Tree') -> Command:
         opcode = instruction.data
-        arg = tuple(map(self.parse_token, instruction.children))
+        try:
+            arg = tuple(map(self.parse_token, instruction.children))
+
+        except ParserException as e:
+            line = instruction.children[0].line
+            raise ParserException(f"{e} ({self._location(line)})")
+
         arg = arg[0] if len(arg) == 1 else arg
 
         if opcode == Opcode.CALL:
@@ -141,7 +267,7 @@ class Parser:
         elif opcode == Opcode.CLICK or opcode == Opcode.PCLICK:
             if isinstance(arg[0], str):
                 self._images_to_check.append(arg[0])
-                return Command(Opcode(opcode), arg)
+                return Command(Opcode(opcode), self._image_args(arg))
 
             return Command(Opcode.CLICK, arg)
 
@@ -153,7 +279,17 @@ class Parser:
 
         elif opcode == Opcode.FIND or opcode == Opcode.PFIND:
             self._images_to_check.append(arg[0])
-            return Command(Opcode(opcode), arg)
+            return Command(Opcode(opcode), self._image_args(arg))
+
+        elif opcode == Opcode.FIND_ALL or opcode == Opcode.FIND_ANY:
+            files = tuple(a for a in arg if isinstance(a, str))
+            self._images_to_check.extend(files)
+            rest = tuple(a for a in arg if not isinstance(a, str))
+            return Command(Opcode(opcode), self._image_args((files, *rest)))
+
+        elif opcode == Opcode.FOUND:
+            self._images_to_check.append(arg)
+            return Command(Opcode.FOUND, arg)
 
         elif opcode == Opcode.JUMP:
             self._add_called_label(arg)
@@ -172,12 +308,16 @@ class Parser:
         elif opcode == Opcode.WAIT:
             return Command(Opcode.WAIT, arg)
 
+        elif opcode == Opcode.WAIT_UNTIL or opcode == Opcode.WAIT_WHILE:
+            self._images_to_check.append(arg[0])
+            return Command(Opcode(opcode), self._image_args(arg))
+
         else:
             raise NotImplementedError(f"Instruction {instruction} "
                                       "is not implemented!")
 
     @staticmethod
-    def parse_token(token: Token) -> Any:
+    def parse_token(token: 'Token') -> Any:
         if token.type == ArgType.NAME or token.type == ArgType.FILE:
             return str(token.value)
 
@@ -185,6 +325,14 @@ class Parser:
             coords = token.value.partition(',')
             return int(coords[0]), int(coords[2])
 
+        elif token.type == ArgType.REGION:
+            region = tuple(int(n) for n in token.value.split(','))
+            if region[2] == 0 or region[3] == 0:
+                raise ParserException(f"Invalid region {token.value}, width "
+                                      "and height must not be zero.")
+
+            return region
+
         elif token.type == ArgType.TIME:
             num = int(''.join(filter(str.isdigit, token.value)))
             if token.value[-1] == 'm':
@@ -199,34 +347,48 @@ class Parser:
             raise NotImplementedError(f" Parsing for token {token.type} "
                                       "is not implemented!")
 
-    def parse_conditional(self, conditional: List[Tree]) -> Conditional:
+    @staticmethod
+    def _image_args(args: Tuple) -> Tuple:
+        # The optional search region always goes last: (file, time[, region])
+        if len(args) == 3:
+            return args[0], args[2], args[1]
+
+        return args
+
+    def parse_conditional(self, conditional: List['Tree']) -> Conditional:
         cond = Conditional(Opcode.IF)
         cond.condition = self._parse_command(conditional[0])
         cond.end_label = self._generate_label()
-        self.instructions.append(cond)
+        self._append(cond, conditional[0].meta.line)
 
         self._parse_body(conditional[1])
 
         if len(conditional) > 2:
-            self.instructions.append(Command(Opcode.JUMP, cond.end_label))
+            # The ELSE is on the line the first body ends
+            line = conditional[1].meta.end_line
+            self._append(Command(Opcode.JUMP, cond.end_label), line)
             cond.else_label = self._generate_label()
-            self.instructions.append(Command(Opcode.LABEL, cond.else_label))
+            self._append(Command(Opcode.LABEL, cond.else_label), line)
             self._parse_body(conditional[2])
 
         else:
             cond.else_label = None
 
-        self.instructions.append(Command(Opcode.LABEL, cond.end_label))
+        self._append(Command(Opcode.LABEL, cond.end_label),
+                     conditional[-1].meta.end_line)
         return cond
 
-    @staticmethod
-    def _generate_label() -> str:
-        letters = string.ascii_letters
-        return ''.join(random.choice(letters) for _ in range(8))
+    def _append(self, instruction: Instruction, line: int):
+        self.instructions.append(instruction)
+        self.lines.append(self._preprocessor.locate(line))
+
+    def _generate_label(self) -> str:
+        # The dot is not allowed in label names, so no clash with user labels
+        self._label_counter += 1
+        return f'{self._current_label}.{self._label_counter}'
 
     def _add_called_label(self, label: str):
-        if label not in self._called_labels:
-            self._called_labels.append(label)
+        self._called_labels[label] = None
 
     def macro_exists(self, macro: str):
         if macro not in self.label_table:
@@ -236,4 +398,30 @@ class Parser:
         if label in self._defined_labels:
             raise ParserException(f"Label '{label}' is already in use!")
 
-        self._defined_labels.append(label)
+        self._defined_labels.add(label)
+
+    def _program(self) -> Dict[str, Any]:
+        return {
+            'called_labels': self._called_labels,
+            'defined_labels': self._defined_labels,
+            'images': self._images_to_check,
+            'instructions': self.instructions,
+            'label_table': self.label_table,
+            'lines': self.lines,
+            'macro_defined': self.macro_defined,
+            'macros': self.macros,
+            'procedures': self.procedures,
+            'watchers': self.watchers,
+        }
+
+    def _restore(self, program: Dict[str, Any]):
+        self._called_labels = program['called_labels']
+        self._defined_labels = program['defined_labels']
+        self._images_to_check = program['images']
+        self.instructions = program['instructions']
+        self.label_table = program['label_table']
+        self.lines = program['lines']
+        self.macro_defined = program['macro_defined']
+        self.macros = program['macros']
+        self.procedures = program['procedures']
+        self.watchers = program['watchers']
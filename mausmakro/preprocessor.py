@@ -1,18 +1,34 @@
 from pathlib import Path
+from typing import List, Set, Tuple
 
 from mausmakro.lib.exceptions import ParserException, PreprocessorException
 
 
 class Preprocessor:
-    _content: str
-    _source_path: str
+    """Expands the %IMPORT statements of a macro file.
+
+    Every file is expanded only once, no matter how many times it is
+    imported, and import cycles are reported as errors. The source map
+    keeps the original file and line of every line of the output.
+    """
+    _chunks: List[str]
+    _included: Set[Path]
+    _line_open: bool
+    _source_path: Path
+    _stack: List[Path]
 
     filename: str
+    source_map: List[Tuple[str, int]]
 
     def __init__(self, filename: str):
+        self._chunks = []
+        self._included = set()
+        self._line_open = False
         self._source_path = Path(filename).parent
+        self._stack = []
 
         self.filename = filename
+        self.source_map = []
 
     @staticmethod
     def _get_filename(line: str) -> str:
@@ -24,25 +40,70 @@ class Preprocessor:
 
     def process(self, filename: str = None) -> str:
         filename = filename if filename else self.filename
-        final_content = ''
+        self._chunks = []
+        self._included = set()
+        self._line_open = False
+        self._stack = []
+        self.source_map = []
+
+        self._expand(Path(filename))
+        return ''.join(self._chunks)
+
+    @property
+    def files(self) -> List[str]:
+        """All the files making up the output, the main one included."""
+        return sorted(str(path) for path in self._included)
+
+    def locate(self, line: int) -> Tuple[str, int]:
+        """Original file and line of a line (from 1) of the output."""
+        if not self.source_map:
+            return str(self.filename), line
+
+        index = min(max(line, 1), len(self.source_map)) - 1
+        return self.source_map[index]
+
+    def _expand(self, path: Path):
         try:
-            with open(filename, 'r') as main_file:
-                for line in main_file.readlines():
-                    if line.startswith('%IMPORT'):
-                        f = self._get_filename(line)
-                        path = Path(f)
+            key = path.resolve()
+            if key in self._stack:
+                cycle = self._stack[self._stack.index(key):] + [key]
+                raise PreprocessorException(
+                    "Import cycle detected: "
+                    + ' -> '.join(p.name for p in cycle)
+                )
 
-                        if not path.is_absolute():
-                            abs_path = Path(self._source_path)
-                            path = abs_path.joinpath(Path(f))
+            if key in self._included:
+                return
 
-                        final_content += self.process(path)
+            self._included.add(key)
+            self._stack.append(key)
+
+            with open(path, 'r') as file:
+                for number, line in enumerate(file, 1):
+                    if line.startswith('%IMPORT'):
+                        self._expand(self._resolve(self._get_filename(line)))
 
                     else:
-                        final_content += line
+                        self._emit(line, str(path), number)
+
+            self._stack.pop()
 
-        except FileNotFoundError:
+        except (FileNotFoundError, IsADirectoryError):
             raise PreprocessorException("Failed to import file "
-                                        f"{filename}, file not found.")
+                                        f"{path}, file not found.")
+
+    def _resolve(self, filename: str) -> Path:
+        path = Path(filename)
+        if not path.is_absolute():
+            path = self._source_path.joinpath(path)
+
+        return path
+
+    def _emit(self, line: str, filename: str, number: int):
+        # Content of a file not ending with a newline continues on the line
+        # of the importing file, which then belongs to the imported file
+        if not self._line_open:
+            self.source_map.append((filename, number))
 
-        return final_content
+        self._chunks.append(line)
+        self._line_open = not line.endswith('\n')
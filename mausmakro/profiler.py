@@ -0,0 +1,273 @@
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from mausmakro.finder import Steps
+from mausmakro.interpreter import Interpreter
+from mausmakro.lib.enums import Opcode
+from mausmakro.lib.types import Command, Conditional, Instruction
+
+# Commands searching for the images given by their first argument
+SEARCHES = {
+    Opcode.CLICK, Opcode.DOUBLE_CLICK, Opcode.FIND, Opcode.FIND_ALL,
+    Opcode.FIND_ANY, Opcode.PCLICK, Opcode.PFIND, Opcode.WAIT_UNTIL,
+    Opcode.WAIT_WHILE,
+}
+
+
+class Timing:
+    """Wall time spent on something, in seconds.
+
+    Searches spend it capturing the screen, matching the images and
+    sleeping between the screenshots, the rest is the overhead.
+    """
+    __slots__ = ('calls', 'capture', 'match', 'sleep', 'total')
+
+    calls: int
+    capture: float
+    match: float
+    sleep: float
+    total: float
+
+    def __init__(self):
+        self.calls = 0
+        self.capture = 0.0
+        self.match = 0.0
+        self.sleep = 0.0
+        self.total = 0.0
+
+    def add(self, total: float, capture: float, match: float, sleep: float):
+        self.calls += 1
+        self.capture += capture
+        self.match += match
+        self.sleep += sleep
+        self.total += total
+
+
+class Profiler:
+    """Wall time of the executed instructions.
+
+    The time is summed per instruction (and so source line), image and call
+    stack, the stacks are made of the macro and the procedures called.
+    Procedures get the time of their instructions and of the procedures
+    they call.
+    """
+    _instructions: List[Instruction]
+    _lines: List[Tuple[str, int]]
+    _owners: List[str]
+
+    images: Dict[str, Timing]
+    procedures: Dict[str, float]
+    stacks: Dict[Tuple[str, ...], float]
+    timings: Dict[int, Timing]
+    total: float
+
+    def __init__(self, instructions: List[Instruction],
+                 lines: List[Tuple[str, int]], label_table: Dict[str, int],
+                 functions: Iterable[str]):
+        self._instructions = instructions
+        self._lines = lines
+        # Name of the macro or procedure of every instruction
+        starts = sorted((label_table[name], name) for name in functions)
+        self._owners = []
+        for i, (start, name) in enumerate(starts):
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(lines)
+            self._owners.extend([name] * (end - start))
+
+        self.images = {}
+        self.procedures = {}
+        self.stacks = {}
+        self.timings = {}
+        self.total = 0.0
+
+    def record(self, index: int, returns: Iterable[int], total: float,
+               capture: float, match: float, sleep: float):
+        """Add the time of the instruction at the index.
+
+        Returns are the indexes of the calls on the call stack.
+        """
+        instruction = self._instructions[index]
+        # A handler called at the first instruction returns to the index -1
+        frames = tuple(self._owners[max(i, 0)] for i in returns) \
+            + (self._owners[index],)
+        image = self.image(instruction)
+        times = total, capture, match, sleep
+        self.timings.setdefault(index, Timing()).add(*times)
+        if image is not None:
+            self.images.setdefault(image, Timing()).add(*times)
+
+        # Recursive procedures are counted once
+        for name in set(frames):
+            self.procedures[name] = self.procedures.get(name, 0.0) + total
+
+        leaf = frames + (self.location(index),)
+        if image is None:
+            self._add_stack(leaf, total)
+
+        else:
+            self._add_stack(leaf + ('capture',), capture)
+            self._add_stack(leaf + ('match',), match)
+            self._add_stack(leaf + ('sleep',), sleep)
+            self._add_stack(leaf + ('other',),
+                            total - capture - match - sleep)
+
+        self.total += total
+
+    def location(self, index: int) -> str:
+        instruction = self._instructions[index]
+        filename, line = self._lines[index]
+        image = self.image(instruction)
+        what = instruction.opcode.name
+        if isinstance(instruction, Conditional):
+            what = f"IF {instruction.condition.opcode.name}"
+
+        what = what.replace('_', ' ')
+        if image is not None:
+            what = f"{what} {image}"
+
+        return f"{Path(filename).name}:{line} {what}"
+
+    @staticmethod
+    def image(instruction: Instruction) -> Optional[str]:
+        if isinstance(instruction, Conditional):
+            instruction = instruction.condition
+
+        if not isinstance(instruction, Command) \
+                or instruction.opcode not in SEARCHES:
+            return None
+
+        image = instruction.arg[0]
+        if isinstance(image, tuple):
+            return ', '.join(image)
+
+        return image if isinstance(image, str) else None
+
+    def report(self, top: int = 10) -> List[str]:
+        """The hottest lines, images and the procedures, as text."""
+        report = [f"{self.total:.3f} s in total", "", "Hottest lines:"]
+        report.append(f"{'total':>9} {'calls':>6} {'capture':>9} "
+                      f"{'match':>9} {'sleep':>9}  line")
+        for index, timing in self._hottest(self.timings, top):
+            searching = self.image(self._instructions[index]) is not None
+            report.append(self._row(timing, searching)
+                          + f"  {self.location(index)}")
+
+        report += ["", "Hottest images:"]
+        for image, timing in self._hottest(self.images, top):
+            report.append(self._row(timing, True) + f"  {image}")
+
+        report += ["", "Macro and procedures, with the procedures called:"]
+        for name, total in sorted(self.procedures.items(),
+                                  key=lambda item: -item[1]):
+            report.append(f"{total:>8.3f}s  {name}")
+
+        return report
+
+    def collapsed(self) -> List[str]:
+        """The stacks in the format of flamegraph.pl, in microseconds."""
+        return [f"{';'.join(frames)} {round(total * 1e6)}"
+                for frames, total in self.stacks.items()
+                if total >= 5e-7]
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            for line in self.collapsed():
+                file.write(line + '\n')
+
+    def _add_stack(self, frames: Tuple[str, ...], total: float):
+        self.stacks[frames] = self.stacks.get(frames, 0.0) + total
+
+    @staticmethod
+    def _hottest(timings: Dict[Any, Timing],
+                 top: int) -> List[Tuple[Any, Timing]]:
+        return sorted(timings.items(), key=lambda item: -item[1].total)[:top]
+
+    @staticmethod
+    def _row(timing: Timing, searching: bool) -> str:
+        row = f"{timing.total:>8.3f}s {timing.calls:>6}"
+        if not searching:
+            return row + f" {'':>9} {'':>9} {'':>9}"
+
+        return row + f" {timing.capture:>8.3f}s {timing.match:>8.3f}s " \
+                     f"{timing.sleep:>8.3f}s"
+
+
+class ProfilingInterpreter(Interpreter):
+    """Interpreter timing every instruction it executes.
+
+    The handlers of the dispatch table are wrapped, the interpreter loop
+    itself stays the same. Conditions of the IF commands are counted
+    with the IF. Sleeping is the sum of the delays the searches asked for.
+    """
+    _depth: int
+    _sleep: float
+
+    profiler: Profiler
+
+    def __init__(self, instructions: List[Instruction],
+                 label_table: Dict[str, int], opts: Dict[str, Any],
+                 profiler: Profiler):
+        # The dispatch table is created by the constructor
+        self._depth = 0
+        self._sleep = 0.0
+        self.profiler = profiler
+        super(ProfilingInterpreter, self).__init__(instructions, label_table,
+                                                   opts)
+
+    def _dispatch_table(self) -> List[Callable[[Any], None]]:
+        return [self._timed(handler)
+                for handler in super(ProfilingInterpreter,
+                                     self)._dispatch_table()]
+
+    def _timed(self, handler: Callable[[Any], None]) \
+            -> Callable[[Any], None]:
+        def timed(instruction: Instruction):
+            if self._depth:
+                return handler(instruction)
+
+            index = self._program_counter
+            returns = tuple(self._call_stack)
+            capture = self._finder.capture.total_time
+            match = self._finder.match_time
+            sleep = self._sleep
+            start = perf_counter()
+            self._depth += 1
+            try:
+                handler(instruction)
+
+            finally:
+                self._depth -= 1
+                self.profiler.record(
+                    index, returns, perf_counter() - start,
+                    self._finder.capture.total_time - capture,
+                    self._finder.match_time - match, self._sleep - sleep
+                )
+
+        return timed
+
+    def _find_image_steps(self, *args, **kwargs) -> Steps[Any]:
+        return self._slept(super(ProfilingInterpreter,
+                                 self)._find_image_steps(*args, **kwargs))
+
+    def _find_images_steps(self, *args, **kwargs) -> Steps[Any]:
+        return self._slept(super(ProfilingInterpreter,
+                                 self)._find_images_steps(*args, **kwargs))
+
+    def _wait_image_steps(self, *args, **kwargs) -> Steps[Any]:
+        return self._slept(super(ProfilingInterpreter,
+                                 self)._wait_image_steps(*args, **kwargs))
+
+    def _slept(self, steps: Steps[Any]) -> Steps[Any]:
+        try:
+            while True:
+                try:
+                    delay = next(steps)
+
+                except StopIteration as stop:
+                    return stop.value
+
+                self._sleep += delay
+                yield delay
+
+        finally:
+            steps.close()
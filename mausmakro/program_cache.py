@@ -0,0 +1,84 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from mausmakro.lib.ebnf import ebnf
+
+# Sources of the modules shaping the compiled program, a change in any of
+# them makes all the cached programs stale. The source map of the cached
+# program comes from the preprocessor, the optimizer works on its output.
+COMPILER_MODULES = ('lib/enums.py', 'lib/types.py', 'optimizer.py',
+                    'parsing.py', 'preprocessor.py')
+
+
+class ProgramCache:
+    """Compiled programs stored on disk.
+
+    The programs are keyed by the hash of the preprocessed source, that is
+    the main file with all the imported files, so any change in any of the
+    files compiles the program again. The LALR tables of the grammar are
+    cached in the same directory.
+    """
+    _compiler_digest: Optional[bytes] = None
+
+    path: Path
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+    @property
+    def grammar_file(self) -> Path:
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+        except OSError:
+            pass
+
+        return self.path.joinpath('grammar.lark')
+
+    def key(self, source_path: str, source: str) -> str:
+        digest = hashlib.sha256(self._compiler())
+        digest.update(str(Path(source_path).resolve()).encode())
+        digest.update(b'\0')
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path.joinpath(f'{key}.pickle'), 'rb') as f:
+                return pickle.load(f)
+
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError, ValueError):
+            # Missing or broken entry is compiled again
+            return None
+
+    def store(self, key: str, program: Dict[str, Any]):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            path = self.path.joinpath(f'{key}.pickle')
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(program, f, pickle.HIGHEST_PROTOCOL)
+
+            os.replace(tmp_path, path)
+
+        except OSError:
+            # The cache is only an optimization
+            pass
+
+    @classmethod
+    def _compiler(cls) -> bytes:
+        if cls._compiler_digest is None:
+            digest = hashlib.sha256(f'{cls.VERSION}\0{ebnf}'.encode())
+            package = Path(__file__).parent
+            for module in COMPILER_MODULES:
+                digest.update(package.joinpath(module).read_bytes())
+
+            cls._compiler_digest = digest.digest()
+
+        return cls._compiler_digest
@@ -0,0 +1,123 @@
+import os
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Tuple
+
+from mausmakro.lib.observable import Level, Observable
+from mausmakro.lib.types import Instruction, Watcher
+from mausmakro.optimizer import Optimizer
+from mausmakro.parsing import Parser
+from mausmakro.program_cache import ProgramCache
+
+# Instructions, label table, images and watchers of a compiled program
+Program = Tuple[List[Instruction], Dict[str, int], List[str], List[Watcher]]
+
+
+def compile_program(file: str, macro: str,
+                    cache: Optional[ProgramCache] = None,
+                    optimize: bool = True) -> Tuple[Parser, Program]:
+    """Parse and check the file for interpreting the macro."""
+    parser = Parser(file, cache)
+    instructions, label_table = parser.parse()
+    parser.perform_checks()
+    parser.macro_exists(macro)
+
+    if optimize:
+        instructions, label_table = Optimizer(instructions,
+                                              label_table).optimize()
+
+    return parser, (instructions, label_table, parser.images,
+                    parser.watchers)
+
+
+class Reloader(Observable):
+    """Compiles the macro file again when it or any imported file changes.
+
+    The files are polled in a background thread. A new program is handed
+    over only by take(), which is called between the runs of the macro, so
+    a run never mixes two versions of the program. When the new version
+    fails to compile, the error is reported and the old one keeps running.
+    """
+    _lock: Lock
+    _pending: Optional[Program]
+    _stamps: Dict[str, Optional[Tuple[int, int]]]
+    _stop_flag: Event
+    _thread: Optional[Thread]
+
+    cache: Optional[ProgramCache]
+    file: str
+    interval: float
+    macro: str
+    optimize: bool
+
+    def __init__(self, file: str, macro: str, sources: List[str],
+                 cache: Optional[ProgramCache] = None, optimize: bool = True,
+                 interval: float = 1.0):
+        super(Reloader, self).__init__()
+        self._lock = Lock()
+        self._pending = None
+        self._stamps = {path: self._stamp(path) for path in sources}
+        self._stop_flag = Event()
+        self._thread = None
+
+        self.cache = cache
+        self.file = file
+        self.interval = interval
+        self.macro = macro
+        self.optimize = optimize
+
+    def start(self):
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_flag.set()
+
+    def take(self) -> Optional[Program]:
+        """The new program, if the files have changed since the last one."""
+        with self._lock:
+            program, self._pending = self._pending, None
+
+        return program
+
+    def poll(self) -> bool:
+        """Compile the file again if any of the files changed."""
+        changed = any(self._stamp(path) != stamp
+                      for path, stamp in self._stamps.items())
+        if changed:
+            self.reload()
+
+        return changed
+
+    def reload(self):
+        self.notify_msg("File %s changed, reloading...", self.file)
+        try:
+            parser, program = compile_program(self.file, self.macro,
+                                              self.cache, self.optimize)
+            sources = parser.sources
+
+        except Exception as e:
+            # Changes of the same files are watched until the file compiles
+            self._stamps = {path: self._stamp(path) for path in self._stamps}
+            self.notify_msg("Failed to reload %s, the previous version keeps "
+                            "running:\n%s", self.file, e, level=Level.WARNING)
+            return
+
+        self._stamps = {path: self._stamp(path) for path in sources}
+        with self._lock:
+            self._pending = program
+
+        self.notify_msg("Reloaded, the new version runs "
+                        "from the next repetition of the macro.")
+
+    def _run(self):
+        while not self._stop_flag.wait(self.interval):
+            self.poll()
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+
+        except OSError:
+            return None
@@ -0,0 +1,128 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from mausmakro.clock import VirtualClock
+from mausmakro.finder import Steps, T
+from mausmakro.interpreter import DEBUG, Interpreter
+from mausmakro.lib.exceptions import InterruptException
+from mausmakro.lib.observable import MessageType
+from mausmakro.lib.types import Command, Instruction
+from mausmakro.matching import Box
+from mausmakro.watchers import ScreenWatcher
+
+
+class Click(NamedTuple):
+    time: float
+    x: int
+    y: int
+    clicks: int
+
+    def __str__(self) -> str:
+        what = 'DOUBLE CLICK' if self.clicks == 2 else 'CLICK'
+        return f"{self.time:.3f} {what} {self.x},{self.y}"
+
+
+class SimulatedInterpreter(Interpreter):
+    """Interpreter running the macro on a virtual clock.
+
+    Waits and the timeouts of the searches take no time, the screen is the
+    frame of the recording at the virtual time (see TimelineCapture) and
+    the clicks are recorded instead of done. Every attempt of a search
+    takes ATTEMPT_TIME, otherwise the searches would never time out.
+    The watchers of the ON declarations are checked at the virtual times
+    their thread would check them at, so the macro runs the same way on
+    every run.
+    """
+    _next_check: float
+
+    clicks: List[Click]
+    clock: VirtualClock
+    error: Optional[str]
+
+    # Virtual seconds a capture and a match of the screen take
+    ATTEMPT_TIME = 0.05
+
+    def __init__(self, instructions: List[Instruction],
+                 label_table: Dict[str, int], opts: Dict[str, Any],
+                 clock: VirtualClock):
+        # The finder gets the clock through the options
+        super(SimulatedInterpreter, self).__init__(
+            instructions, label_table,
+            {**opts, 'capture': 'timeline', 'clock': clock,
+             'lookahead': False}
+        )
+        self._next_check = 0.0
+
+        self.clicks = []
+        self.clock = clock
+        self.error = None
+
+    def notify(self, msg_type: MessageType, msg_data: Any):
+        if msg_type == MessageType.MAUSMAKRO_EXCEPTION:
+            self.error = msg_data
+
+        super(SimulatedInterpreter, self).notify(msg_type, msg_data)
+
+    def pause_execution(self):
+        # Nobody would resume it
+        self.notify_msg("Execution paused, the simulation continues.")
+
+    def _create_watcher(self) -> ScreenWatcher:
+        # The recording is read only once, by the capture of the finder
+        return ScreenWatcher(self._watchers, self.opts, self._interrupt,
+                             self._finder.capture)
+
+    def _start_watcher(self):
+        # Checked by _advance() on the virtual time, not by a thread
+        self._interrupt.clear()
+        self._handler_depth = 0
+        if self._watcher is not None:
+            self._watcher.resume()
+            self._next_check = self.clock.now + self._watcher.interval
+
+    def _op_wait(self, command: Command):
+        self.notify_msg("Waiting %s seconds", command.arg, level=DEBUG)
+        self._advance(command.arg)
+
+    def _click(self, x: int, y: int, clicks: int):
+        self.clicks.append(Click(self.clock.now, x, y, clicks))
+
+    def _find_image(self, image: str, timeout: int,
+                    region: Optional[Box] = None, grayscale: bool = True,
+                    match_step: int = 2) -> Tuple[int, int]:
+        return self._simulate(self._find_image_steps(image, timeout, region,
+                                                     grayscale, match_step))
+
+    def _wait_image(self, image: str, timeout: int,
+                    region: Optional[Box] = None, gone: bool = False):
+        self._simulate(self._wait_image_steps(image, timeout, region, gone))
+
+    def _find_images(self, images: Iterable[str], timeout: int,
+                     region: Optional[Box] = None, grayscale: bool = True,
+                     match_step: int = 2, require_all: bool = False):
+        self._simulate(self._find_images_steps(images, timeout, region,
+                                               grayscale, match_step,
+                                               require_all))
+
+    def _simulate(self, steps: Steps[T]) -> T:
+        """Run the search, the virtual time passes between the attempts."""
+        try:
+            while True:
+                self._advance(max(next(steps), self.ATTEMPT_TIME))
+
+        except StopIteration as stop:
+            return stop.value
+
+        finally:
+            steps.close()
+
+    def _advance(self, seconds: float):
+        """Let the time pass, checking the watchers meanwhile."""
+        end = self.clock.now + seconds
+        watcher = self._watcher
+        while watcher is not None and self._next_check <= end:
+            self.clock.sleep(self._next_check - self.clock.now)
+            self._next_check += watcher.interval
+            if watcher.step():
+                raise InterruptException("Interrupted by a watcher")
+
+        self.clock.sleep(end - self.clock.now)
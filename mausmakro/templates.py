@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Tuple, Union
+
+import cv2
+import numpy as np
+
+from mausmakro.lib.exceptions import ImageException
+
+# Default memory bound of the decoded templates, in bytes
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class TemplateCache:
+    """In-memory cache of decoded template images.
+
+    Each image is kept in a grayscale and a color (BGR) variant, so the
+    template is read and decoded only once instead of on every search.
+    Least recently used entries are evicted when the size bound is exceeded.
+    """
+    _entries: 'OrderedDict[Tuple[str, bool], np.ndarray]'
+
+    bytes_held: int
+    hits: int
+    max_bytes: int
+    misses: int
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self._entries = OrderedDict()
+        self.bytes_held = 0
+        self.hits = 0
+        self.max_bytes = max_bytes
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[Union[str, Path], bool]):
+        return (str(key[0]), key[1]) in self._entries
+
+    def preload(self, paths: Iterable[Union[str, Path]]):
+        for path in paths:
+            self.get(path, grayscale=False)
+            self.get(path, grayscale=True)
+
+    def get(self, path: Union[str, Path],
+            grayscale: bool = True) -> np.ndarray:
+        key = (str(path), grayscale)
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        color = self._entries.get((key[0], False))
+        if color is None:
+            color = self._decode(key[0])
+
+        if grayscale:
+            image = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)
+        else:
+            image = color
+
+        self._store(key, image)
+        return image
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_held = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self.bytes_held,
+        }
+
+    @staticmethod
+    def _decode(path: str) -> np.ndarray:
+        # Decode from a buffer, cv2.imread cannot handle non-ascii paths
+        try:
+            data = np.fromfile(path, dtype=np.uint8)
+
+        except OSError:
+            raise ImageException(f"Failed to read image {path}!")
+
+        image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ImageException(f"Failed to decode image {path}!")
+
+        return image
+
+    def _store(self, key: Tuple[str, bool], image: np.ndarray):
+        self._entries[key] = image
+        self.bytes_held += image.nbytes
+
+        # Always keep at least the newest entry, even if it is over the limit
+        while self.bytes_held > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes_held -= evicted.nbytes
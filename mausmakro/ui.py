@@ -1,31 +1,35 @@
 import signal
 import sys
 from threading import Thread
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
 
 from pynput import keyboard
 from pynput.keyboard import Key
 
+from mausmakro.async_interpreter import AsyncInterpreter
+from mausmakro.events import EventObserver, EventPipeline
 from mausmakro.interpreter import Interpreter
-from mausmakro.lib.observable import MessageType
-from mausmakro.lib.observer import Observer
+from mausmakro.lib.exceptions import MausMakroException
+from mausmakro.lib.observable import Event, Level, MessageType
 from mausmakro.lib.types import Instruction
+from mausmakro.metrics import MetricsFile, MetricsServer
+from mausmakro.reloader import Reloader
 
 
-class Ui(Observer):
+class Ui(EventObserver):
+    _exporters: List[Union[MetricsFile, MetricsServer]]
     _kb_listener: keyboard.Listener
 
-    def __init__(self):
-        super(Ui, self).__init__()
+    def __init__(self, events: EventPipeline):
+        super(Ui, self).__init__(events)
+        self._events.start()
+        self._exporters = []
         self._kb_listener = keyboard.Listener(on_release=self._on_release)
         self._kb_listener.start()
 
     def update(self, msg_type: MessageType, msg_data: Any):
-        if msg_type == MessageType.MESSAGE:
-            print(msg_data)
-
-        elif msg_type == MessageType.MAUSMAKRO_EXCEPTION:
-            print(f"An error occurred:\n{msg_data}", file=sys.stderr)
+        super(Ui, self).update(msg_type, msg_data)
+        if msg_type == MessageType.MAUSMAKRO_EXCEPTION:
             self.stop()
 
     def start(self,
@@ -33,15 +37,60 @@ class Ui(Observer):
               times: int,
               instructions: List[Instruction],
               label_table: Dict[str, int],
-              opts: Dict[str, Any]):
+              opts: Dict[str, Any],
+              reloader: Optional[Reloader] = None):
+
+        interpreter = AsyncInterpreter if opts.get('async') else Interpreter
+        try:
+            observable = interpreter(instructions, label_table, opts)
+
+        except MausMakroException as e:
+            self._events.put(Event(Level.ERROR,
+                                   "Failed to start the interpreter:\n%s",
+                                   (e,)))
+            self.stop()
+            self._events.close()
+            sys.exit(2)
 
-        observable = Interpreter(instructions, label_table, opts)
         observable.register(self)
         self.register(observable)
         signal.signal(signal.SIGINT, self.terminate)
 
+        if reloader:
+            reloader.register(self)
+            self.register(reloader)
+            reloader.start()
+
+        registry = observable.metrics.registry
+        if opts.get('metrics_port'):
+            try:
+                self._exporters.append(MetricsServer(registry,
+                                                     opts['metrics_port']))
+
+            except OSError as e:
+                self._events.put(Event(Level.ERROR,
+                                       "Failed to serve the metrics:\n%s",
+                                       (e,)))
+                self.stop()
+                self._events.close()
+                sys.exit(2)
+
+        if opts.get('metrics_file'):
+            self._exporters.append(MetricsFile(
+                registry, opts['metrics_file'],
+                opts.get('metrics_interval', 60)
+            ))
+
+        for exporter in self._exporters:
+            exporter.start()
+
         iters = 0
         while iters < times or times == -1:
+            # The program is replaced only between the runs
+            program = reloader.take() if reloader else None
+            if program:
+                observable.load(*program)
+
             try:
                 interpret_thread = Thread(target=observable.interpret,
                                           args=[macro])
@@ -50,25 +99,46 @@ class Ui(Observer):
                 interpret_thread.join()
 
             except Exception as e:
-                print(
-                    f"An error occurred when interpreting the macro:\n{e}",
-                    file=sys.stderr
-                )
+                self._events.put(Event(
+                    Level.ERROR,
+                    "An error occurred when interpreting the macro:\n%s",
+                    (e,)
+                ))
+                self._events.close()
                 sys.exit(2)
 
+            # Stopped after a failure, the next runs would only spin
+            if observable.stopped:
+                break
+
             iters += 1
 
+        self._stop_exporters()
+        self._events.close()
+
     def stop(self):
         self._kb_listener.stop()
         for o in self._observables:
-            if isinstance(o, Interpreter):
+            if isinstance(o, (Interpreter, Reloader)):
                 o.stop()
 
     def terminate(self, signum, frame):
-        print("Waiting for all running processes to finish execution ..")
+        self._events.put(Event(
+            Level.INFO, "Waiting for all running processes to finish "
+                        "execution .."
+        ))
         self.stop()
+        self._stop_exporters()
+        self._events.close()
         sys.exit(1)
 
+    def _stop_exporters(self):
+        # The file gets its last snapshot
+        for exporter in self._exporters:
+            exporter.stop()
+
+        self._exporters = []
+
     def _on_release(self, key):
         for o in self._observables:
             if isinstance(o, Interpreter):
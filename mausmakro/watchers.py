@@ -0,0 +1,113 @@
+from threading import Event, Thread
+from typing import Any, Dict, List, Optional, Tuple
+
+from mausmakro.capture import Capture
+from mausmakro.finder import ImageFinder
+from mausmakro.framediff import FrameDiff
+from mausmakro.lib.types import Watcher
+from mausmakro.lib.utils import resolve_image_path
+from mausmakro.matching import Box
+
+
+class ScreenWatcher:
+    """Checks the screen for the images of the ON declarations.
+
+    The screen is checked in a background thread, with its own capture
+    unless one is given, and all the images of the same region matched
+    against one screenshot. Only the parts of the screen changed since the
+    previous check are matched.
+    When an image appears, the interrupt flag is set for the interpreter
+    and the checks stop until resumed, after the handler has returned.
+    """
+    _active: Event
+    _diffs: Dict[Optional[Box], FrameDiff]
+    _finder: ImageFinder
+    _groups: Dict[Optional[Box], Dict[str, Watcher]]
+    _stop_flag: Event
+    _thread: Optional[Thread]
+
+    grayscale: bool
+    interrupt: Event
+    interval: float
+    match_step: int
+    triggered: Optional[Watcher]
+    watchers: List[Watcher]
+
+    def __init__(self, watchers: List[Watcher], opts: Dict[str, Any],
+                 interrupt: Event, capture: Optional[Capture] = None):
+        self._active = Event()
+        self._active.set()
+        self._diffs = {}
+        # Searching near the last hits would make no sense for popups
+        self._finder = ImageFinder({**opts, 'auto_region': False,
+                                    'location_cache': None}, capture)
+        self._groups = {}
+        for watcher in watchers:
+            path = str(resolve_image_path(watcher.image, opts['file']))
+            self._groups.setdefault(watcher.region, {})[path] = watcher
+
+        self._stop_flag = Event()
+        self._thread = None
+
+        self.grayscale = not opts.get('color_match', False)
+        self.interrupt = interrupt
+        self.interval = opts.get('watcher_interval', 0.5)
+        self.match_step = opts.get('match_step', 2)
+        self.triggered = None
+        self.watchers = watchers
+
+    def start(self):
+        """Start checking, again after stop() for the next run."""
+        self.resume()
+        self._stop_flag.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_flag.set()
+        # A thread still checking could set the interrupt of the next run
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def resume(self):
+        """Continue checking, the whole screen is matched again first."""
+        self._diffs.clear()
+        self.triggered = None
+        self._active.set()
+
+    def check(self) -> Optional[Watcher]:
+        """The first watcher whose image is on the screen."""
+        for region, watchers in self._groups.items():
+            found = self._finder.scan(
+                watchers, self._diffs.setdefault(region, FrameDiff()),
+                grayscale=self.grayscale, match_step=self.match_step,
+                region=region
+            )
+            for path, watcher in watchers.items():
+                if path in found:
+                    return watcher
+
+        return None
+
+    def step(self) -> bool:
+        """Check the screen once, unless paused, whether any image appeared."""
+        if not self._active.is_set():
+            return False
+
+        watcher = self.check()
+        if watcher is None:
+            return False
+
+        self._active.clear()
+        self.triggered = watcher
+        self.interrupt.set()
+        return True
+
+    def stats(self) -> Tuple[int, int]:
+        """Checks matched and skipped on the unchanged screen."""
+        return self._finder.matches_performed, self._finder.matches_skipped
+
+    def _run(self):
+        while not self._stop_flag.wait(self.interval):
+            self.step()
@@ -17,6 +17,9 @@ setuptools.setup(
         'Pillow',
         'opencv-python',
     ],
+    extras_require={
+        'mss': ['mss'],
+    },
     python_requires=">=3.6",
     classifiers=[
         'Development Status :: 3 - Alpha',
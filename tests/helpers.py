@@ -0,0 +1,41 @@
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+# Options of the interpreters, the tests add the capture and the macro file
+OPTS = {
+    'color_match': False,
+    'enable_retry': False,
+    'match_step': 2,
+    'pause_on_fail': False,
+    'retry_times': 1,
+}
+
+
+def random_screen(seed: int,
+                  size: Tuple[int, int] = (300, 400)) -> np.ndarray:
+    """Blurred noise, any part of it is found only at its own place."""
+    rnd = np.random.default_rng(seed)
+    screen = rnd.integers(0, 256, (*size, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(screen, (5, 5), 0)
+
+
+def clicking(interpreter_cls):
+    class Clicking(interpreter_cls):
+        """Records the clicks instead of clicking, and the messages."""
+        clicks: list
+        messages: list
+
+        def __init__(self, instructions, label_table, opts):
+            super(Clicking, self).__init__(instructions, label_table, opts)
+            self.clicks = []
+            self.messages = []
+
+        def notify(self, msg_type, msg_data):
+            self.messages.append(str(msg_data))
+
+        def _click(self, x, y, clicks):
+            self.clicks.append((x, y))
+
+    return Clicking
@@ -0,0 +1,90 @@
+import unittest
+
+from mausmakro.analysis import CallGraph
+from mausmakro.lib.enums import DiagnosticKind, Opcode
+from mausmakro.lib.types import Block, Command
+from mausmakro.parsing import Parser
+
+
+class TestAnalysis(unittest.TestCase):
+
+    def test_analyze(self):
+        parser = Parser('test_macros/analysis.txt')
+        parser.parse()
+        parser.check_labels()
+        diagnostics = [(d.kind, d.name, str(d)) for d in parser.analyze()]
+
+        expected = [
+            (DiagnosticKind.UNREACHABLE_PROCEDURE, 'unused',
+             "Procedure unused is never called from any macro."),
+            (DiagnosticKind.UNREACHABLE_PROCEDURE, 'unused_too',
+             "Procedure unused_too is never called from any macro."),
+            (DiagnosticKind.RECURSION, 'ping',
+             "Procedure ping calls itself through ping -> pong -> ping "
+             "and can never return."),
+            (DiagnosticKind.EMPTY_RETURN, 'escape',
+             "Macro escape can RETURN in unused with an empty call stack."),
+            (DiagnosticKind.NO_END, 'loop',
+             "Macro loop can never reach its END."),
+            (DiagnosticKind.NO_END, 'escape',
+             "Macro escape can never reach its END."),
+        ]
+        self.assertListEqual(diagnostics, expected)
+
+    def test_clean(self):
+        for filename in ('test_macros/simple.txt',
+                         'test_macros/conditional_else.txt',
+                         'test_macros/optimize.txt'):
+            parser = Parser(filename)
+            parser.parse()
+            with self.subTest(filename=filename):
+                self.assertListEqual(parser.analyze(), [])
+
+    def test_blocks(self):
+        instructions = [
+            Command(Opcode.LABEL, 'main'),
+            Block(Opcode.RACE, [Command(Opcode.CALL, 'stuck'),
+                                Command(Opcode.WAIT, 1)]),
+            Block(Opcode.PARALLEL, [Command(Opcode.CALL, 'helper'),
+                                    Command(Opcode.CALL, 'stuck')]),
+            Command(Opcode.END),
+            Command(Opcode.LABEL, 'helper'),
+            Command(Opcode.RETURN),
+            Command(Opcode.LABEL, 'stuck'),
+            Command(Opcode.JUMP, 'stuck'),
+        ]
+        label_table = {'main': 0, 'helper': 4, 'stuck': 6}
+
+        # RACE goes on with the WAIT, PARALLEL waits for both calls
+        diagnostics = CallGraph(instructions, label_table, ['main'],
+                                ['helper', 'stuck']).analyze()
+        self.assertListEqual([(d.kind, d.name) for d in diagnostics],
+                             [(DiagnosticKind.NO_END, 'main')])
+
+        instructions[2].branches.pop()
+        diagnostics = CallGraph(instructions, label_table, ['main'],
+                                ['helper', 'stuck']).analyze()
+        self.assertListEqual(diagnostics, [])
+
+    def test_deep_call_chain(self):
+        # Far deeper than the recursion limit, the last one calls the first
+        procedures = [f'proc_{i}' for i in range(20000)]
+        instructions = [Command(Opcode.LABEL, 'main'),
+                        Command(Opcode.CALL, procedures[0]),
+                        Command(Opcode.END)]
+        label_table = {'main': 0}
+        for i, name in enumerate(procedures):
+            label_table[name] = len(instructions)
+            instructions += [
+                Command(Opcode.LABEL, name),
+                Command(Opcode.CALL, procedures[(i + 1) % len(procedures)]),
+                Command(Opcode.RETURN),
+            ]
+
+        diagnostics = CallGraph(instructions, label_table, ['main'],
+                                procedures).analyze()
+        self.assertListEqual([d.kind for d in diagnostics],
+                             [DiagnosticKind.RECURSION, DiagnosticKind.NO_END])
+        self.assertTrue(str(diagnostics[0]).startswith(
+            "Procedure proc_0 calls itself through proc_0 -> proc_1 -> "
+        ))
@@ -0,0 +1,215 @@
+import tempfile
+import unittest
+from pathlib import Path
+from threading import Thread
+from time import perf_counter, sleep
+
+import cv2
+import numpy as np
+
+from mausmakro.async_interpreter import AsyncInterpreter
+from mausmakro.interpreter import Interpreter
+from mausmakro.lib.exceptions import ParserException
+from mausmakro.lib.observable import MessageType
+from mausmakro.optimizer import Optimizer
+from mausmakro.parsing import Parser
+
+from helpers import OPTS, clicking, random_screen
+
+
+class ClickingInterpreter(clicking(AsyncInterpreter)):
+    """Records the errors apart."""
+    errors: list
+
+    def __init__(self, instructions, label_table, opts):
+        super(ClickingInterpreter, self).__init__(instructions, label_table,
+                                                  opts)
+        self.errors = []
+
+    def notify(self, msg_type: MessageType, msg_data):
+        super(ClickingInterpreter, self).notify(msg_type, msg_data)
+        if msg_type == MessageType.MAUSMAKRO_EXCEPTION:
+            self.errors.append(msg_data)
+
+
+class TestAsyncInterpreter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.path.joinpath('images').mkdir()
+
+        screen = random_screen(7)
+        cv2.imwrite(str(self.path.joinpath('screen.png')), screen)
+
+        images = self.path.joinpath('images')
+        cv2.imwrite(str(images.joinpath('first.png')), screen[20:60, 30:90])
+        cv2.imwrite(str(images.joinpath('second.png')),
+                    screen[200:240, 300:380])
+        cv2.imwrite(str(images.joinpath('missing.png')),
+                    np.flip(screen[20:60, 30:90], axis=1))
+
+        self.file = self.path.joinpath('macro.txt')
+        self.opts = {**OPTS, 'capture': 'file',
+                     'capture_path': str(self.path / 'screen.png'),
+                     'file': str(self.file)}
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def program(self, source: str):
+        self.file.write_text(source)
+        parser = Parser(str(self.file))
+        instructions, label_table = parser.parse()
+        parser.perform_checks()
+        return Optimizer(instructions, label_table).optimize()
+
+    def run_macro(self, source: str, interpreter=ClickingInterpreter):
+        interpreter = interpreter(*self.program(source), self.opts)
+        start = perf_counter()
+        interpreter.interpret('foobar')
+        return interpreter, perf_counter() - start
+
+    def test_race_click(self):
+        interpreter, elapsed = self.run_macro(
+            "MACRO foobar {\n"
+            "    RACE {\n"
+            "        CLICK ON missing.png WITHIN 5s\n"
+            "        CLICK ON first.png WITHIN 5s\n"
+            "        CLICK ON second.png WITHIN 5s\n"
+            "    }\n"
+            "    CLICK 1,1\n"
+            "}\n"
+        )
+        # Found by two branches, only the first one found clicks
+        self.assertListEqual(interpreter.clicks, [(60, 40), (1, 1)])
+        self.assertListEqual(interpreter.errors, [])
+        self.assertLess(elapsed, 5)
+
+    def test_race_timeout(self):
+        interpreter, elapsed = self.run_macro(
+            "PROC dialog {\n"
+            "    FIND missing.png WITHIN 5s\n"
+            "    CLICK 10,10\n"
+            "}\n"
+            "MACRO foobar {\n"
+            "    RACE {\n"
+            "        CALL dialog\n"
+            "        WAIT 1s\n"
+            "    }\n"
+            "    CLICK 1,1\n"
+            "}\n"
+        )
+        self.assertListEqual(interpreter.clicks, [(1, 1)])
+        self.assertLess(elapsed, 5)
+
+    def test_race_failed(self):
+        interpreter, _ = self.run_macro(
+            "MACRO foobar {\n"
+            "    RACE {\n"
+            "        FIND missing.png WITHIN 0s\n"
+            "        FIND ALL first.png, missing.png WITHIN 0s\n"
+            "    }\n"
+            "    CLICK 1,1\n"
+            "}\n"
+        )
+        self.assertListEqual(interpreter.clicks, [])
+        self.assertListEqual(interpreter.errors,
+                             ["None of the 2 branches of RACE has finished"])
+
+    def test_race_procedure_returns(self):
+        interpreter, _ = self.run_macro(
+            "PROC dialog {\n"
+            "    FIND first.png WITHIN 1s\n"
+            "    CLICK 10,10\n"
+            "}\n"
+            "MACRO foobar {\n"
+            "    RACE {\n"
+            "        CALL dialog\n"
+            "        WAIT 5s\n"
+            "    }\n"
+            "    CLICK 1,1\n"
+            "}\n"
+        )
+        self.assertListEqual(interpreter.clicks, [(10, 10), (1, 1)])
+
+    def test_parallel(self):
+        interpreter, _ = self.run_macro(
+            "MACRO foobar {\n"
+            "    PARALLEL {\n"
+            "        FIND ANY missing.png, first.png WITHIN 0s\n"
+            "        WAIT UNTIL second.png WITHIN 1s\n"
+            "    }\n"
+            "    IF FOUND first.png {\n"
+            "        CLICK 1,1\n"
+            "    }\n"
+            "}\n"
+        )
+        self.assertListEqual(interpreter.clicks, [(1, 1)])
+        self.assertListEqual(interpreter.errors, [])
+
+    def test_parallel_failed(self):
+        interpreter, elapsed = self.run_macro(
+            "MACRO foobar {\n"
+            "    PARALLEL {\n"
+            "        WAIT 5s\n"
+            "        FIND missing.png WITHIN 0s\n"
+            "    }\n"
+            "    CLICK 1,1\n"
+            "}\n"
+        )
+        self.assertListEqual(interpreter.clicks, [])
+        self.assertListEqual(interpreter.errors,
+                             ["Image not found within the time limit"])
+        self.assertLess(elapsed, 5)
+
+    def test_parallel_call_click(self):
+        # Both branches would drive the mouse at once
+        with self.assertRaises(ParserException):
+            self.program(
+                "PROC clicker {\n"
+                "    CLICK 5,5\n"
+                "}\n"
+                "MACRO foobar {\n"
+                "    PARALLEL {\n"
+                "        CALL clicker\n"
+                "        WAIT 1s\n"
+                "    }\n"
+                "}\n"
+            )
+
+    def test_stop(self):
+        interpreter = ClickingInterpreter(*self.program(
+            "MACRO foobar {\n"
+            "    RACE {\n"
+            "        WAIT 1m\n"
+            "        WAIT UNTIL missing.png WITHIN 1m\n"
+            "    }\n"
+            "}\n"
+        ), self.opts)
+        thread = Thread(target=interpreter.interpret, args=['foobar'])
+        thread.start()
+        sleep(0.5)
+        interpreter.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(interpreter.stopped)
+
+    def test_blocking_interpreter(self):
+        class Blocking(Interpreter):
+            errors = []
+
+            def notify(self, msg_type, msg_data):
+                if msg_type == MessageType.MAUSMAKRO_EXCEPTION:
+                    self.errors.append(msg_data)
+
+        interpreter, _ = self.run_macro(
+            "MACRO foobar {\n"
+            "    RACE {\n"
+            "        WAIT 1s\n"
+            "    }\n"
+            "}\n", Blocking
+        )
+        self.assertListEqual(interpreter.errors, [
+            "RACE can run only in the asyncio mode, please use --async."
+        ])
@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+
+from mausmakro.bench import configurations, generate_corpus, load_corpus, \
+    percentile, run_bench
+from mausmakro.lib.exceptions import BenchException
+
+
+class TestBench(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.corpus = self._tmp_dir.name
+        generate_corpus(self.corpus, screens=1,
+                        resolutions={'tiny': (400, 300)})
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_corpus(self):
+        cases = load_corpus(self.corpus)
+        kinds = sorted(case['kind'] for case in cases)
+        self.assertListEqual(kinds, ['hit', 'miss', 'near_miss'])
+
+    def test_run_bench(self):
+        configs = configurations(engines=('step', 'pyramid'), steps=(1,))
+        report = run_bench(self.corpus, configs, runs=2)
+
+        self.assertEqual(len(report['results']), len(configs))
+        for result in report['results']:
+            self.assertEqual(result['resolution'], 'tiny')
+            self.assertEqual(result['finds'], 6)
+            self.assertEqual(result['correct'], 6)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_missing_corpus(self):
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertRaises(BenchException, load_corpus, empty)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 51)
+        self.assertEqual(percentile(values, 99), 99)
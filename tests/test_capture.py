@@ -0,0 +1,107 @@
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mausmakro.capture import FileCapture, TimelineCapture, create_capture
+from mausmakro.clock import VirtualClock
+from mausmakro.lib.exceptions import CaptureException
+
+
+class TestFileCapture(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        for i in range(3):
+            frame = np.full((40, 60, 3), i, dtype=np.uint8)
+            cv2.imwrite(str(self.path.joinpath(f'frame_{i}.png')), frame)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_directory(self):
+        capture = FileCapture(str(self.path))
+        values = [int(capture.grab()[0, 0, 0]) for _ in range(4)]
+        self.assertListEqual(values, [0, 1, 2, 0])
+
+    def test_single_file(self):
+        capture = FileCapture(str(self.path.joinpath('frame_1.png')))
+        self.assertTupleEqual(capture.grab().shape, (40, 60, 3))
+        self.assertEqual(int(capture.grab()[0, 0, 0]), 1)
+
+    def test_region(self):
+        capture = FileCapture(str(self.path))
+        self.assertTupleEqual(capture.grab((10, 5, 20, 30)).shape, (30, 20, 3))
+
+    def test_stats(self):
+        capture = FileCapture(str(self.path))
+        capture.grab()
+        capture.grab()
+        self.assertEqual(capture.stats()['frames'], 2)
+
+    def test_empty_directory(self):
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertRaises(CaptureException, FileCapture, empty)
+
+    def test_create_capture(self):
+        self.assertRaises(CaptureException, create_capture, 'file')
+        self.assertRaises(CaptureException, create_capture, 'foo')
+
+
+class TestTimelineCapture(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name, 'frames')
+        self.path.mkdir()
+        for i, name in enumerate(('0', '1.5', '4')):
+            frame = np.full((40, 60, 3), i, dtype=np.uint8)
+            cv2.imwrite(str(self.path.joinpath(f'{name}.png')), frame)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def values(self, path: Path) -> list:
+        clock = VirtualClock(-1)
+        capture = TimelineCapture(str(path), clock)
+        values = []
+        for now in (-1, 0, 1.4, 1.5, 3.9, 4, 100):
+            clock.now = now
+            values.append(int(capture.grab()[0, 0, 0]))
+
+        return values
+
+    def test_directory(self):
+        self.assertListEqual(self.values(self.path), [0, 0, 0, 1, 1, 2, 2])
+
+    def test_archives(self):
+        files = sorted(self.path.iterdir())
+        zip_path = self.path.with_suffix('.zip')
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            for file in files:
+                archive.write(file, f'frames/{file.name}')
+
+        tar_path = self.path.with_suffix('.tar')
+        with tarfile.open(tar_path, 'w') as archive:
+            for file in files:
+                archive.add(file, file.name)
+
+        for path in (zip_path, tar_path):
+            with self.subTest(archive=path.suffix):
+                self.assertListEqual(self.values(path),
+                                     [0, 0, 0, 1, 1, 2, 2])
+
+    def test_invalid_name(self):
+        cv2.imwrite(str(self.path.joinpath('frame.png')),
+                    np.zeros((40, 60, 3), dtype=np.uint8))
+        self.assertRaises(CaptureException, TimelineCapture, str(self.path))
+
+    def test_create_capture(self):
+        self.assertRaises(CaptureException, create_capture, 'timeline')
+        capture = create_capture('timeline', str(self.path), VirtualClock(2))
+        self.assertEqual(int(capture.grab((0, 0, 10, 10))[0, 0, 0]), 1)
@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from mausmakro.checker import CheckCache, check_files, discover
+
+
+class TestChecker(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.path.joinpath('lib').mkdir()
+        self.path.joinpath('images').mkdir()
+        self.image = self.path.joinpath('images/a.png')
+        self.image.write_bytes(b'image')
+
+        self.common = self.path.joinpath('lib/common.mkr')
+        self.common.write_text("PROC helper {\n"
+                               "    CLICK 1,1\n"
+                               "}\n")
+        for name in ('first', 'second'):
+            self.path.joinpath(f'{name}.mkr').write_text(
+                "%IMPORT lib/common.mkr\n"
+                f"MACRO {name} {{\n"
+                "    CALL helper\n"
+                "    FIND a.png WITHIN 1s\n"
+                "}\n"
+            )
+
+        self.files = discover([self.path])
+        self.cache_file = self.path.joinpath('cache/check.json')
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def check(self, jobs=1):
+        cache = CheckCache(self.cache_file)
+        results = check_files(self.files, full=True, jobs=jobs, cache=cache)
+        cache.save()
+        return results
+
+    def test_discover(self):
+        self.path.joinpath('notes.txt').write_text("no macro")
+        names = [Path(f).relative_to(self.path).as_posix()
+                 for f in self.files]
+        self.assertListEqual(names, ['first.mkr', 'lib/common.mkr',
+                                     'second.mkr'])
+
+    def test_check(self):
+        results = self.check()
+        self.assertListEqual([r['error'] for r, _ in results],
+                             [None, None, None])
+        self.assertListEqual([cached for _, cached in results],
+                             [False, False, False])
+        self.assertListEqual(results[0][0]['sources'],
+                             [str(self.path.joinpath('first.mkr').resolve()),
+                              str(self.common.resolve())])
+
+    def test_cached(self):
+        self.check()
+        results = self.check()
+        self.assertListEqual([cached for _, cached in results],
+                             [True, True, True])
+
+    def test_import_changed(self):
+        self.check()
+        self.common.write_text("PROC helper {\n"
+                               "    CALL missing\n"
+                               "}\n")
+        results = self.check()
+        self.assertListEqual([cached for _, cached in results],
+                             [False, False, False])
+        self.assertEqual(results[0][0]['error'],
+                         "Label missing is not defined!")
+
+        # Failed checks are not cached
+        self.assertListEqual([cached for _, cached in self.check()],
+                             [False, False, False])
+
+    def test_image_changed(self):
+        self.check()
+        self.image.unlink()
+        results = self.check()
+        self.assertListEqual([cached for _, cached in results],
+                             [False, True, False])
+        self.assertIn("Image a.png not found!", results[0][0]['error'])
+
+    def test_pool(self):
+        pooled = check_files(self.files, full=True, jobs=2)
+        self.assertListEqual(pooled, check_files(self.files, full=True))
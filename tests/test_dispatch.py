@@ -0,0 +1,305 @@
+import sys
+import unittest
+from glob import glob
+from time import sleep
+from unittest import mock
+
+from mausmakro.interpreter import Interpreter
+from mausmakro.lib.enums import OPCODE_CODES, Opcode
+from mausmakro.lib.exceptions import ConditionException, \
+    InterpretException, MausMakroException, ParserException
+from mausmakro.lib.observable import Level, MessageType
+from mausmakro.lib.types import Block, Command, Conditional, Instruction
+from mausmakro.optimizer import Optimizer
+from mausmakro.parsing import Parser
+
+from helpers import OPTS
+
+MACRO_FILES = sorted(glob('test_macros/*.txt') + glob('../examples/*.mkr'))
+
+# Macros are stopped after so many actions or jumps, some of them loop
+MAX_ACTIONS = 50
+MAX_JUMPS = 500
+
+
+class RecordingInterpreter(Interpreter):
+    """Records what the program does instead of doing it.
+
+    Images are either all found, or none of them.
+    """
+    actions: list
+    jumps: int
+    trace: list
+
+    def __init__(self, instructions, label_table, opts, found: bool):
+        super(RecordingInterpreter, self).__init__(instructions, label_table,
+                                                   opts)
+        self.actions = []
+        self.found = found
+        self.jumps = 0
+        self.trace = []
+        # Nobody observes the interpreter, the messages are recorded anyway
+        self.level = Level.DEBUG
+
+    def _action(self, *action):
+        self.actions.append(action)
+        self.trace.append(action)
+        if len(self.actions) >= MAX_ACTIONS:
+            self.stop()
+
+    def notify(self, msg_type: MessageType, msg_data):
+        self.trace.append((msg_type, msg_data))
+
+    def pause_execution(self):
+        self._action('pause')
+
+    def _jump(self, target):
+        super(RecordingInterpreter, self)._jump(target)
+        self.trace.append(('jump', self._program_counter))
+        self.jumps += 1
+        if self.jumps >= MAX_JUMPS:
+            self.stop()
+
+    def _click(self, x, y, clicks):
+        self._action('click', x, y, clicks)
+
+    def _find_image(self, image, timeout, region=None, grayscale=True,
+                    match_step=2):
+        self._action('find', image, timeout, region, grayscale, match_step)
+        if not self.found:
+            raise ConditionException("Image not found within the time limit")
+
+        return 10, 20
+
+    def _find_images(self, images, timeout, region=None, grayscale=True,
+                     match_step=2, require_all=False):
+        self._action('find_many', tuple(images), timeout, region, grayscale,
+                     match_step, require_all)
+        self._found_images = {images[0]} if self.found else set()
+        if not self.found:
+            raise ConditionException("Images not found within the time limit")
+
+    def _wait_image(self, image, timeout, region=None, gone=False):
+        self._action('wait_image', image, timeout, region, gone)
+        if not self.found:
+            raise ConditionException("Image not found within the time limit")
+
+
+class ReferenceInterpreter(RecordingInterpreter):
+    """The interpreter loop as it was before the dispatch table."""
+
+    def _interpret(self, macro: str):
+        self._cont_flag.set()
+        self._program_counter = self._label_table[macro]
+
+        while not self._exit_flag.is_set():
+            self._cont_flag.wait()
+            if self._exit_flag.is_set():
+                break
+
+            instr = self._instructions[self._program_counter]
+            if instr.opcode == Opcode.END:
+                break
+
+            try:
+                self._execute_instruction(instr)
+                self._program_counter += 1
+
+            except MausMakroException as e:
+                if self._exit_flag.is_set():
+                    break
+
+                self.notify_msg("Command execution failed",
+                                level=Level.WARNING)
+                self.notify(MessageType.MAUSMAKRO_EXCEPTION, str(e))
+                return
+
+    def _execute_instruction(self, instruction: Instruction):
+        # Blocks came with the asyncio mode, the same as in the table
+        if isinstance(instruction, Block):
+            return self._op_block(instruction)
+
+        if isinstance(instruction, Command):
+            return self._execute_command(instruction)
+
+        self._execute_conditional(instruction)
+
+    def _execute_command(self, command: Command):
+        if command.opcode == Opcode.CALL:
+            self.notify_msg(f"Call {self._label_name(command.arg)}",
+                            level=Level.DEBUG)
+            self._call_stack.push(self._program_counter)
+            self._jump(command.arg)
+
+        elif command.opcode == Opcode.CLICK:
+            return self._do_click(command.arg)
+
+        elif command.opcode == Opcode.DOUBLE_CLICK:
+            return self._do_click(command.arg, is_double=True)
+
+        elif command.opcode == Opcode.EXIT:
+            self.notify_msg("Exiting...")
+            sys.exit(0)
+
+        elif command.opcode == Opcode.FIND:
+            self._find_image(
+                *command.arg,
+                grayscale=not self.opts['color_match'],
+                match_step=self.opts['match_step']
+            )
+
+        elif command.opcode == Opcode.FIND_ALL:
+            self._find_images(
+                *command.arg,
+                grayscale=not self.opts['color_match'],
+                match_step=self.opts['match_step'],
+                require_all=True
+            )
+
+        elif command.opcode == Opcode.FIND_ANY:
+            self._find_images(
+                *command.arg,
+                grayscale=not self.opts['color_match'],
+                match_step=self.opts['match_step']
+            )
+
+        elif command.opcode == Opcode.FOUND:
+            if command.arg not in self._found_images:
+                raise ConditionException(f"Image {command.arg} "
+                                         "was not found by the last search")
+
+        elif command.opcode == Opcode.JUMP:
+            self.notify_msg(f"Jump to {self._label_name(command.arg)}",
+                            level=Level.DEBUG)
+            self._jump(command.arg)
+
+        elif command.opcode == Opcode.LABEL:
+            return
+
+        elif command.opcode == Opcode.PAUSE:
+            self.pause_execution()
+
+        elif command.opcode == Opcode.PCLICK:
+            self._do_click(command.arg, precise=True)
+
+        elif command.opcode == Opcode.PFIND:
+            self._find_image(*command.arg, grayscale=False, match_step=1)
+
+        elif command.opcode == Opcode.RETURN:
+            if self._call_stack.empty():
+                raise InterpretException("Cannot return, no caller!")
+
+            self._program_counter = self._call_stack.pop()
+
+        elif command.opcode == Opcode.WAIT:
+            self.notify_msg(f"Waiting {command.arg} seconds",
+                            level=Level.DEBUG)
+            sleep(command.arg)
+
+        elif command.opcode == Opcode.WAIT_UNTIL:
+            self._wait_image(*command.arg)
+
+        elif command.opcode == Opcode.WAIT_WHILE:
+            self._wait_image(*command.arg, gone=True)
+
+        else:
+            raise NotImplementedError(f"Instruction {command.opcode} "
+                                      "is not implemented!")
+
+    def _execute_conditional(self, cond: Conditional):
+        try:
+            self._execute_instruction(cond.condition)
+            failed = True if cond.negate else False
+
+        except ConditionException:
+            failed = False if cond.negate else True
+
+        if cond.else_label is not None and failed:
+            self._jump(cond.else_label)
+
+        elif failed:
+            self._jump(cond.end_label)
+
+
+def run(interpreter_cls, program, macro: str, found: bool):
+    path = program[2]
+    interpreter = interpreter_cls(program[0], program[1],
+                                  {**OPTS, 'file': path}, found)
+    def record_sleep(seconds):
+        interpreter._action('sleep', seconds)
+
+    with mock.patch('mausmakro.interpreter.sleep', record_sleep), \
+            mock.patch(f'{__name__}.sleep', record_sleep):
+        try:
+            interpreter.interpret(macro)
+
+        except SystemExit:
+            interpreter._action('exit')
+
+    return interpreter
+
+
+def merge_sleeps(actions):
+    # Optimized program merges the consecutive waits
+    merged = []
+    for action in actions:
+        if action[0] == 'sleep' and merged and merged[-1][0] == 'sleep':
+            merged[-1] = ('sleep', merged[-1][1] + action[1])
+
+        else:
+            merged.append(action)
+
+    return merged
+
+
+class TestDispatch(unittest.TestCase):
+
+    def programs(self):
+        for path in MACRO_FILES:
+            try:
+                parser = Parser(path)
+                parsed = parser.parse()
+                parser.check_labels()
+
+            except (MausMakroException, ParserException):
+                continue
+
+            yield path, parsed
+
+    def test_all_opcodes_dispatched(self):
+        interpreter = Interpreter([], {}, {**OPTS, 'file': 'x.txt'})
+        handlers = interpreter._dispatch_table()
+        self.assertEqual(len(handlers), len(OPCODE_CODES))
+        not_implemented = [
+            opcode for opcode, code in OPCODE_CODES.items()
+            if handlers[code] == interpreter._op_not_implemented
+        ]
+        # END is handled by the loop, GOTO is not a command of the language
+        self.assertListEqual(not_implemented, [Opcode.END, Opcode.GOTO])
+
+    def test_parity(self):
+        for path, parsed in self.programs():
+            for macro in parsed[1]:
+                for found in (True, False):
+                    with self.subTest(path=path, macro=macro, found=found):
+                        program = (*parsed, path)
+                        expected = run(ReferenceInterpreter, program,
+                                       macro, found)
+                        actual = run(RecordingInterpreter, program,
+                                     macro, found)
+                        self.assertListEqual(actual.trace, expected.trace)
+
+    def test_optimized_parity(self):
+        for path, parsed in self.programs():
+            optimized = Optimizer(*parsed).optimize()
+            for macro in optimized[1]:
+                for found in (True, False):
+                    with self.subTest(path=path, macro=macro, found=found):
+                        expected = run(ReferenceInterpreter,
+                                       (*parsed, path), macro, found)
+                        actual = run(RecordingInterpreter,
+                                     (*optimized, path), macro, found)
+                        self.assertListEqual(
+                            merge_sleeps(actual.actions),
+                            merge_sleeps(expected.actions)
+                        )
@@ -0,0 +1,99 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from threading import Event as Flag
+
+from mausmakro.events import EventPipeline, JsonLinesSink, Sink
+from mausmakro.lib.observable import Event, Level, Observable
+from mausmakro.lib.observer import Observer
+
+
+class ListSink(Sink):
+    """Keeps the messages, waiting for the flag before the first one."""
+
+    def __init__(self, flag: Flag = None):
+        self.flag = flag
+        self.messages = []
+        self.writing = Flag()
+
+    def write(self, event: Event):
+        self.writing.set()
+        if self.flag is not None:
+            self.flag.wait()
+
+        self.messages.append(event.message)
+
+
+class Listener(Observer):
+
+    def __init__(self, level: Level):
+        super(Listener, self).__init__()
+        self.events = []
+        self.level = level
+
+    def update(self, msg_type, msg_data):
+        self.events.append(msg_data)
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_level(self):
+        sink = ListSink()
+        events = EventPipeline([sink], Level.INFO)
+        events.start()
+        events.put(Event(Level.DEBUG, "Clicking at %s,%s", (1, 2)))
+        events.put(Event(Level.INFO, "Exiting..."))
+        events.close()
+        self.assertListEqual(sink.messages, ["Exiting..."])
+
+    def test_full_queue(self):
+        flag = Flag()
+        sink = ListSink(flag)
+        events = EventPipeline([sink], Level.DEBUG, size=2)
+        events.start()
+        events.put(Event(Level.DEBUG, "Message %d", (0,)))
+        sink.writing.wait(5)
+        for i in range(1, 10):
+            events.put(Event(Level.DEBUG, "Message %d", (i,)))
+
+        # The consumer took the first one, two more fit in the queue
+        self.assertEqual(events.dropped, 7)
+        flag.set()
+        events.close()
+        self.assertListEqual(sink.messages, [
+            "Message 0", "Message 1", "Message 2",
+            "7 messages were dropped, the output could not keep up",
+        ])
+
+    def test_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir, 'log.jsonl')
+            events = EventPipeline([JsonLinesSink(str(path))], Level.DEBUG)
+            events.start()
+            events.put(Event(Level.DEBUG, "Waiting %s seconds", (2,)))
+            events.put(Event(Level.WARNING, "Command execution failed"))
+            events.close()
+
+            lines = [json.loads(line)
+                     for line in path.read_text().splitlines()]
+
+        self.assertListEqual([(line['level'], line['message'])
+                              for line in lines], [
+            ('debug', "Waiting 2 seconds"),
+            ('warning', "Command execution failed"),
+        ])
+
+    def test_observable_level(self):
+        observable = Observable()
+        listener = Listener(Level.WARNING)
+        observable.register(listener)
+
+        # Not even an event is created for the messages nobody wants
+        observable.notify_msg("Finding image .. %s", 'a.png',
+                              level=Level.DEBUG)
+        observable.notify_msg("Command execution failed",
+                              level=Level.WARNING)
+        self.assertListEqual(listener.events, [
+            Event(Level.WARNING, "Command execution failed")
+        ])
@@ -0,0 +1,223 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mausmakro.clock import VirtualClock
+from mausmakro.finder import ImageFinder, blocking
+from mausmakro.matching import StepMatcher
+
+from helpers import random_screen
+
+
+class TestImageFinder(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+
+        screen = random_screen(7)
+        cv2.imwrite(str(self.path.joinpath('screen.png')), screen)
+
+        self.first = self.path.joinpath('first.png')
+        self.second = self.path.joinpath('second.png')
+        self.missing = self.path.joinpath('missing.png')
+        cv2.imwrite(str(self.first), screen[20:60, 30:90])
+        cv2.imwrite(str(self.second), screen[200:240, 300:380])
+        cv2.imwrite(str(self.missing), np.flip(screen[20:60, 30:90], axis=1))
+
+        self.opts = {
+            'capture': 'file',
+            'capture_path': str(self.path.joinpath('screen.png')),
+        }
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_find(self):
+        finder = ImageFinder(self.opts)
+        self.assertTupleEqual(finder.find(self.first, 0), (30, 20, 60, 40))
+        self.assertIsNone(finder.find(self.missing, 0))
+
+    def test_find_region(self):
+        finder = ImageFinder(self.opts)
+        box = finder.find(self.first, 0, region=(10, 10, 100, 100))
+        self.assertTupleEqual(box, (30, 20, 60, 40))
+        self.assertIsNone(finder.find(self.first, 0,
+                                      region=(100, 100, 50, 50)))
+
+    def test_auto_region(self):
+        finder = ImageFinder({**self.opts, 'auto_region': True})
+        finder.find(self.first, 0)
+        box = finder.find(self.first, 0)
+
+        self.assertTupleEqual(box, (30, 20, 60, 40))
+        self.assertEqual(finder.stats()['window_hits'], 1)
+        self.assertEqual(finder.stats()['window_misses'], 0)
+
+    def test_auto_region_corner(self):
+        screen = cv2.imread(str(self.path.joinpath('screen.png')))
+        corner = self.path.joinpath('corner.png')
+        cv2.imwrite(str(corner), screen[260:300, 340:400])
+
+        # The window ends at the edges of the screen
+        finder = ImageFinder({**self.opts, 'auto_region': True})
+        finder.find(corner, 0)
+        self.assertTupleEqual(finder._padded((340, 260, 60, 40), 1),
+                              (240, 160, 160, 140))
+        self.assertTupleEqual(finder.find(corner, 0), (340, 260, 60, 40))
+        self.assertEqual(finder.stats()['window_hits'], 1)
+
+    def test_auto_region_off_screen(self):
+        # Remembered from a larger screen, the whole screen is searched
+        finder = ImageFinder({**self.opts, 'auto_region': True})
+        finder._last_hits[str(self.first)] = (500, 400, 60, 40)
+        self.assertIsNone(finder._padded((500, 400, 60, 40), 1))
+        self.assertTupleEqual(finder.find(self.first, 0), (30, 20, 60, 40))
+        self.assertEqual(finder.stats()['window_misses'], 0)
+
+    def test_best_change(self):
+        screen = cv2.imread(str(self.path.joinpath('screen.png')))
+        template = screen[20:60, 30:90]
+        noise = np.random.default_rng(1).integers(-10, 10, template.shape)
+        screen[200:240, 300:360] = np.clip(template + noise, 0, 255)
+
+        # The weaker match changed first, the better one is returned
+        changes = [(300, 200, 60, 40), (30, 20, 60, 40)]
+        found = ImageFinder._match_changes(StepMatcher(1, 0.9), screen,
+                                           template, changes)
+        self.assertTupleEqual(found.box, (30, 20, 60, 40))
+
+    def test_find_many(self):
+        finder = ImageFinder(self.opts)
+        paths = [self.first, self.second, self.missing]
+
+        found = finder.find_many(paths, 0)
+        self.assertDictEqual(found, {
+            str(self.first): (30, 20, 60, 40),
+            str(self.second): (300, 200, 80, 40),
+        })
+        self.assertEqual(finder.capture.stats()['frames'], 1)
+        self.assertDictEqual(finder.find_many(paths, 0, require_all=True), {})
+
+    def test_frame_diff_unchanged(self):
+        finder = ImageFinder(self.opts)
+        self.assertIsNone(finder.find(self.missing, 0.1))
+
+        stats = finder.stats()
+        self.assertEqual(stats['matches_performed'], 1)
+        self.assertGreater(stats['matches_skipped'], 0)
+
+    def test_frame_diff_changed_part(self):
+        frames = self.path.joinpath('frames')
+        frames.mkdir()
+
+        screen = cv2.imread(str(self.path.joinpath('screen.png')))
+        changed = screen.copy()
+        screen[200:240, 300:380] = 0
+        cv2.imwrite(str(frames.joinpath('0.png')), screen)
+        cv2.imwrite(str(frames.joinpath('1.png')), changed)
+
+        finder = ImageFinder({**self.opts, 'capture_path': str(frames)})
+        found = finder.find_many([self.first, self.second], 1,
+                                 require_all=True)
+
+        self.assertDictEqual(found, {
+            str(self.first): (30, 20, 60, 40),
+            str(self.second): (300, 200, 80, 40),
+        })
+        self.assertEqual(finder.stats()['matches_performed'], 2)
+
+    def test_wait_adaptive(self):
+        finder = ImageFinder(self.opts)
+        self.assertIsNone(finder.find(self.missing, 0.5, adaptive=True))
+
+        # The polling slows down on unchanged screen
+        self.assertLess(finder.capture.stats()['frames'], 10)
+        self.assertTupleEqual(finder.find(self.first, 1, adaptive=True),
+                              (30, 20, 60, 40))
+
+    def test_wait_gone(self):
+        frames = self.path.joinpath('frames')
+        frames.mkdir()
+
+        screen = cv2.imread(str(self.path.joinpath('screen.png')))
+        cv2.imwrite(str(frames.joinpath('0.png')), screen)
+        screen[20:60, 30:90] = 0
+        cv2.imwrite(str(frames.joinpath('1.png')), screen)
+
+        finder = ImageFinder({**self.opts, 'capture_path': str(frames)})
+        self.assertTrue(finder.wait_gone(self.first, 1))
+        self.assertEqual(finder.capture.stats()['frames'], 2)
+
+        finder = ImageFinder(self.opts)
+        self.assertFalse(finder.wait_gone(self.first, 0.2))
+
+    def test_wait_gone_elsewhere(self):
+        frames = self.path.joinpath('frames')
+        frames.mkdir()
+
+        screen = cv2.imread(str(self.path.joinpath('screen.png')))
+        cv2.imwrite(str(frames.joinpath('0.png')), screen)
+        screen[200:240, 300:380] = 0
+        cv2.imwrite(str(frames.joinpath('1.png')), screen)
+
+        # Changes away from the image are not matched
+        finder = ImageFinder({**self.opts, 'capture_path': str(frames)})
+        self.assertFalse(finder.wait_gone(self.first, 0.2))
+        self.assertEqual(finder.stats()['matches_performed'], 1)
+        self.assertGreater(finder.stats()['matches_skipped'], 1)
+
+    def test_no_time_left(self):
+        # Searched once, the deadline has passed by then
+        finder = ImageFinder({**self.opts, 'clock': VirtualClock()})
+        self.assertIsNone(blocking(finder.find_steps(self.missing, 0)))
+        self.assertEqual(finder.capture.stats()['frames'], 1)
+
+    def test_lookahead(self):
+        finder = ImageFinder(self.opts)
+        lookahead = finder.lookahead(self.first)
+        finder.advance(lookahead)
+        finder.advance(lookahead)
+
+        box = blocking(finder.find_steps(self.first, 0, lookahead=lookahead))
+        self.assertTupleEqual(box, (30, 20, 60, 40))
+        self.assertEqual(finder.stats()['lookahead_hits'], 1)
+
+        # Matched in the first frame only, the image has not moved since
+        self.assertEqual(finder.stats()['matches_performed'], 1)
+
+    def test_lookahead_auto_region(self):
+        finder = ImageFinder({**self.opts, 'auto_region': True})
+        finder.find(self.first, 0)
+
+        # Only the window around the last location is captured
+        lookahead = finder.lookahead(self.first)
+        self.assertTupleEqual(lookahead.window, (0, 0, 190, 160))
+        finder.advance(lookahead)
+
+        box = blocking(finder.find_steps(self.first, 0, lookahead=lookahead))
+        self.assertTupleEqual(box, (30, 20, 60, 40))
+        self.assertEqual(finder.stats()['lookahead_hits'], 1)
+        self.assertEqual(finder.stats()['window_hits'], 1)
+
+    def test_lookahead_stale(self):
+        frames = self.path.joinpath('frames')
+        frames.mkdir()
+
+        screen = cv2.imread(str(self.path.joinpath('screen.png')))
+        cv2.imwrite(str(frames.joinpath('0.png')), screen)
+        screen[20:60, 30:90] = 0
+        cv2.imwrite(str(frames.joinpath('1.png')), screen)
+
+        finder = ImageFinder({**self.opts, 'capture_path': str(frames)})
+        lookahead = finder.lookahead(self.first)
+        finder.advance(lookahead)
+        self.assertIsNotNone(lookahead.match)
+
+        # Gone from the fresh frame, found again in the frame after it
+        box = blocking(finder.find_steps(self.first, 1, lookahead=lookahead))
+        self.assertTupleEqual(box, (30, 20, 60, 40))
+        self.assertEqual(finder.stats()['lookahead_hits'], 0)
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from mausmakro.framediff import FrameDiff, intersects
+
+
+class TestFrameDiff(unittest.TestCase):
+
+    def test_first_frame(self):
+        diff = FrameDiff()
+        self.assertIsNone(diff.update(np.zeros((100, 100), dtype=np.uint8)))
+
+    def test_unchanged(self):
+        diff = FrameDiff()
+        diff.update(np.zeros((100, 100, 3), dtype=np.uint8))
+        self.assertListEqual(
+            diff.update(np.zeros((100, 100, 3), dtype=np.uint8)), []
+        )
+
+    def test_changed_part(self):
+        diff = FrameDiff(cell=10)
+        frame = np.zeros((100, 100), dtype=np.uint8)
+        diff.update(frame)
+
+        frame = frame.copy()
+        frame[5, 5] = 1
+        frame[52:58, 95:99] = 255
+        changes = diff.update(frame)
+        self.assertListEqual(sorted(changes),
+                             [(0, 0, 10, 10), (90, 50, 10, 10)])
+
+    def test_changed_mostly(self):
+        diff = FrameDiff(cell=10)
+        diff.update(np.zeros((100, 100), dtype=np.uint8))
+        self.assertIsNone(diff.update(np.ones((100, 100), dtype=np.uint8)))
+
+    def test_shape_changed(self):
+        diff = FrameDiff()
+        diff.update(np.zeros((100, 100), dtype=np.uint8))
+        self.assertIsNone(diff.update(np.zeros((50, 100), dtype=np.uint8)))
+
+    def test_intersects(self):
+        self.assertTrue(intersects((0, 0, 10, 10), (5, 5, 10, 10)))
+        self.assertFalse(intersects((0, 0, 10, 10), (10, 0, 10, 10)))
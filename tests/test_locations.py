@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mausmakro.finder import ImageFinder
+from mausmakro.locations import LocationCache
+from mausmakro.matching import Match
+
+from helpers import random_screen
+
+
+class TestLocationCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.cache_file = self.path.joinpath('cache', 'locations.json')
+        self.macro = self.path.joinpath('macro.txt')
+        self.macro.write_text('')
+
+        screen = random_screen(3)
+        cv2.imwrite(str(self.path.joinpath('screen.png')), screen)
+
+        self.image = self.path.joinpath('image.png')
+        cv2.imwrite(str(self.image), screen[150:190, 250:310])
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def _cache(self, size=(400, 300)) -> LocationCache:
+        return LocationCache(self.cache_file, self.macro, size)
+
+    def test_save_load(self):
+        cache = self._cache()
+        cache.hit(self.image, Match(250, 150, 60, 40, 1.0))
+        cache.save()
+
+        self.assertTupleEqual(self._cache().get(self.image),
+                              (250, 150, 60, 40))
+
+    def test_image_changed(self):
+        cache = self._cache()
+        cache.hit(self.image, Match(250, 150, 60, 40, 1.0))
+        cache.save()
+
+        cv2.imwrite(str(self.image), np.zeros((40, 60, 3), dtype=np.uint8))
+        self.assertIsNone(self._cache().get(self.image))
+
+    def test_geometry_changed(self):
+        cache = self._cache()
+        cache.hit(self.image, Match(250, 150, 60, 40, 1.0))
+        cache.save()
+
+        cache = self._cache((800, 600))
+        self.assertIsNone(cache.get(self.image))
+        self.assertEqual(len(cache), 0)
+
+    def test_misses(self):
+        cache = self._cache()
+        cache.hit(self.image, Match(250, 150, 60, 40, 1.0))
+        for _ in range(LocationCache.MAX_MISSES - 1):
+            cache.miss(self.image)
+
+        self.assertIsNotNone(cache.get(self.image))
+        cache.miss(self.image)
+        self.assertIsNone(cache.get(self.image))
+
+    def test_broken_file(self):
+        self.cache_file.parent.mkdir()
+        self.cache_file.write_text('{')
+        self.assertEqual(len(self._cache()), 0)
+
+    def test_finder(self):
+        opts = {
+            'capture': 'file',
+            'capture_path': str(self.path.joinpath('screen.png')),
+            'file': str(self.macro),
+            'location_cache': str(self.cache_file),
+        }
+
+        finder = ImageFinder(opts)
+        self.assertTupleEqual(finder.find(self.image, 0), (250, 150, 60, 40))
+        self.assertEqual(finder.stats()['window_hits'], 0)
+        finder.save_locations()
+
+        # The next run starts with the remembered location
+        finder = ImageFinder(opts)
+        self.assertTupleEqual(finder.find(self.image, 0), (250, 150, 60, 40))
+        self.assertEqual(finder.stats()['window_hits'], 1)
@@ -0,0 +1,93 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+
+from mausmakro.async_interpreter import AsyncInterpreter
+from mausmakro.interpreter import Interpreter
+from mausmakro.optimizer import Optimizer
+from mausmakro.parsing import Parser
+
+from helpers import OPTS, clicking, random_screen
+
+
+class TestLookahead(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.path.joinpath('images').mkdir()
+
+        screen = random_screen(7)
+        cv2.imwrite(str(self.path.joinpath('screen.png')), screen)
+        cv2.imwrite(str(self.path.joinpath('images/first.png')),
+                    screen[20:60, 30:90])
+
+        self.file = self.path.joinpath('macro.txt')
+        self.opts = {**OPTS, 'capture': 'file',
+                     'capture_path': str(self.path / 'screen.png'),
+                     'file': str(self.file), 'lookahead': True}
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def run_macro(self, source: str, interpreter_cls=Interpreter, **opts):
+        self.file.write_text(source)
+        parser = Parser(str(self.file))
+        instructions, label_table = parser.parse()
+        parser.perform_checks()
+        interpreter = clicking(interpreter_cls)(
+            *Optimizer(instructions, label_table).optimize(),
+            {**self.opts, **opts}
+        )
+        interpreter.interpret('foobar')
+        return interpreter
+
+    def test_find(self):
+        interpreter = self.run_macro("MACRO foobar {\n"
+                                     "    WAIT 1s\n"
+                                     "    CLICK ON first.png WITHIN 0s\n"
+                                     "}\n")
+        self.assertListEqual(interpreter.clicks, [(60, 40)])
+        self.assertEqual(interpreter._finder.stats()['lookahead_hits'], 1)
+
+    def test_condition(self):
+        interpreter = self.run_macro("MACRO foobar {\n"
+                                     "    WAIT 1s\n"
+                                     "    IF FIND first.png WITHIN 0s {\n"
+                                     "        CLICK 1,1\n"
+                                     "    }\n"
+                                     "}\n")
+        self.assertListEqual(interpreter.clicks, [(1, 1)])
+        self.assertEqual(interpreter._finder.stats()['lookahead_hits'], 1)
+
+    def test_async(self):
+        interpreter = self.run_macro("MACRO foobar {\n"
+                                     "    WAIT 1s\n"
+                                     "    WAIT UNTIL first.png WITHIN 0s\n"
+                                     "}\n", AsyncInterpreter)
+        self.assertEqual(interpreter._finder.stats()['lookahead_hits'], 1)
+
+    def test_disabled(self):
+        interpreter = self.run_macro("MACRO foobar {\n"
+                                     "    WAIT 1s\n"
+                                     "    FIND first.png WITHIN 0s\n"
+                                     "}\n", lookahead=False)
+        self.assertEqual(interpreter._finder.stats()['lookahead_hits'], 0)
+
+    def test_other_command(self):
+        interpreter = self.run_macro("MACRO foobar {\n"
+                                     "    WAIT 1s\n"
+                                     "    FIND first.png WITHIN 0s\n"
+                                     "}\n")
+        interpreter._lookahead = (0, interpreter._finder.lookahead(
+            self.path.joinpath('images/first.png')
+        ))
+
+        # Started for the command at the index 0, not the current one
+        interpreter._program_counter = 1
+        self.assertIsNone(interpreter._take_lookahead(
+            self.path.joinpath('images/first.png'), True, 2, None
+        ))
+        self.assertIsNone(interpreter._lookahead)
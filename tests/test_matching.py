@@ -0,0 +1,69 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from mausmakro.matching import PyramidMatcher, StepMatcher, TiledMatcher, \
+    create_matcher
+
+from helpers import random_screen
+
+
+def make_screen(size=(300, 400)):
+    screen = random_screen(42, size)
+    template = screen[120:168, 250:330].copy()
+    return screen, template
+
+
+class TestMatching(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.screen, self.template = make_screen()
+
+    def test_step_matcher(self):
+        for step in (1, 2):
+            found = StepMatcher(step).match(self.screen, self.template)
+            self.assertTupleEqual(found.box, (250, 120, 80, 48))
+
+    def test_pyramid_matcher(self):
+        found = PyramidMatcher().match(self.screen, self.template)
+        self.assertTupleEqual(found.box, (250, 120, 80, 48))
+        self.assertGreater(found.score, 0.99)
+
+    def test_pyramid_matcher_grayscale(self):
+        screen = cv2.cvtColor(self.screen, cv2.COLOR_BGR2GRAY)
+        template = cv2.cvtColor(self.template, cv2.COLOR_BGR2GRAY)
+        found = PyramidMatcher().match(screen, template)
+        self.assertTupleEqual(found.box, (250, 120, 80, 48))
+
+    def test_not_found(self):
+        template = np.flip(self.template, axis=0).copy()
+        for engine in ('step', 'pyramid'):
+            matcher = create_matcher(engine)
+            self.assertIsNone(matcher.match(self.screen, template))
+
+    def test_template_larger_than_screen(self):
+        screen = self.screen[:20, :20]
+        for engine in ('step', 'pyramid'):
+            matcher = create_matcher(engine)
+            self.assertIsNone(matcher.match(screen, self.template))
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, create_matcher, 'foo')
+
+    def test_tiled_matcher(self):
+        screen, _ = make_screen((600, 1200))
+        # Crosses the border of the first and the second tile
+        template = screen[100:148, 270:350].copy()
+
+        matcher = create_matcher('step', workers=4)
+        self.assertIsInstance(matcher, TiledMatcher)
+        self.assertEqual(len(matcher._tiles(screen.shape[:2], (48, 80))), 4)
+
+        found = matcher.match(screen, template)
+        self.assertTupleEqual(found.box, (270, 100, 80, 48))
+
+    def test_tiled_matcher_small_screen(self):
+        matcher = TiledMatcher(PyramidMatcher(), 4)
+        found = matcher.match(self.screen, self.template)
+        self.assertTupleEqual(found.box, (250, 120, 80, 48))
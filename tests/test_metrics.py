@@ -0,0 +1,214 @@
+import tempfile
+import unittest
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import cv2
+import numpy as np
+
+from mausmakro.async_interpreter import AsyncInterpreter
+from mausmakro.interpreter import Interpreter
+from mausmakro.lib.exceptions import RetryException
+from mausmakro.lib.observable import Level
+from mausmakro.metrics import MacroMetrics, MetricsFile, MetricsServer, \
+    Registry
+from mausmakro.reloader import compile_program
+
+from helpers import OPTS, clicking, random_screen
+
+SOURCE = ("MACRO foobar {\n"
+          "    FIND first.png WITHIN 1s\n"
+          "    CLICK 1,1\n"
+          "    FIND missing.png WITHIN 0s\n"
+          "}\n")
+
+
+def counting(interpreter_cls):
+    class Counting(clicking(interpreter_cls)):
+        """Records the instructions counted so far at every click."""
+        counted = []
+
+        def _click(self, x, y, clicks):
+            self.counted.append(self.metrics.instructions.value)
+
+    return Counting
+
+
+def write_program(path: Path) -> Path:
+    """The macro of SOURCE, where missing.png is never found."""
+    path.joinpath('images').mkdir()
+
+    screen = random_screen(3)
+    cv2.imwrite(str(path.joinpath('screen.png')), screen)
+    cv2.imwrite(str(path.joinpath('images/first.png')), screen[20:60, 30:90])
+    cv2.imwrite(str(path.joinpath('images/missing.png')),
+                np.flip(screen[20:60, 30:90], axis=1))
+
+    file = path.joinpath('macro.txt')
+    file.write_text(SOURCE)
+    return file
+
+
+def samples(text: str) -> dict:
+    return dict(line.rsplit(' ', 1) for line in text.splitlines()
+                if not line.startswith('#'))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        registry.counter('runs_total', "Runs.").labels().inc(2)
+        registry.counter('finds_total', "Finds.",
+                         ('image',)).labels('a"b\\c\nd').inc()
+        self.assertEqual(registry.render(),
+                         "# HELP runs_total Runs.\n"
+                         "# TYPE runs_total counter\n"
+                         "runs_total 2\n"
+                         "# HELP finds_total Finds.\n"
+                         "# TYPE finds_total counter\n"
+                         'finds_total{image="a\\"b\\\\c\\nd"} 1\n')
+
+    def test_histogram(self):
+        registry = Registry()
+        histogram = registry.histogram('find_seconds', "Finds.", (0.1, 1.0),
+                                       ('image',)).labels('a.png')
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertDictEqual(samples(registry.render()), {
+            'find_seconds_bucket{image="a.png",le="0.1"}': '2',
+            'find_seconds_bucket{image="a.png",le="1.0"}': '3',
+            'find_seconds_bucket{image="a.png",le="+Inf"}': '4',
+            'find_seconds_sum{image="a.png"}': '2.65',
+            'find_seconds_count{image="a.png"}': '4',
+        })
+
+    def test_server(self):
+        metrics = MacroMetrics()
+        metrics.iterations.inc()
+        server = MetricsServer(metrics.registry, 0)
+        server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            with urlopen(f"{url}/metrics", timeout=5) as response:
+                self.assertIn('text/plain',
+                              response.headers['Content-Type'])
+                body = response.read().decode('utf-8')
+
+            self.assertEqual(samples(body)['mausmakro_iterations_total'],
+                             '1')
+            with self.assertRaises(HTTPError):
+                urlopen(f"{url}/other", timeout=5)
+
+        finally:
+            server.stop()
+
+    def test_file(self):
+        metrics = MacroMetrics()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir, 'metrics.prom')
+            snapshot = len(metrics.registry.render())
+            exporter = MetricsFile(metrics.registry, str(path),
+                                   max_bytes=snapshot * 2 + 100, backups=2)
+            for _ in range(7):
+                exporter.write()
+
+            self.assertTrue(path.with_name('metrics.prom.1').exists())
+            self.assertTrue(path.with_name('metrics.prom.2').exists())
+            self.assertFalse(path.with_name('metrics.prom.3').exists())
+            text = path.read_text()
+            self.assertTrue(text.startswith('# '))
+            self.assertIn("mausmakro_iterations_total 0", text)
+
+            # Stopping writes the last snapshot
+            path.unlink()
+            exporter.start()
+            exporter.stop()
+            self.assertIn("mausmakro_iterations_total 0", path.read_text())
+
+    def test_interpreter(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir)
+            file = write_program(path)
+
+            for interpreter_cls in (Interpreter, AsyncInterpreter):
+                with self.subTest(interpreter=interpreter_cls.__name__):
+                    _, program = compile_program(str(file), 'foobar')
+                    opts = {**OPTS, 'capture': 'file',
+                            'capture_path': str(path / 'screen.png'),
+                            'enable_retry': True, 'file': str(file),
+                            'retry_times': 2}
+                    interpreter = clicking(interpreter_cls)(*program[:2],
+                                                            opts)
+                    with self.assertRaises(RetryException):
+                        interpreter.interpret('foobar')
+
+                    metrics = samples(interpreter.metrics.registry.render())
+                    self.assertEqual(metrics['mausmakro_iterations_total'],
+                                     '1')
+                    self.assertEqual(
+                        metrics['mausmakro_iteration_seconds_count'], '1'
+                    )
+                    self.assertEqual(metrics['mausmakro_failures_total'],
+                                     '1')
+                    self.assertEqual(metrics['mausmakro_retries_total'],
+                                     '2')
+                    # FIND and CLICK, not the failed FIND
+                    self.assertEqual(metrics['mausmakro_instructions_total'],
+                                     '2')
+                    self.assertEqual(
+                        metrics['mausmakro_finds_total{result="hit"}'], '1'
+                    )
+                    self.assertEqual(
+                        metrics['mausmakro_finds_total{result="miss"}'], '3'
+                    )
+                    self.assertEqual(metrics[
+                        'mausmakro_find_seconds_count{image="missing.png"}'
+                    ], '3')
+
+    def test_stats_on_failure(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir)
+            file = write_program(path)
+
+            for interpreter_cls in (Interpreter, AsyncInterpreter):
+                with self.subTest(interpreter=interpreter_cls.__name__):
+                    _, program = compile_program(str(file), 'foobar')
+                    opts = {**OPTS, 'capture': 'file',
+                            'capture_path': str(path / 'screen.png'),
+                            'file': str(file), 'stats': True}
+                    interpreter = clicking(interpreter_cls)(*program[:2],
+                                                            opts)
+                    interpreter.level = Level.INFO
+                    interpreter.interpret('foobar')
+
+                    # END was never reached
+                    self.assertIn("Image not found within the time limit",
+                                  interpreter.messages)
+                    self.assertTrue(any(msg.startswith("Capture: ")
+                                        for msg in interpreter.messages))
+
+    def test_live_instructions(self):
+        # Counted while the macro runs, an endless one would never finish
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            screen = Path(tmp_dir, 'screen.png')
+            cv2.imwrite(str(screen), np.zeros((30, 40, 3), dtype=np.uint8))
+            file = Path(tmp_dir, 'macro.txt')
+            file.write_text("MACRO foobar {\n"
+                            "    WAIT 0s\n"
+                            "    CLICK 1,1\n"
+                            "    CLICK 2,2\n"
+                            "}\n")
+            for interpreter_cls in (Interpreter, AsyncInterpreter):
+                with self.subTest(interpreter=interpreter_cls.__name__):
+                    _, program = compile_program(str(file), 'foobar')
+                    interpreter = counting(interpreter_cls)(
+                        *program[:2], {**OPTS, 'capture': 'file',
+                                       'capture_path': str(screen),
+                                       'file': str(file)}
+                    )
+                    interpreter.counted = []
+                    interpreter.interpret('foobar')
+                    self.assertListEqual(interpreter.counted, [1, 2])
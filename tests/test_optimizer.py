@@ -0,0 +1,56 @@
+import unittest
+
+from mausmakro.lib.enums import Opcode
+from mausmakro.lib.types import Command, Conditional
+from mausmakro.optimizer import Optimizer, dump
+from mausmakro.parsing import Parser
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def test_optimize(self):
+        parser = Parser('test_macros/optimize.txt')
+        parsed = parser.parse()
+        ins, labels = Optimizer(*parsed).optimize()
+
+        cond = Conditional(Opcode.IF)
+        cond.condition = Command(Opcode.FIND, ('image.png', 5))
+        cond.end_label = 4
+        cond.else_label = 3
+
+        expected_ins = [
+            Command(Opcode.WAIT, 3),
+            cond,
+            Command(Opcode.JUMP, 4),
+            Command(Opcode.CALL, 6),
+            Command(Opcode.WAIT, 3),
+            Command(Opcode.END),
+            Command(Opcode.RETURN),
+        ]
+        expected_labels = {'foobar': 0, 'end': 4, 'finish': 4, 'proc': 6}
+
+        self.assertListEqual(ins, expected_ins)
+        self.assertDictEqual(labels, expected_labels)
+
+    def test_parsed_untouched(self):
+        parsed = Parser('test_macros/conditional_else.txt').parse()
+        before = dump(*parsed)
+        Optimizer(*parsed).optimize()
+        self.assertEqual(dump(*parsed), before)
+
+    def test_jump_cycle(self):
+        ins = [
+            Command(Opcode.LABEL, 'foobar'),
+            Command(Opcode.LABEL, 'a'),
+            Command(Opcode.JUMP, 'b'),
+            Command(Opcode.LABEL, 'b'),
+            Command(Opcode.JUMP, 'a'),
+            Command(Opcode.END),
+        ]
+        labels = {'foobar': 0, 'a': 1, 'b': 3}
+
+        ins, labels = Optimizer(ins, labels).optimize()
+        # Endless loop stays endless, but the threading terminates
+        self.assertListEqual(ins, [Command(Opcode.JUMP, 0),
+                                   Command(Opcode.JUMP, 0)])
+        self.assertDictEqual(labels, {'foobar': 0, 'a': 0, 'b': 1})
@@ -19,6 +19,10 @@ class TestParseToken(unittest.TestCase):
         res = Parser.parse_token(Token('COORDS', '1,1'))
         self.assertTupleEqual(res, (1, 1))
 
+    def test_parse_token_region(self):
+        res = Parser.parse_token(Token('REGION', '1, 2,3 ,4'))
+        self.assertTupleEqual(res, (1, 2, 3, 4))
+
     def test_parse_token_time_s(self):
         res = Parser.parse_token(Token('TIME', '50s'))
         self.assertEqual(res, 50)
@@ -3,7 +3,7 @@ from unittest.mock import patch
 
 from mausmakro.lib.enums import Opcode
 from mausmakro.lib.exceptions import LabelException, ParserException
-from mausmakro.lib.types import Command, Conditional
+from mausmakro.lib.types import Block, Command, Conditional, Watcher
 from mausmakro.parsing import Parser
 
 
@@ -98,6 +98,40 @@ class TestParser(unittest.TestCase):
         filename = 'test_macros/empty_macro.txt'
         self.assertRaises(ParserException, Parser, filename)
 
+    @patch.object(Parser, '_generate_label', mock_generate_label)
+    def test_find_any(self):
+        filename = 'test_macros/find_any.txt'
+        parser = Parser(filename)
+        ins, labels = parser.parse()
+
+        cond_any = Conditional(Opcode.IF)
+        cond_any.condition = Command(Opcode.FIND_ANY, (
+            ('a.png', 'b.png', 'c.png'), 5, (0, 0, 10, 10)
+        ))
+        cond_any.end_label = 'fbartest_1'
+        cond_any.else_label = None
+
+        cond_found = Conditional(Opcode.IF)
+        cond_found.condition = Command(Opcode.FOUND, 'b.png')
+        cond_found.end_label = 'fbartest_2'
+        cond_found.else_label = None
+
+        expected_labels = {'foobar': 0, 'fbartest_1': 6, 'fbartest_2': 5}
+        expected_ins = [
+            Command(Opcode.LABEL, 'foobar'),
+            Command(Opcode.FIND_ALL, (('a.png', 'b.png'), 1)),
+            cond_any,
+            cond_found,
+            Command(Opcode.WAIT, 1),
+            Command(Opcode.LABEL, cond_found.end_label),
+            Command(Opcode.LABEL, cond_any.end_label),
+            Command(Opcode.END),
+        ]
+
+        self.assertListEqual(ins, expected_ins)
+        self.assertDictEqual(labels, expected_labels)
+        self.assertListEqual(parser.images, ['a.png', 'b.png', 'c.png'])
+
     def test_import_statement(self):
         filename = 'test_macros/import_statement.txt'
         ins, labels = Parser(filename).parse()
@@ -116,6 +150,30 @@ class TestParser(unittest.TestCase):
         self.assertListEqual(ins, expected_ins)
         self.assertDictEqual(labels, expected_labels)
 
+    def test_lines(self):
+        parser = Parser('test_macros/conditional_else.txt')
+        parser.parse()
+        self.assertListEqual([line for _, line in parser.lines],
+                             [1, 2, 3, 4, 4, 5, 6, 7])
+
+        parser = Parser('test_macros/import_statement.txt')
+        parser.parse()
+        self.assertListEqual(parser.lines, [
+            ('test_macros/simple.txt', 1),
+            ('test_macros/simple.txt', 2),
+            ('test_macros/simple.txt', 3),
+            ('test_macros/simple.txt', 4),
+            ('test_macros/import_statement.txt', 3),
+            ('test_macros/import_statement.txt', 4),
+            ('test_macros/import_statement.txt', 5),
+        ])
+
+    def test_import_syntax_error(self):
+        filename = 'test_macros/import_syntax_error.txt'
+        with self.assertRaisesRegex(ParserException,
+                                    'syntax_error.txt on line 4'):
+            Parser(filename)
+
     def test_indents_newlines(self):
         filename = 'test_macros/indents_newlines.txt'
         ins, labels = Parser(filename).parse()
@@ -149,6 +207,67 @@ class TestParser(unittest.TestCase):
         self.assertListEqual(ins, expected_ins)
         self.assertDictEqual(labels, expected_labels)
 
+    def test_race_parallel(self):
+        filename = 'test_macros/race.txt'
+        ins, labels = Parser(filename).parse()
+
+        expected_labels = {'dialog': 0, 'foobar': 4}
+        expected_ins = [
+            Command(Opcode.LABEL, 'dialog'),
+            Command(Opcode.FIND, ('ok.png', 5)),
+            Command(Opcode.CLICK, (10, 10)),
+            Command(Opcode.RETURN),
+            Command(Opcode.LABEL, 'foobar'),
+            Block(Opcode.RACE, [
+                Command(Opcode.CALL, 'dialog'),
+                Command(Opcode.CLICK, ('cancel.png', 5)),
+                Command(Opcode.WAIT, 3),
+            ]),
+            Block(Opcode.PARALLEL, [
+                Command(Opcode.FIND, ('first.png', 1)),
+                Command(Opcode.WAIT_UNTIL, ('second.png', 2,
+                                            (0, 0, 100, 100))),
+            ]),
+            Command(Opcode.END),
+        ]
+
+        self.assertListEqual(ins, expected_ins)
+        self.assertDictEqual(labels, expected_labels)
+
+    def test_parallel_click(self):
+        # Only RACE may click, PARALLEL branches would click at random
+        filename = 'test_macros/parallel_click.txt'
+        self.assertRaises(ParserException, Parser, filename)
+
+    def test_parallel_call_click(self):
+        # Nor the procedures called by PARALLEL, or any of their callees
+        parser = Parser('test_macros/parallel_call_click.txt')
+        parser.parse()
+        with self.assertRaisesRegex(ParserException,
+                                    "PARALLEL in foobar calls dialog"):
+            parser.perform_checks()
+
+    def test_region(self):
+        filename = 'test_macros/region.txt'
+        ins, labels = Parser(filename).parse()
+
+        expected_labels = {'foobar': 0}
+        expected_ins = [
+            Command(Opcode.LABEL, 'foobar'),
+            Command(Opcode.FIND, ('image.png', 5, (10, 20, 300, 400))),
+            Command(Opcode.CLICK, ('image.png', 1, (0, 0, 100, 100))),
+            Command(Opcode.PFIND, ('image.png', 2)),
+            Command(Opcode.END),
+        ]
+
+        self.assertListEqual(ins, expected_ins)
+        self.assertDictEqual(labels, expected_labels)
+
+    def test_region_invalid(self):
+        filename = 'test_macros/region_invalid.txt'
+        parser = Parser(filename)
+        self.assertRaises(ParserException, parser.parse)
+
     def test_valid_name(self):
         filename = 'test_macros/valid_name.txt'
         ins, labels = Parser(filename).parse()
@@ -168,3 +287,35 @@ class TestParser(unittest.TestCase):
         parser = Parser(filename)
         parser.parse()
         self.assertRaises(LabelException, parser.perform_checks)
+
+    def test_watcher(self):
+        parser = Parser('test_macros/watcher.txt')
+        parser.parse()
+        parser.check_labels()
+
+        self.assertListEqual(parser.watchers, [
+            Watcher('popup.png', 'dismiss'),
+            Watcher('dialog.png', 'dismiss', (0, 0, 200, 100)),
+        ])
+        self.assertListEqual(parser.images, ['popup.png', 'dialog.png'])
+        self.assertListEqual(parser.analyze(), [])
+
+    def test_watcher_macro(self):
+        parser = Parser('test_macros/watcher_macro.txt')
+        parser.parse()
+        self.assertRaises(LabelException, parser.check_labels)
+
+    def test_wait_image(self):
+        filename = 'test_macros/wait.txt'
+        parser = Parser(filename)
+        ins, labels = parser.parse()
+
+        expected_ins = [
+            Command(Opcode.LABEL, 'foobar'),
+            Command(Opcode.WAIT_UNTIL, ('dialog.png', 60)),
+            Command(Opcode.WAIT_WHILE, ('spinner.png', 30, (0, 0, 10, 10))),
+            Command(Opcode.END),
+        ]
+
+        self.assertListEqual(ins, expected_ins)
+        self.assertListEqual(parser.images, ['dialog.png', 'spinner.png'])
@@ -18,3 +18,24 @@ class TestPreprocessor(unittest.TestCase):
         preprocessor = Preprocessor(filename)
         with self.assertRaises(PreprocessorException):
             preprocessor.process()
+
+    def test_import_once(self):
+        filename = 'test_macros/import_once.txt'
+        preprocessor = Preprocessor(filename)
+        content = preprocessor.process()
+
+        self.assertEqual(content.count('MACRO foobar '), 1)
+        self.assertEqual(content.count('MACRO foobaz '), 1)
+        self.assertEqual(preprocessor.locate(1),
+                         ('test_macros/simple.txt', 1))
+        self.assertEqual(preprocessor.locate(5),
+                         ('test_macros/import_statement.txt', 3))
+        self.assertEqual(preprocessor.locate(9),
+                         ('test_macros/import_once.txt', 4))
+
+    def test_import_cycle(self):
+        filename = 'test_macros/import_cycle_a.txt'
+        with self.assertRaisesRegex(PreprocessorException,
+                                    'import_cycle_a.txt -> import_cycle_b.txt '
+                                    '-> import_cycle_a.txt'):
+            Preprocessor(filename).process()
@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mausmakro.lib.enums import Opcode
+from mausmakro.lib.types import Command
+from mausmakro.profiler import Profiler, ProfilingInterpreter
+from mausmakro.reloader import compile_program
+
+from helpers import OPTS, random_screen
+
+SOURCE = ("PROC dialog {\n"
+          "    FIND first.png WITHIN 1s\n"
+          "    IF NOT FIND missing.png WITHIN 0s {\n"
+          "        WAIT 1s\n"
+          "    }\n"
+          "}\n"
+          "MACRO foobar {\n"
+          "    CALL dialog\n"
+          "    CLICK 1,1\n"
+          "}\n")
+
+
+class Profiling(ProfilingInterpreter):
+    """Does not click."""
+
+    def _click(self, x, y, clicks):
+        pass
+
+
+class TestProfiler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # The macro waits, it is run only once for all the tests
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir)
+            path.joinpath('images').mkdir()
+
+            screen = random_screen(7)
+            cv2.imwrite(str(path.joinpath('screen.png')), screen)
+            cv2.imwrite(str(path.joinpath('images/first.png')),
+                        screen[20:60, 30:90])
+            cv2.imwrite(str(path.joinpath('images/missing.png')),
+                        np.flip(screen[20:60, 30:90], axis=1))
+
+            file = path.joinpath('macro.txt')
+            file.write_text(SOURCE)
+
+            parser, program = compile_program(str(file), 'foobar',
+                                              optimize=False)
+            cls.profiler = Profiler(program[0], parser.lines, program[1],
+                                    parser.macros + parser.procedures)
+            opts = {**OPTS, 'capture': 'file',
+                    'capture_path': str(path / 'screen.png'),
+                    'file': str(file)}
+            Profiling(*program[:2], opts, cls.profiler).interpret('foobar')
+
+    def test_procedures(self):
+        procedures = self.profiler.procedures
+        self.assertGreaterEqual(procedures['dialog'], 1)
+        self.assertGreaterEqual(procedures['foobar'], procedures['dialog'])
+        self.assertAlmostEqual(procedures['foobar'], self.profiler.total)
+
+    def test_lines(self):
+        locations = [self.profiler.location(index)
+                     for index in self.profiler.timings]
+        self.assertIn("macro.txt:2 FIND first.png", locations)
+        self.assertIn("macro.txt:3 IF FIND missing.png", locations)
+        self.assertIn("macro.txt:4 WAIT", locations)
+        self.assertIn("macro.txt:9 CLICK", locations)
+
+        # The condition is counted with the IF only
+        self.assertEqual(len(locations), len(set(locations)))
+
+    def test_images(self):
+        timing = self.profiler.images['first.png']
+        self.assertEqual(timing.calls, 1)
+        self.assertGreater(timing.capture, 0)
+        self.assertGreater(timing.match, 0)
+        self.assertLessEqual(timing.capture + timing.match + timing.sleep,
+                             timing.total)
+
+    def test_collapsed(self):
+        stacks = dict(line.rsplit(' ', 1)
+                      for line in self.profiler.collapsed())
+        self.assertIn("foobar;dialog;macro.txt:2 FIND first.png;match",
+                      stacks)
+        self.assertGreaterEqual(int(stacks["foobar;dialog;macro.txt:4 WAIT"]),
+                                1000000)
+
+    def test_handler_at_start(self):
+        instructions = [Command(Opcode.LABEL, 'foobar'),
+                        Command(Opcode.CLICK, (1, 1)),
+                        Command(Opcode.END),
+                        Command(Opcode.LABEL, 'dismiss'),
+                        Command(Opcode.CLICK, (5, 5)),
+                        Command(Opcode.RETURN)]
+        lines = [('macro.txt', line) for line in range(1, 7)]
+        profiler = Profiler(instructions, lines, {'foobar': 0, 'dismiss': 3},
+                            ['foobar', 'dismiss'])
+
+        # Called by the watcher before the macro ran anything
+        profiler.record(4, [-1], 1.0, 0.0, 0.0, 0.0)
+        self.assertDictEqual(profiler.procedures,
+                             {'foobar': 1.0, 'dismiss': 1.0})
+
+    def test_report(self):
+        report = self.profiler.report(top=1)
+        hottest = report[report.index("Hottest lines:") + 2]
+        self.assertTrue(hottest.endswith("macro.txt:4 WAIT"))
@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from mausmakro.lib.enums import Opcode
+from mausmakro.lib.types import Command
+from mausmakro.parsing import Parser
+from mausmakro.program_cache import ProgramCache
+
+
+class TestProgramCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.cache = ProgramCache(self.path.joinpath('cache'))
+
+        self.main = self.path.joinpath('main.txt')
+        self.imported = self.path.joinpath('imported.txt')
+        self.main.write_text("%IMPORT imported.txt\n"
+                             "MACRO foobar {\n"
+                             "    IF FIND a.png WITHIN 1s {\n"
+                             "        CALL proc\n"
+                             "    }\n"
+                             "}\n")
+        self.imported.write_text("PROC proc {\n"
+                                 "    WAIT 1s\n"
+                                 "}\n")
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_deterministic_labels(self):
+        first = Parser(str(self.main)).parse()
+        second = Parser(str(self.main)).parse()
+        self.assertListEqual(first[0], second[0])
+        self.assertIn('foobar.1', first[1])
+
+    def test_warm_start(self):
+        cold = Parser(str(self.main), self.cache)
+        expected = cold.parse()
+        self.assertTrue(self.cache.grammar_file.exists())
+
+        warm = Parser(str(self.main), self.cache)
+        self.assertIsNone(warm._tree)
+        self.assertTupleEqual(warm.parse(), expected)
+        self.assertListEqual(warm.images, ['a.png'])
+        warm.check_labels()
+
+    def test_import_changed(self):
+        Parser(str(self.main), self.cache).parse()
+        self.imported.write_text("PROC proc {\n"
+                                 "    WAIT 2s\n"
+                                 "}\n")
+
+        parser = Parser(str(self.main), self.cache)
+        self.assertIsNotNone(parser._tree)
+        ins, _ = parser.parse()
+        self.assertIn(Command(Opcode.WAIT, 2), ins)
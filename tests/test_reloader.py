@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from mausmakro.interpreter import Interpreter
+from mausmakro.lib.enums import Opcode
+from mausmakro.lib.observable import MessageType
+from mausmakro.lib.observer import Observer
+from mausmakro.lib.types import Command
+from mausmakro.reloader import Reloader, compile_program
+
+from helpers import OPTS
+
+
+class Messages(Observer):
+
+    def __init__(self):
+        super(Messages, self).__init__()
+        self.messages = []
+
+    def update(self, msg_type: MessageType, msg_data):
+        self.messages.append(str(msg_data))
+
+
+class TestReloader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.main = self.path.joinpath('main.txt')
+        self.imported = self.path.joinpath('imported.txt')
+        self.main.write_text("%IMPORT imported.txt\n"
+                             "MACRO foobar {\n"
+                             "    CALL proc\n"
+                             "}\n")
+        self.imported.write_text("PROC proc {\n"
+                                 "    WAIT 1s\n"
+                                 "}\n")
+
+        parser, self.program = compile_program(str(self.main), 'foobar')
+        self.reloader = Reloader(str(self.main), 'foobar', parser.sources)
+        self.messages = Messages()
+        self.reloader.register(self.messages)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_unchanged(self):
+        self.assertFalse(self.reloader.poll())
+        self.assertIsNone(self.reloader.take())
+
+    def test_import_changed(self):
+        self.imported.write_text("PROC proc {\n"
+                                 "    WAIT 2s\n"
+                                 "    WAIT 3s\n"
+                                 "}\n")
+        self.assertTrue(self.reloader.poll())
+
+        instructions, label_table, images, watchers = self.reloader.take()
+        self.assertIn(Command(Opcode.WAIT, 5), instructions)
+        self.assertIn('foobar', label_table)
+        self.assertIsNone(self.reloader.take())
+
+    def test_broken_version(self):
+        self.imported.write_text("PROC proc {\n"
+                                 "    WAIT\n"
+                                 "}\n")
+        self.assertTrue(self.reloader.poll())
+        self.assertIsNone(self.reloader.take())
+        self.assertTrue(self.messages.messages[-1].startswith(
+            f"Failed to reload {self.main}, the previous version keeps "
+            "running:\nInvalid syntax in "
+        ))
+
+        # Reported only once, then fixed
+        self.assertFalse(self.reloader.poll())
+        self.imported.write_text("PROC proc {\n"
+                                 "    WAIT 4s\n"
+                                 "}\n")
+        self.assertTrue(self.reloader.poll())
+        self.assertIn(Command(Opcode.WAIT, 4), self.reloader.take()[0])
+
+    def test_new_import_watched(self):
+        extra = self.path.joinpath('extra.txt')
+        extra.write_text("PROC extra {\n"
+                         "    WAIT 1s\n"
+                         "}\n")
+        self.main.write_text("%IMPORT imported.txt\n"
+                             "%IMPORT extra.txt\n"
+                             "MACRO foobar {\n"
+                             "    CALL extra\n"
+                             "}\n")
+        self.assertTrue(self.reloader.poll())
+        self.reloader.take()
+
+        extra.write_text("PROC extra {\n"
+                         "    WAIT 10s\n"
+                         "}\n")
+        self.assertTrue(self.reloader.poll())
+        self.assertIn(Command(Opcode.WAIT, 10), self.reloader.take()[0])
+
+    def test_interpreter_load(self):
+        interpreter = Interpreter(*self.program[:2],
+                                  {**OPTS, 'file': str(self.main)})
+        instructions = [Command(Opcode.LABEL, 'other'), Command(Opcode.END)]
+        interpreter.load(instructions, {'other': 0})
+        interpreter.interpret('other')
+        self.assertIs(interpreter._instructions, instructions)
+        self.assertEqual(interpreter._label_name(0), 'other')
@@ -0,0 +1,112 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mausmakro.clock import VirtualClock
+from mausmakro.reloader import compile_program
+from mausmakro.simulation import SimulatedInterpreter
+
+from helpers import OPTS, random_screen
+
+SOURCE = ("ON popup.png CALL close\n"
+          "PROC close {\n"
+          "    CLICK 1,1\n"
+          "}\n"
+          "MACRO foobar {\n"
+          "    WAIT UNTIL dialog.png WITHIN 10s\n"
+          "    CLICK ON dialog.png WITHIN 1s\n"
+          "    WAIT 3s\n"
+          "    IF FIND dialog.png WITHIN 0s {\n"
+          "        CLICK 5,5\n"
+          "    } ELSE {\n"
+          "        CLICK 9,9\n"
+          "    }\n"
+          "}\n"
+          "MACRO timeout {\n"
+          "    FIND popup.png WITHIN 2s\n"
+          "    CLICK 5,5\n"
+          "}\n")
+
+
+class TestSimulation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        path = Path(self._tmp_dir.name)
+        path.joinpath('images').mkdir()
+        path.joinpath('timeline').mkdir()
+
+        # The dialog appears at 2s, the popup over it from 3.2s to 5s
+        screen = random_screen(5)
+        dialog = np.ascontiguousarray(np.flip(screen[:40, :60], axis=0))
+        popup = np.ascontiguousarray(np.flip(screen[:30, :30], axis=1))
+        cv2.imwrite(str(path.joinpath('images/dialog.png')), dialog)
+        cv2.imwrite(str(path.joinpath('images/popup.png')), popup)
+
+        cv2.imwrite(str(path.joinpath('timeline/0.png')), screen)
+        screen = screen.copy()
+        screen[100:140, 200:260] = dialog
+        cv2.imwrite(str(path.joinpath('timeline/2.png')), screen)
+        cv2.imwrite(str(path.joinpath('timeline/5.png')), screen)
+        screen = screen.copy()
+        screen[200:230, 10:40] = popup
+        cv2.imwrite(str(path.joinpath('timeline/3.2.png')), screen)
+
+        self.file = path.joinpath('macro.txt')
+        self.file.write_text(SOURCE)
+        self.opts = {**OPTS, 'capture_path': str(path / 'timeline'),
+                     'file': str(self.file), 'watcher_interval': 0.5}
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def simulate(self, macro: str, times: int = 1,
+                 **opts) -> SimulatedInterpreter:
+        _, program = compile_program(str(self.file), macro)
+        interpreter = SimulatedInterpreter(
+            *program[:2], {**self.opts, 'images': program[2],
+                           'watchers': program[3], **opts},
+            VirtualClock()
+        )
+        for _ in range(times):
+            interpreter.interpret(macro)
+
+        return interpreter
+
+    def test_clicks(self):
+        interpreter = self.simulate('foobar', times=2)
+        clicks = [(click.x, click.y) for click in interpreter.clicks]
+
+        # The popup is watched from 3.2s, it stays until 5s
+        self.assertListEqual(clicks, [(230, 120), (1, 1), (1, 1), (1, 1),
+                                      (5, 5), (230, 120), (5, 5)])
+        self.assertEqual(str(interpreter.clicks[0]), "2.550 CLICK 230,120")
+        self.assertAlmostEqual(interpreter.clock.now, 10.5)
+        self.assertIsNone(interpreter.error)
+
+    def test_capture_shared(self):
+        interpreter = self.simulate('foobar', times=2)
+        self.assertIs(interpreter._watcher._finder.capture,
+                      interpreter._finder.capture)
+
+    def test_deterministic(self):
+        self.assertListEqual(self.simulate('foobar', times=3).clicks,
+                             self.simulate('foobar', times=3).clicks)
+
+    def test_timeout(self):
+        interpreter = self.simulate('timeout')
+        self.assertListEqual(interpreter.clicks, [])
+        self.assertAlmostEqual(interpreter.clock.now, 2.0)
+        self.assertEqual(interpreter.error,
+                         "Image not found within the time limit")
+
+    def test_retry(self):
+        # The popup appears while the command is retried
+        interpreter = self.simulate('timeout', enable_retry=True)
+        self.assertIsNone(interpreter.error)
+        self.assertListEqual([(click.x, click.y)
+                              for click in interpreter.clicks], [(5, 5)])
+        self.assertGreaterEqual(interpreter.clicks[0].time, 3.2)
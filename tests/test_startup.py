@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+import unittest
+
+CODE = """
+import sys
+from mausmakro.__main__ import main
+try:
+    main(['check', '-f', 'test_macros/simple.txt', '--no-program-cache'])
+except SystemExit as e:
+    assert not e.code, e.code
+print(' '.join(sorted(sys.modules)))
+"""
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_check_headless(self):
+        env = dict(os.environ)
+        env.pop('DISPLAY', None)
+        result = subprocess.run([sys.executable, '-c', CODE], env=env,
+                                capture_output=True, text=True, check=True)
+
+        modules = result.stdout.split()
+        for module in ('cv2', 'numpy', 'PIL', 'pyautogui', 'pynput'):
+            self.assertNotIn(module, modules)
@@ -0,0 +1,55 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from mausmakro.lib.exceptions import ImageException
+from mausmakro.templates import TemplateCache
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name).joinpath('image.png')
+        image = np.zeros((10, 20, 3), dtype=np.uint8)
+        image[:, :, 2] = 255
+        cv2.imwrite(str(self.path), image)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_get_variants(self):
+        cache = TemplateCache()
+        color = cache.get(self.path, grayscale=False)
+        gray = cache.get(self.path, grayscale=True)
+
+        self.assertTupleEqual(color.shape, (10, 20, 3))
+        self.assertTupleEqual(gray.shape, (10, 20))
+
+    def test_preload(self):
+        cache = TemplateCache()
+        cache.preload([self.path])
+        cache.get(self.path, grayscale=True)
+        cache.get(self.path, grayscale=False)
+
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['bytes'], 10 * 20 * 3 + 10 * 20)
+
+    def test_eviction(self):
+        cache = TemplateCache(max_bytes=10 * 20 * 3)
+        cache.preload([self.path])
+
+        self.assertEqual(len(cache), 1)
+        self.assertIn((self.path, True), cache)
+        self.assertNotIn((self.path, False), cache)
+        self.assertEqual(cache.bytes_held, 10 * 20)
+
+    def test_missing_image(self):
+        cache = TemplateCache()
+        path = Path(self._tmp_dir.name).joinpath('missing.png')
+        self.assertRaises(ImageException, cache.get, path)
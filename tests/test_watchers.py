@@ -0,0 +1,160 @@
+import tempfile
+import unittest
+from pathlib import Path
+from threading import Event
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from mausmakro.async_interpreter import AsyncInterpreter
+from mausmakro.interpreter import Interpreter
+from mausmakro.lib.exceptions import RetryException
+from mausmakro.lib.observable import Level
+from mausmakro.lib.types import Watcher
+from mausmakro.reloader import compile_program
+from mausmakro.watchers import ScreenWatcher
+
+from helpers import OPTS, clicking, random_screen
+
+SOURCE = ("ON popup.png CALL dismiss\n"
+          "PROC dismiss {\n"
+          "    CLICK 5,5\n"
+          "}\n"
+          "MACRO foobar {\n"
+          "    WAIT 1s\n"
+          "    CLICK 1,1\n"
+          "}\n"
+          "MACRO retry {\n"
+          "    WAIT UNTIL missing.png WITHIN 1s\n"
+          "}\n")
+
+
+def dismissing(interpreter_cls):
+    class Dismissing(clicking(interpreter_cls)):
+        """Clicking anything closes the popup."""
+        clean: np.ndarray
+
+        def __init__(self, instructions, label_table, opts, clean):
+            super(Dismissing, self).__init__(instructions, label_table, opts)
+            self.clean = clean
+            self.level = Level.DEBUG
+
+        def _click(self, x, y, clicks):
+            super(Dismissing, self)._click(x, y, clicks)
+            self._watcher._finder.capture._frames = [self.clean]
+
+    return Dismissing
+
+
+class TestWatchers(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+        self.path.joinpath('images').mkdir()
+        self.path.joinpath('frames').mkdir()
+
+        self.clean = random_screen(7)
+        popup = self.clean.copy()
+        popup[100:140, 150:250] = np.flip(popup[20:60, 30:130], axis=0)
+
+        cv2.imwrite(str(self.path.joinpath('frames/0.png')), self.clean)
+        cv2.imwrite(str(self.path.joinpath('frames/1.png')), popup)
+        cv2.imwrite(str(self.path.joinpath('popup.png')), popup)
+        cv2.imwrite(str(self.path.joinpath('images/popup.png')),
+                    popup[100:140, 150:250])
+        cv2.imwrite(str(self.path.joinpath('images/missing.png')),
+                    np.flip(popup[100:140, 150:250], axis=1))
+
+        self.file = self.path.joinpath('macro.txt')
+        self.file.write_text(SOURCE)
+        self.opts = {**OPTS, 'capture': 'file', 'file': str(self.file),
+                     'watcher_interval': 0.05}
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_check(self):
+        opts = {**self.opts, 'capture_path': str(self.path / 'frames')}
+        watcher = ScreenWatcher([Watcher('popup.png', 'dismiss')], opts,
+                                Event())
+
+        self.assertIsNone(watcher.check())
+        self.assertEqual(watcher.check(), Watcher('popup.png', 'dismiss'))
+
+    def test_region(self):
+        opts = {**self.opts, 'capture_path': str(self.path / 'popup.png')}
+        watchers = [Watcher('popup.png', 'elsewhere', (0, 0, 100, 100)),
+                    Watcher('popup.png', 'dismiss', (100, 50, 200, 150))]
+        watcher = ScreenWatcher(watchers, opts, Event())
+        self.assertEqual(watcher.check(), watchers[1])
+
+    def test_unchanged_skipped(self):
+        opts = {**self.opts, 'capture_path': str(self.path / 'frames/0.png')}
+        watcher = ScreenWatcher([Watcher('popup.png', 'dismiss')], opts,
+                                Event())
+        watcher.check()
+        watcher.check()
+        self.assertTupleEqual(watcher.stats(), (1, 1))
+
+    def run_macro(self, interpreter_cls):
+        _, program = compile_program(str(self.file), 'foobar')
+        opts = {**self.opts, 'capture_path': str(self.path / 'popup.png'),
+                'watchers': program[3]}
+        interpreter = dismissing(interpreter_cls)(*program[:2], opts,
+                                                  self.clean)
+        start = perf_counter()
+        interpreter.interpret('foobar')
+        return interpreter, perf_counter() - start
+
+    def test_interrupt(self):
+        interpreter, elapsed = self.run_macro(Interpreter)
+
+        # The interrupted WAIT runs whole again after the handler
+        self.assertListEqual(interpreter.clicks, [(5, 5), (1, 1)])
+        self.assertIn("Image popup.png appeared, calling dismiss",
+                      interpreter.messages)
+        self.assertGreaterEqual(elapsed, 1)
+        self.assertLess(elapsed, 2)
+
+    def test_interrupt_async(self):
+        interpreter, _ = self.run_macro(AsyncInterpreter)
+        self.assertListEqual(interpreter.clicks, [(5, 5), (1, 1)])
+
+    def test_watcher_kept(self):
+        interpreter, _ = self.run_macro(Interpreter)
+        watcher = interpreter._watcher
+        capture = watcher._finder.capture
+        capture._frames = [cv2.imread(str(self.path / 'popup.png'))]
+
+        interpreter.interpret('foobar')
+        self.assertIs(interpreter._watcher, watcher)
+        self.assertIs(watcher._finder.capture, capture)
+        self.assertListEqual(interpreter.clicks, [(5, 5), (1, 1)] * 2)
+
+    def test_interrupt_retry(self):
+        popup = cv2.imread(str(self.path / 'popup.png'))
+
+        class Retrying(dismissing(Interpreter)):
+            """The popup appears when the command is retried first."""
+            retried = False
+
+            def notify(self, msg_type, msg_data):
+                super(Retrying, self).notify(msg_type, msg_data)
+                if not self.retried and str(msg_data).startswith("Retries"):
+                    self.retried = True
+                    self._watcher._finder.capture._frames = [popup]
+
+        _, program = compile_program(str(self.file), 'retry')
+        opts = {**self.opts, 'capture_path': str(self.path / 'frames/0.png'),
+                'enable_retry': True, 'watchers': program[3]}
+        interpreter = Retrying(*program[:2], opts, self.clean)
+
+        # Tried again after the handler, but the image never appears
+        with self.assertRaises(RetryException):
+            interpreter.interpret('retry')
+
+        self.assertListEqual(interpreter.clicks, [(5, 5)])
+        self.assertIn("Image popup.png appeared, calling dismiss",
+                      interpreter.messages)